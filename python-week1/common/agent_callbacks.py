@@ -0,0 +1,235 @@
+# agent_callbacks.py
+"""LangChain Agent埋点回调：记录每一步LLM/工具耗时和Token，按查询限制总时长，检测到最终答案后提前结束，并写出JSONL轨迹"""
+import os
+import re
+import json
+import time
+import logging
+import threading
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+from langchain_core.callbacks import BaseCallbackHandler
+
+logger = logging.getLogger("AgentCallbacks")
+
+AGENT_DEADLINE_SECONDS = float(os.getenv("AGENT_DEADLINE_SECONDS", "60"))  # 单次查询的总时长上限
+AGENT_TRACE_FILE = os.getenv(  # 置空则不写轨迹文件；默认写在本模块旁边，不随启动目录变化
+    "AGENT_TRACE_FILE",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), f"agent_traces_{datetime.now().strftime('%Y%m%d')}.jsonl"))
+AGENT_VERBOSE = os.getenv("AGENT_VERBOSE", "0") == "1"  # 是否保留LangChain自带的verbose逐行打印
+
+# ReAct文本格式的"Final Answer: ..."，以及对话式ReAct的JSON格式{"action": "Final Answer", "action_input": "..."}
+FINAL_ANSWER_TEXT_RE = re.compile(r"(?:Final Answer|最终答案)\s*[:：]\s*(.+)", re.S)
+FINAL_ANSWER_JSON_RE = re.compile(
+    r'"action"\s*:\s*"Final Answer"\s*,\s*"action_input"\s*:\s*"((?:[^"\\]|\\.)*)"', re.S)
+
+_trace_lock = threading.Lock()
+
+
+class AgentDeadlineExceeded(Exception):
+    """查询超过总时长上限"""
+
+
+class AgentEarlyExit(Exception):
+    """已经得到最终答案，但Agent仍要继续调用LLM或工具"""
+
+    def __init__(self, answer: str):
+        super().__init__(answer)
+        self.answer = answer
+
+
+def extract_final_answer(text: str) -> Optional[str]:
+    """从LLM输出中识别最终答案，识别不到返回None"""
+    match = FINAL_ANSWER_JSON_RE.search(text)
+    if match:
+        try:
+            return json.loads(f'"{match.group(1)}"')
+        except ValueError:
+            return match.group(1)
+    match = FINAL_ANSWER_TEXT_RE.search(text)
+    if match:
+        return match.group(1).strip()
+    return None
+
+
+class AgentInstrumentation(BaseCallbackHandler):
+    """一次查询对应一个实例；raise_error=True使回调中抛出的超时/提前结束异常能中断Agent"""
+
+    raise_error = True
+
+    def __init__(self, deadline: Optional[float] = AGENT_DEADLINE_SECONDS,
+                 trace_file: Optional[str] = AGENT_TRACE_FILE, agent_name: str = "agent"):
+        self.deadline = deadline
+        self.trace_file = trace_file
+        self.agent_name = agent_name
+        self.query = None
+        self.started = None
+        self.steps: List[Dict[str, Any]] = []
+        self.final_answer = None
+        self.status = "running"
+        self.error = None
+        self._pending: Dict[Any, tuple] = {}  # run_id -> (类型, 名称, 开始时间)
+        self._root_run_id = None
+        self._record = None
+
+    # ---- 查询级别 ----
+    def on_chain_start(self, serialized: Dict[str, Any], inputs: Dict[str, Any], *, run_id, parent_run_id=None, **kwargs):
+        if parent_run_id is None and self._root_run_id is None:
+            self._root_run_id = run_id
+            self.query = inputs.get("input") if isinstance(inputs, dict) else str(inputs)
+            self.started = time.perf_counter()
+
+    def on_chain_end(self, outputs: Dict[str, Any], *, run_id, **kwargs):
+        if run_id == self._root_run_id:
+            if isinstance(outputs, dict) and outputs.get("output") is not None:
+                self.final_answer = outputs["output"]
+            self.finish("ok")
+
+    def on_chain_error(self, error: BaseException, *, run_id, **kwargs):
+        if run_id == self._root_run_id and self.status == "running":
+            self.error = str(error)
+            self.finish("error")
+
+    def on_agent_finish(self, finish: Any, **kwargs):
+        output = getattr(finish, "return_values", {}).get("output")
+        if output is not None:
+            self.final_answer = output
+
+    # ---- LLM ----
+    def on_llm_start(self, serialized: Dict[str, Any], prompts: List[str], *, run_id, **kwargs):
+        self._begin("llm", (serialized or {}).get("name", "llm"), run_id)
+
+    def on_chat_model_start(self, serialized: Dict[str, Any], messages: List[Any], *, run_id, **kwargs):
+        self._begin("llm", (serialized or {}).get("name", "chat_model"), run_id)
+
+    def on_llm_end(self, response: Any, *, run_id, **kwargs):
+        step = self._end(run_id)
+        if step is None:
+            return
+        usage = (getattr(response, "llm_output", None) or {}).get("token_usage") or {}
+        text = ""
+        generations = getattr(response, "generations", None) or []
+        if generations and generations[0]:
+            generation = generations[0][0]
+            text = generation.text or ""
+            message = getattr(generation, "message", None)
+            if not usage and getattr(message, "usage_metadata", None):
+                metadata = message.usage_metadata
+                usage = {"prompt_tokens": metadata.get("input_tokens", 0),
+                         "completion_tokens": metadata.get("output_tokens", 0),
+                         "total_tokens": metadata.get("total_tokens", 0)}
+        step["prompt_tokens"] = usage.get("prompt_tokens", 0)
+        step["completion_tokens"] = usage.get("completion_tokens", 0)
+
+        answer = extract_final_answer(text)
+        if answer is not None and self.final_answer is None:
+            self.final_answer = answer
+            step["final_answer"] = True
+
+    def on_llm_error(self, error: BaseException, *, run_id, **kwargs):
+        step = self._end(run_id)
+        if step is not None:
+            step["error"] = str(error)
+
+    # ---- 工具 ----
+    def on_tool_start(self, serialized: Dict[str, Any], input_str: str, *, run_id, **kwargs):
+        self._begin("tool", (serialized or {}).get("name", "tool"), run_id)
+
+    def on_tool_end(self, output: Any, *, run_id, **kwargs):
+        self._end(run_id)
+
+    def on_tool_error(self, error: BaseException, *, run_id, **kwargs):
+        step = self._end(run_id)
+        if step is not None:
+            step["error"] = str(error)
+
+    # ---- 内部 ----
+    def elapsed(self) -> float:
+        return time.perf_counter() - self.started if self.started else 0.0
+
+    def _begin(self, kind: str, name: str, run_id) -> None:
+        """每一步开始前检查：已有最终答案则提前结束，超过总时长则中断"""
+        if self.final_answer is not None and self._root_run_id is not None:
+            self.status = "early_exit"
+            raise AgentEarlyExit(self.final_answer)
+        if self.deadline is not None and self.elapsed() > self.deadline:
+            self.status = "deadline"
+            raise AgentDeadlineExceeded(f"查询超过{self.deadline:g}秒上限")
+        self._pending[run_id] = (kind, name, time.perf_counter())
+
+    def _end(self, run_id) -> Optional[Dict[str, Any]]:
+        pending = self._pending.pop(run_id, None)
+        if pending is None:
+            return None
+        kind, name, start = pending
+        step = {"step": len(self.steps) + 1, "type": kind, "name": name,
+                "latency_ms": round((time.perf_counter() - start) * 1000, 2)}
+        self.steps.append(step)
+        logger.debug(f"{self.agent_name} 第{step['step']}步 {kind}:{name} {step['latency_ms']}ms")
+        return step
+
+    def summary(self) -> Dict[str, Any]:
+        llm_steps = [s for s in self.steps if s["type"] == "llm"]
+        tool_steps = [s for s in self.steps if s["type"] == "tool"]
+        return {
+            "timestamp": datetime.now().isoformat(timespec="seconds"),
+            "agent": self.agent_name,
+            "query": self.query,
+            "status": self.status,
+            "error": self.error,
+            "total_ms": round(self.elapsed() * 1000, 2),
+            "llm_calls": len(llm_steps),
+            "llm_ms": round(sum(s["latency_ms"] for s in llm_steps), 2),
+            "tool_calls": len(tool_steps),
+            "tool_ms": round(sum(s["latency_ms"] for s in tool_steps), 2),
+            "prompt_tokens": sum(s.get("prompt_tokens", 0) for s in llm_steps),
+            "completion_tokens": sum(s.get("completion_tokens", 0) for s in llm_steps),
+            "steps": self.steps
+        }
+
+    def finish(self, status: str = "ok") -> Dict[str, Any]:
+        """结束本次查询并写出一行轨迹；重复调用直接返回第一次的结果"""
+        if self._record is not None:
+            return self._record
+        if self.status == "running":
+            self.status = status
+        record = self._record = self.summary()
+        if self.trace_file:
+            with _trace_lock:
+                with open(self.trace_file, "a", encoding="utf-8") as f:
+                    f.write(json.dumps(record, ensure_ascii=False) + "\n")
+        logger.info(f"{self.agent_name} 完成({record['status']}): 总耗时{record['total_ms']:.0f}ms | "
+                    f"LLM {record['llm_calls']}次/{record['llm_ms']:.0f}ms | "
+                    f"工具 {record['tool_calls']}次/{record['tool_ms']:.0f}ms | "
+                    f"Token {record['prompt_tokens']}+{record['completion_tokens']}")
+        return record
+
+
+def _fallback_output(handler: AgentInstrumentation, error: Exception) -> Dict[str, Any]:
+    if isinstance(error, AgentEarlyExit):
+        return {"output": error.answer, "early_exit": True}
+    return {"output": handler.final_answer or f"⏱️ {str(error)}，请缩小问题范围后重试", "timed_out": True}
+
+
+def invoke_with_budget(agent: Any, inputs: Dict[str, Any], deadline: Optional[float] = AGENT_DEADLINE_SECONDS,
+                       agent_name: str = "agent") -> Dict[str, Any]:
+    """带埋点、总时长上限和提前结束的agent.invoke，超时或提前结束时返回已有的最佳答案"""
+    handler = AgentInstrumentation(deadline=deadline, agent_name=agent_name)
+    try:
+        result = agent.invoke(inputs, config={"callbacks": [handler]})
+    except (AgentEarlyExit, AgentDeadlineExceeded) as e:
+        result = _fallback_output(handler, e)
+    result["trace"] = handler.finish()
+    return result
+
+
+async def ainvoke_with_budget(agent: Any, inputs: Dict[str, Any], deadline: Optional[float] = AGENT_DEADLINE_SECONDS,
+                              agent_name: str = "agent") -> Dict[str, Any]:
+    """invoke_with_budget的asyncio版本"""
+    handler = AgentInstrumentation(deadline=deadline, agent_name=agent_name)
+    try:
+        result = await agent.ainvoke(inputs, config={"callbacks": [handler]})
+    except (AgentEarlyExit, AgentDeadlineExceeded) as e:
+        result = _fallback_output(handler, e)
+    result["trace"] = handler.finish()
+    return result
@@ -0,0 +1,99 @@
+# openai_stub.py
+"""本地OpenAI兼容接口桩服务（/v1/chat/completions），支持HTTP/1.1长连接、SSE流式输出和可配置延迟
+
+用法（在week1目录下）：
+    python ../common/openai_stub.py --port 7910 --latency-ms 20
+    DEEPSEEK_ENDPOINT=http://127.0.0.1:7910/v1/chat/completions python cot_prompt.py
+"""
+import json
+import time
+import argparse
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+STUB_REPLY = "这是桩服务返回的示例回答。"
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # 保持长连接，便于观察连接池效果
+    disable_nagle_algorithm = True  # 响应头和正文分两次写出，避免长连接上的Nagle/延迟ACK等待
+    latency_ms = 20.0  # 首字延迟
+    token_latency_ms = 5.0  # 流式输出时每段之间的间隔
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        request = json.loads(self.rfile.read(length) or b"{}")
+        time.sleep(self.latency_ms / 1000)
+
+        prompt = request.get("messages", [{}])[-1].get("content", "")
+        if request.get("stream"):
+            self._stream_reply(request)
+            return
+        body = json.dumps({
+            "id": "chatcmpl-stub",
+            "object": "chat.completion",
+            "model": request.get("model", "stub"),
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": STUB_REPLY},
+                "finish_reason": "stop"
+            }],
+            "usage": {"prompt_tokens": len(prompt), "completion_tokens": len(STUB_REPLY),
+                      "total_tokens": len(prompt) + len(STUB_REPLY)}
+        }, ensure_ascii=False).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _write_chunk(self, data: bytes) -> None:
+        self.wfile.write(f"{len(data):X}\r\n".encode("ascii") + data + b"\r\n")
+        self.wfile.flush()
+
+    def _stream_reply(self, request: dict) -> None:
+        """按OpenAI的SSE格式逐字输出，使用chunked编码以保持长连接"""
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        for i, char in enumerate(STUB_REPLY):
+            if i:
+                time.sleep(self.token_latency_ms / 1000)
+            chunk = {
+                "id": "chatcmpl-stub",
+                "object": "chat.completion.chunk",
+                "model": request.get("model", "stub"),
+                "choices": [{"index": 0, "delta": {"content": char}, "finish_reason": None}]
+            }
+            self._write_chunk(f"data: {json.dumps(chunk, ensure_ascii=False)}\n\n".encode("utf-8"))
+        self._write_chunk(b"data: [DONE]\n\n")
+        self._write_chunk(b"")
+
+
+def start_stub_server(port: int = 0, latency_ms: float = 20.0, token_latency_ms: float = 5.0) -> ThreadingHTTPServer:
+    """在后台线程启动桩服务，返回server（server.server_port为实际端口）"""
+    handler = type("ConfiguredStubHandler", (StubHandler,),
+                   {"latency_ms": latency_ms, "token_latency_ms": token_latency_ms})
+    server = ThreadingHTTPServer(("127.0.0.1", port), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="OpenAI兼容接口桩服务")
+    parser.add_argument("--port", type=int, default=7910)
+    parser.add_argument("--latency-ms", type=float, default=20)
+    parser.add_argument("--token-latency-ms", type=float, default=5)
+    args = parser.parse_args()
+
+    server = start_stub_server(args.port, args.latency_ms, args.token_latency_ms)
+    print(f"桩服务已启动: http://127.0.0.1:{server.server_port}/v1/chat/completions")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
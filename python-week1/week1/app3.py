@@ -2,25 +2,29 @@ import gradio as gr
 import tiktoken
 import time
 import random
-import asyncio
 import re
 from datetime import datetime, timedelta
 from urllib.parse import quote, unquote
 from fastapi import FastAPI, Request, HTTPException, Depends, status
 from fastapi.security import APIKeyHeader
+from fastapi.responses import PlainTextResponse
 import uvicorn
 import json
 import hashlib
-from functools import lru_cache
+import string
+import sys
 from typing import Dict, List, Optional, Tuple, Any
 import httpx
 from pydantic import BaseModel
 import secrets
 from contextlib import asynccontextmanager
 import os
+from tracing import tracer
+from llm_client import get_client
 
 # 配置
 TMDB_API_KEY = os.getenv("TMDB_API_KEY", "048b542052a89f315fa7c6b74bd253f9")  # TMDB API密钥
+TMDB_BASE_URL = os.getenv("TMDB_BASE_URL", "https://api.themoviedb.org/3")  # 压测时可指向本地模拟服务
 CACHE_TTL = 3600  # 缓存过期时间（秒）
 MAX_HISTORY_LENGTH = 50  # 最大历史记录长度
 API_KEY = "your_secure_api_key"  # API访问密钥
@@ -31,6 +35,16 @@ SUPPORTED_LANGUAGES = {
 }
 DEFAULT_LANGUAGE = "zh"
 
+# 部署配置
+SERVER_HOST = os.getenv("SERVER_HOST", "127.0.0.1")
+SERVER_PORT = int(os.getenv("SERVER_PORT", "7860"))
+WEB_WORKERS = int(os.getenv("WEB_WORKERS", "1"))  # uvicorn工作进程数（大于1时只能提供API，见run_single_server）
+WEB_MOUNT_UI = os.getenv("WEB_MOUNT_UI", "1") == "1"  # 是否把Gradio界面挂载到FastAPI上，设为0时只提供API
+SERVER_CONCURRENCY_LIMIT = int(os.getenv("SERVER_CONCURRENCY_LIMIT", "512"))  # 每个进程的最大并发连接，超出返回503
+GRADIO_CONCURRENCY_LIMIT = int(os.getenv("GRADIO_CONCURRENCY_LIMIT", "16"))  # 每个事件同时执行的任务数
+GRADIO_MAX_QUEUE = int(os.getenv("GRADIO_MAX_QUEUE", "256"))  # Gradio排队上限，超出直接拒绝
+LLM_COMMENTARY = os.getenv("LLM_COMMENTARY", "0") == "1"  # 设为1且配置了DEEPSEEK_API_KEY时，在界面结果后流式追加AI点评
+
 # 多语言文本资源
 LANG_RESOURCES = {
     "zh": {
@@ -60,7 +74,9 @@ LANG_RESOURCES = {
         "login_success": "登录成功",
         "invalid_credentials": "无效的凭据",
         "page": "页",
-        "rating_filter": "评分{min_rating}以上"
+        "rating_filter": "评分{min_rating}以上",
+        "ai_commentary": "AI点评：",
+        "commentary_prompt": "你是电影顾问。用户的问题是：{query}\n系统给出的推荐结果如下：\n{result}\n\n请用中文写一段简短点评（不超过150字），只评论结果中出现的电影。"
     },
     "en": {
         "app_title": "AI Movie Advisor",
@@ -89,7 +105,9 @@ LANG_RESOURCES = {
         "login_success": "Login successful",
         "invalid_credentials": "Invalid credentials",
         "page": "Page",
-        "rating_filter": "with rating above {min_rating}"
+        "rating_filter": "with rating above {min_rating}",
+        "ai_commentary": "AI commentary:",
+        "commentary_prompt": "You are a movie advisor. The user asked: {query}\nThe system returned these results:\n{result}\n\nWrite a short commentary in English (under 100 words) about the movies in the results only."
     },
     "ja": {
         "app_title": "AI映画アドバイザー",
@@ -118,10 +136,80 @@ LANG_RESOURCES = {
         "login_success": "ログイン成功",
         "invalid_credentials": "無効な認証情報",
         "page": "ページ",
-        "rating_filter": "評価{min_rating}以上"
+        "rating_filter": "評価{min_rating}以上",
+        "ai_commentary": "AIコメント：",
+        "commentary_prompt": "あなたは映画アドバイザーです。ユーザーの質問：{query}\nシステムの推薦結果：\n{result}\n\n結果に含まれる映画についてのみ、日本語で短いコメント（150字以内）を書いてください。"
     }
 }
 
+# 影评资源模板（每种语言4条来源）
+REVIEW_SOURCE_TEMPLATES = {
+    "zh": [
+        "1. 豆瓣电影：https://movie.douban.com/subject/{movie_id}/",
+        "2. 知乎讨论：https://www.zhihu.com/search?q={encoded_title}+影评",
+        "3. 烂番茄：https://www.rottentomatoes.com/search?search={encoded_title}",
+        "4. 专业媒体：可在《看电影》杂志或Variety网站搜索相关评论"
+    ],
+    "en": [
+        "1. Douban: https://movie.douban.com/subject/{movie_id}/",
+        "2. Zhihu: https://www.zhihu.com/search?q={encoded_title}+reviews",
+        "3. Rotten Tomatoes: https://www.rottentomatoes.com/search?search={encoded_title}",
+        "4. Professional media: Search reviews in 'Cinephilia' magazine or Variety website"
+    ],
+    "ja": [
+        "1. 豆瓣映画：https://movie.douban.com/subject/{movie_id}/",
+        "2. 知乎：https://www.zhihu.com/search?q={encoded_title}+レビュー",
+        "3. ロッテントマト：https://www.rottentomatoes.com/search?search={encoded_title}",
+        "4. 専門媒体：「映画を見る」誌またはVarietyウェブサイトで検索できます"
+    ]
+}
+
+class LangTemplate:
+    """预编译的文本模板：启动时拆分为字面量/字段片段，字面量做字符串驻留"""
+    __slots__ = ("text", "segments", "is_static")
+    
+    def __init__(self, text: str):
+        self.text = sys.intern(text)
+        self.segments = []
+        for literal, field_name, format_spec, conversion in string.Formatter().parse(text):
+            if literal:
+                self.segments.append(sys.intern(literal))
+            if field_name is not None:
+                if not field_name.isidentifier():
+                    raise ValueError(f"模板字段只支持简单名称: {field_name}")
+                self.segments.append((field_name, format_spec or "", conversion))
+        self.is_static = all(isinstance(seg, str) for seg in self.segments)
+    
+    def render(self, **kwargs) -> str:
+        """填充字段，结果与str.format一致"""
+        if self.is_static or not kwargs:
+            return self.text
+        parts = []
+        for seg in self.segments:
+            if isinstance(seg, str):
+                parts.append(seg)
+                continue
+            field_name, format_spec, conversion = seg
+            value = kwargs[field_name]
+            if conversion == "r":
+                value = repr(value)
+            elif conversion == "a":
+                value = ascii(value)
+            elif conversion == "s":
+                value = str(value)
+            parts.append(format(value, format_spec))
+        return "".join(parts)
+
+# 启动时编译所有多语言模板
+COMPILED_LANG_RESOURCES = {
+    lang: {key: LangTemplate(text) for key, text in resources.items()}
+    for lang, resources in LANG_RESOURCES.items()
+}
+COMPILED_REVIEW_SOURCES = {
+    lang: [LangTemplate(line) for line in lines]
+    for lang, lines in REVIEW_SOURCE_TEMPLATES.items()
+}
+
 # 模拟用户数据库
 USER_DB = {
     "user1": {"password": hashlib.sha256("password123".encode()).hexdigest(), "preferences": ["科幻", "剧情"]},
@@ -217,8 +305,8 @@ async def lifespan(app: FastAPI):
     app.state.cache = cache
     app.state.movie_database = movie_database
     yield
-    # 关闭时清理
-    pass
+    # 关闭时清理：刷新追踪数据
+    tracer.shutdown()
 
 app = FastAPI(title="Movie Recommendation API", lifespan=lifespan)
 TMDB_API_KEY = os.getenv("TMDB_API_KEY", "048b542052a89f315fa7c6b74bd253f9")
@@ -245,27 +333,55 @@ class LoginRequest(BaseModel):
     password: str
 
 class MovieRecommender:
-    def __init__(self):
+    def __init__(self, catalog: Optional[Dict[str, Dict[str, Any]]] = None):
         self.encoder = tiktoken.get_encoding("cl100k_base")
         self.total_tokens = 0
         self.interaction_count = 0
-        self.tmdb_base_url = "https://api.themoviedb.org/3"
+        self.tmdb_base_url = TMDB_BASE_URL
+        # 影评资源预渲染表：(电影标题, TMDB ID, 语言) -> 文本，随实例释放
+        self.review_sources = {}
+        self.review_hits = 0
+        self.review_misses = 0
+        self.catalog = catalog if catalog is not None else dict(movie_database)  # 复制一份，add_movie不影响全局电影库和其他实例
+        self.load_catalog(self.catalog)
+    
+    def load_catalog(self, catalog: Dict[str, Dict[str, Any]]) -> None:
+        """加载电影库，并为每部电影×每种语言预渲染影评资源"""
+        self.catalog = catalog
+        self.review_sources = {}
+        for title, info in catalog.items():
+            self._prerender_review_sources(title, info["id"])
+    
+    def add_movie(self, title: str, info: Dict[str, Any]) -> None:
+        """向电影库添加电影，只增量渲染新电影的影评资源"""
+        self.catalog[title] = info
+        self._prerender_review_sources(title, info["id"])
+    
+    def _prerender_review_sources(self, title: str, movie_id: int) -> None:
+        for lang in SUPPORTED_LANGUAGES:
+            self.review_sources[(title, movie_id, lang)] = self._render_review_sources(title, movie_id, lang)
+    
+    def review_cache_stats(self) -> Dict[str, int]:
+        """影评资源预渲染表的命中统计"""
+        return {
+            "entries": len(self.review_sources),
+            "hits": self.review_hits,
+            "misses": self.review_misses
+        }
         
     def calculate_tokens(self, text: str) -> int:
         """计算文本的Token数量"""
-        return len(self.encoder.encode(text))
+        with tracer.span("tiktoken", chars=len(text)):
+            return len(self.encoder.encode(text))
     
     def get_lang_text(self, key: str, lang: str = DEFAULT_LANGUAGE, **kwargs) -> str:
         """获取多语言文本"""
         lang = lang if lang in SUPPORTED_LANGUAGES else DEFAULT_LANGUAGE
-        try:
-            text = LANG_RESOURCES[lang][key]
-            if kwargs:
-                return text.format(** kwargs)
-            return text
-        except KeyError:
+        template = COMPILED_LANG_RESOURCES[lang].get(key)
+        if template is None:
             #  fallback to default language if key not found
-            return LANG_RESOURCES[DEFAULT_LANGUAGE][key].format(**kwargs)
+            template = COMPILED_LANG_RESOURCES[DEFAULT_LANGUAGE][key]
+        return template.render(**kwargs)
     
     def safe_response(self, response: str, confidence: float = 0.8) -> str:
         """添加安全边界，防止幻觉"""
@@ -300,43 +416,34 @@ class MovieRecommender:
         ]
         
         # 尝试所有模式
-        for pattern in chinese_patterns + english_patterns + japanese_patterns:
-            match = re.search(pattern, prompt)
-            if match:
-                try:
-                    return float(match.group(1))
-                except ValueError:
-                    continue
-                    
-        return None
+        with tracer.span("rating_regex"):
+            for pattern in chinese_patterns + english_patterns + japanese_patterns:
+                match = re.search(pattern, prompt)
+                if match:
+                    try:
+                        return float(match.group(1))
+                    except ValueError:
+                        continue
+                        
+            return None
     
-    @lru_cache(maxsize=100)
     def get_review_sources(self, movie_title: str, movie_id: int, lang: str = DEFAULT_LANGUAGE) -> str:
+        """获取影评资源链接（电影库内的电影直接读取预渲染结果）"""
+        text = self.review_sources.get((movie_title, movie_id, lang))
+        if text is not None:
+            self.review_hits += 1
+            return text
+        # 电影库之外的电影不缓存，避免表无限增长
+        self.review_misses += 1
+        return self._render_review_sources(movie_title, movie_id, lang)
+    
+    def _render_review_sources(self, movie_title: str, movie_id: int, lang: str) -> str:
         """生成影评资源链接"""
         encoded_title = quote(movie_title)
-        sources = [
-            f"1. 豆瓣电影：https://movie.douban.com/subject/{movie_id}/",
-            f"2. 知乎讨论：https://www.zhihu.com/search?q={encoded_title}+影评",
-            f"3. 烂番茄：https://www.rottentomatoes.com/search?search={encoded_title}",
-            "4. 专业媒体：可在《看电影》杂志或Variety网站搜索相关评论"
-        ]
-        
-        if lang == "en":
-            sources = [
-                f"1. Douban: https://movie.douban.com/subject/{movie_id}/",
-                f"2. Zhihu: https://www.zhihu.com/search?q={encoded_title}+reviews",
-                f"3. Rotten Tomatoes: https://www.rottentomatoes.com/search?search={encoded_title}",
-                "4. Professional media: Search reviews in 'Cinephilia' magazine or Variety website"
-            ]
-        elif lang == "ja":
-            sources = [
-                f"1. 豆瓣映画：https://movie.douban.com/subject/{movie_id}/",
-                f"2. 知乎：https://www.zhihu.com/search?q={encoded_title}+レビュー",
-                f"3. ロッテントマト：https://www.rottentomatoes.com/search?search={encoded_title}",
-                "4. 専門媒体：「映画を見る」誌またはVarietyウェブサイトで検索できます"
-            ]
-            
-        return f"{self.get_lang_text('review_sources', lang, title=movie_title)}\n" + "\n".join(sources)
+        templates = COMPILED_REVIEW_SOURCES.get(lang, COMPILED_REVIEW_SOURCES[DEFAULT_LANGUAGE])
+        lines = [self.get_lang_text("review_sources", lang, title=movie_title)]
+        lines.extend(t.render(movie_id=movie_id, encoded_title=encoded_title) for t in templates)
+        return "\n".join(lines)
     
     async def fetch_tmdb_data(self, endpoint: str, params: Dict[str, Any] = None) -> Optional[Dict[str, Any]]:
         """从TMDB API获取数据"""
@@ -346,25 +453,28 @@ class MovieRecommender:
         params = params or {}
         params["api_key"] = TMDB_API_KEY
         
-        cache_key = f"tmdb_{endpoint}_{json.dumps(params, sort_keys=True)}"
-        cached_data = cache.get(cache_key)
-        
-        if cached_data:
-            return cached_data
+        with tracer.span("fetch_tmdb_data", endpoint=endpoint) as span:
+            cache_key = f"tmdb_{endpoint}_{json.dumps(params, sort_keys=True)}"
+            cached_data = cache.get(cache_key)
+            if span:
+                span.set_attribute("cache_hit", cached_data is not None)
             
-        try:
-            async with httpx.AsyncClient() as client:
-                response = await client.get(f"{self.tmdb_base_url}/{endpoint}", params=params)
-                response.raise_for_status()
-                data = response.json()
-                cache.set(cache_key, data)
-                return data
-        except httpx.HTTPError as e:
-            print(f"TMDB API error: {str(e)}")
-            return None
-        except Exception as e:
-            print(f"Error fetching TMDB data: {str(e)}")
-            return None
+            if cached_data:
+                return cached_data
+                
+            try:
+                async with httpx.AsyncClient() as client:
+                    response = await client.get(f"{self.tmdb_base_url}/{endpoint}", params=params)
+                    response.raise_for_status()
+                    data = response.json()
+                    cache.set(cache_key, data)
+                    return data
+            except httpx.HTTPError as e:
+                print(f"TMDB API error: {str(e)}")
+                return None
+            except Exception as e:
+                print(f"Error fetching TMDB data: {str(e)}")
+                return None
     
     async def get_movie_details(self, movie_id: int, lang: str = "zh-CN") -> Optional[Dict[str, Any]]:
         """获取电影详细信息"""
@@ -399,37 +509,45 @@ class MovieRecommender:
                 
         return await self.fetch_tmdb_data("movie/popular", params)
     
+    @tracer.traced()
     async def generate_response(self, prompt: str, user: Optional[User] = None, 
                                page: int = 1, lang: str = DEFAULT_LANGUAGE) -> Tuple[str, int, int]:
         """根据提示生成响应，返回(响应内容, 总页数, 当前页码)"""
-        # 增加延迟模拟真实API调用
-        await asyncio.sleep(0.3)
-        
         # 检查是否询问特定电影的影评
-        for movie_title, movie_info in movie_database.items():
-            if movie_title in prompt:
-                # 尝试从TMDB获取更多信息
-                tmdb_lang = "zh-CN" if lang == "zh" else "en-US" if lang == "en" else "ja-JP"
-                details = await self.get_movie_details(movie_info["id"], tmdb_lang)
-                
+        with tracer.span("title_match"):
+            matched_movie = next(
+                ((title, info) for title, info in self.catalog.items() if title in prompt),
+                None
+            )
+        
+        if matched_movie:
+            movie_title, movie_info = matched_movie
+            # 尝试从TMDB获取更多信息
+            tmdb_lang = "zh-CN" if lang == "zh" else "en-US" if lang == "en" else "ja-JP"
+            details = await self.get_movie_details(movie_info["id"], tmdb_lang)
+            
+            with tracer.span("response_assembly"):
                 rating = details.get("vote_average", movie_info["rating"]) if details else movie_info["rating"]
-                response = self.get_lang_text("movie_info", lang, 
-                                            title=movie_title, 
-                                            rating=rating, 
-                                            genre=movie_info["genre"]) + "\n\n"
-                
-                response += self.get_review_sources(movie_title, movie_info["id"], lang)
+                parts = [
+                    self.get_lang_text("movie_info", lang, 
+                                       title=movie_title, 
+                                       rating=rating, 
+                                       genre=movie_info["genre"]),
+                    "\n\n",
+                    self.get_review_sources(movie_title, movie_info["id"], lang)
+                ]
                 
                 # 如果有TMDB数据，添加更多信息
                 if details:
                     overview = details.get("overview", "")
                     if overview:
-                        response += f"\n\n剧情简介: {overview}"
-                
-                token_count = self.calculate_tokens(response)
-                self.total_tokens += token_count
-                self.interaction_count += 1
-                return (response, 1, 1)
+                        parts.append(f"\n\n剧情简介: {overview}")
+                response = "".join(parts)
+            
+            token_count = self.calculate_tokens(response)
+            self.total_tokens += token_count
+            self.interaction_count += 1
+            return (response, 1, 1)
         
         # 提取评分筛选条件
         min_rating = self.extract_rating_filter(prompt)
@@ -442,110 +560,119 @@ class MovieRecommender:
             "剧情": ["剧情", "故事", "人生", "人性", "drama", "story", "ドラマ", "物語"]
         }
         
-        matched_genres = []
-        for genre, keywords in genre_keywords.items():
-            if any(keyword in prompt for keyword in keywords):
-                matched_genres.append(genre)
+        with tracer.span("genre_match"):
+            matched_genres = []
+            for genre, keywords in genre_keywords.items():
+                if any(keyword in prompt for keyword in keywords):
+                    matched_genres.append(genre)
         
         if matched_genres:
             # 每页显示5部电影
             items_per_page = 5
-            response = self.get_lang_text("recommendation", lang) + "\n\n"
+            # 先从TMDB获取各类型的流行电影（网络耗时记在fetch_tmdb_data里，不计入response_assembly）
+            tmdb_lang = "zh-CN" if lang == "zh" else "en-US" if lang == "en" else "ja-JP"
+            tmdb_results = {}
+            for genre in matched_genres:
+                tmdb_results[genre] = await self.get_popular_movies(genre, page, tmdb_lang)
             
-            # 尝试从TMDB获取流行电影
-            tmdb_movies = None
-            all_filtered_movies = []  # 存储所有符合条件的电影
+            with tracer.span("response_assembly", genres=len(matched_genres)):
+                parts = [self.get_lang_text("recommendation", lang), "\n\n"]
             
-            for genre in matched_genres:
-                # 添加类型和可能的评分筛选条件说明
-                genre_label = self.get_lang_text("genre_movies", lang, genre=genre)
-                if min_rating:
-                    rating_label = self.get_lang_text("rating_filter", lang, min_rating=min_rating)
-                    response += f"{genre_label} {rating_label}\n"
-                else:
-                    response += f"{genre_label}\n"
+                tmdb_movies = None
+                all_filtered_movies = []  # 存储所有符合条件的电影
+            
+                for genre in matched_genres:
+                    # 添加类型和可能的评分筛选条件说明
+                    genre_label = self.get_lang_text("genre_movies", lang, genre=genre)
+                    if min_rating:
+                        rating_label = self.get_lang_text("rating_filter", lang, min_rating=min_rating)
+                        parts.append(f"{genre_label} {rating_label}\n")
+                    else:
+                        parts.append(f"{genre_label}\n")
                 
-                # 先尝试从TMDB获取
-                tmdb_lang = "zh-CN" if lang == "zh" else "en-US" if lang == "en" else "ja-JP"
-                tmdb_movies = await self.get_popular_movies(genre, page, tmdb_lang)
+                    # 先使用TMDB的结果
+                    tmdb_movies = tmdb_results[genre]
                 
-                if tmdb_movies and tmdb_movies.get("results"):
-                    # 筛选出符合评分条件的电影
-                    filtered_movies = []
-                    for movie in tmdb_movies["results"]:
-                        # TMDB评分是10分制
-                        if min_rating is None or (movie.get("vote_average") and movie["vote_average"] >= min_rating):
-                            filtered_movies.append(movie)
+                    if tmdb_movies and tmdb_movies.get("results"):
+                        # 筛选出符合评分条件的电影
+                        filtered_movies = []
+                        for movie in tmdb_movies["results"]:
+                            # TMDB评分是10分制
+                            if min_rating is None or (movie.get("vote_average") and movie["vote_average"] >= min_rating):
+                                filtered_movies.append(movie)
                     
-                    # 保存所有筛选后的电影用于分页
-                    all_filtered_movies.extend(filtered_movies)
+                        # 保存所有筛选后的电影用于分页
+                        all_filtered_movies.extend(filtered_movies)
                     
-                    # 处理分页
-                    start_idx = (page - 1) * items_per_page
-                    end_idx = start_idx + items_per_page
-                    paginated_movies = filtered_movies[start_idx:end_idx]
+                        # 处理分页
+                        start_idx = (page - 1) * items_per_page
+                        end_idx = start_idx + items_per_page
+                        paginated_movies = filtered_movies[start_idx:end_idx]
                     
-                    # 计算总页数
-                    total_pages = max(1, (len(filtered_movies) + items_per_page - 1) // items_per_page)
+                        # 计算总页数
+                        total_pages = max(1, (len(filtered_movies) + items_per_page - 1) // items_per_page)
                     
-                    # 添加电影到响应
-                    for i, movie in enumerate(paginated_movies):
-                        title = movie.get("title", movie.get("original_title", "未知电影"))
-                        rating = movie.get("vote_average", "N/A")
-                        # 格式化评分，保留一位小数
-                        if isinstance(rating, float):
-                            rating = f"{rating:.1f}"
-                        response += f"{start_idx + i + 1}. 《{title}》- 评分{rating}\n"
+                        # 添加电影到响应
+                        for i, movie in enumerate(paginated_movies):
+                            title = movie.get("title", movie.get("original_title", "未知电影"))
+                            rating = movie.get("vote_average", "N/A")
+                            # 格式化评分，保留一位小数
+                            if isinstance(rating, float):
+                                rating = f"{rating:.1f}"
+                            parts.append(f"{start_idx + i + 1}. 《{title}》- 评分{rating}\n")
                         
-                    # 如果没有符合条件的电影
-                    if not filtered_movies:
-                        response += self.get_lang_text("no_movies_matching_criteria", lang) + "\n"
-                else:
-                    # TMDB获取失败，使用本地数据库
-                    movies_in_genre = [
-                        (title, info) for title, info in movie_database.items() 
-                        if info["genre"] == genre
-                    ]
-                    
-                    # 应用评分筛选
-                    if min_rating is not None:
+                        # 如果没有符合条件的电影
+                        if not filtered_movies:
+                            parts.append(self.get_lang_text("no_movies_matching_criteria", lang))
+                            parts.append("\n")
+                    else:
+                        # TMDB获取失败，使用本地数据库
                         movies_in_genre = [
-                            (title, info) for title, info in movies_in_genre
-                            if info["rating"] >= min_rating
+                            (title, info) for title, info in self.catalog.items() 
+                            if info["genre"] == genre
                         ]
                     
-                    # 按评分排序
-                    movies_in_genre.sort(key=lambda x: x[1]["rating"], reverse=True)
+                        # 应用评分筛选
+                        if min_rating is not None:
+                            movies_in_genre = [
+                                (title, info) for title, info in movies_in_genre
+                                if info["rating"] >= min_rating
+                            ]
                     
-                    # 分页处理
-                    start_idx = (page - 1) * items_per_page
-                    end_idx = start_idx + items_per_page
-                    paginated_movies = movies_in_genre[start_idx:end_idx]
-                    total_pages = max(1, (len(movies_in_genre) + items_per_page - 1) // items_per_page)
+                        # 按评分排序
+                        movies_in_genre.sort(key=lambda x: x[1]["rating"], reverse=True)
                     
-                    # 添加电影到响应
-                    for i, (title, info) in enumerate(paginated_movies):
-                        response += f"{start_idx + i + 1}. 《{title}》- 评分{info['rating']}\n"
+                        # 分页处理
+                        start_idx = (page - 1) * items_per_page
+                        end_idx = start_idx + items_per_page
+                        paginated_movies = movies_in_genre[start_idx:end_idx]
+                        total_pages = max(1, (len(movies_in_genre) + items_per_page - 1) // items_per_page)
+                    
+                        # 添加电影到响应
+                        for i, (title, info) in enumerate(paginated_movies):
+                            parts.append(f"{start_idx + i + 1}. 《{title}》- 评分{info['rating']}\n")
                         
-                    # 如果没有符合条件的电影
-                    if not movies_in_genre:
-                        response += self.get_lang_text("no_movies_matching_criteria", lang) + "\n"
+                        # 如果没有符合条件的电影
+                        if not movies_in_genre:
+                            parts.append(self.get_lang_text("no_movies_matching_criteria", lang))
+                            parts.append("\n")
                 
-                response += "\n"
+                    parts.append("\n")
             
-            response += self.get_lang_text("try_options", lang)
+                parts.append(self.get_lang_text("try_options", lang))
             
-            # 添加分页信息
-            if tmdb_movies and all_filtered_movies:
-                total_pages = max(1, (len(all_filtered_movies) + items_per_page - 1) // items_per_page)
-            elif not tmdb_movies:
-                total_movies = sum(len([t for t, i in movie_database.items() if i["genre"] == g]) for g in matched_genres)
-                total_pages = max(1, (total_movies + items_per_page - 1) // items_per_page)
-            else:
-                total_pages = 1
+                # 添加分页信息
+                if tmdb_movies and all_filtered_movies:
+                    total_pages = max(1, (len(all_filtered_movies) + items_per_page - 1) // items_per_page)
+                elif not tmdb_movies:
+                    total_movies = sum(len([t for t, i in self.catalog.items() if i["genre"] == g]) for g in matched_genres)
+                    total_pages = max(1, (total_movies + items_per_page - 1) // items_per_page)
+                else:
+                    total_pages = 1
                 
-            if total_pages > 1:
-                response += f"\n{self.get_lang_text('page', lang)} {page}/{total_pages} | {self.get_lang_text('load_more', lang)}"
+                if total_pages > 1:
+                    parts.append(f"\n{self.get_lang_text('page', lang)} {page}/{total_pages} | {self.get_lang_text('load_more', lang)}")
+                response = "".join(parts)
             
             token_count = self.calculate_tokens(response)
             self.total_tokens += token_count
@@ -553,8 +680,7 @@ class MovieRecommender:
             return (response, total_pages, page)
         
         # 默认回复
-        response = self.get_lang_text("no_info", lang) + "\n\n"
-        response += self.get_lang_text("try_options", lang)
+        response = "".join([self.get_lang_text("no_info", lang), "\n\n", self.get_lang_text("try_options", lang)])
         
         token_count = self.calculate_tokens(response)
         self.total_tokens += token_count
@@ -574,6 +700,7 @@ async def get_current_user(token: Optional[str]) -> Optional[User]:
         return None
     return user_sessions.get(token)
 
+@tracer.traced()
 async def recommend_movie(query: str, user_token: Optional[str] = None, 
                          page: int = 1, lang: str = DEFAULT_LANGUAGE) -> Tuple[str, int, int]:
     """处理电影推荐请求"""
@@ -589,6 +716,19 @@ async def recommend_movie(query: str, user_token: Optional[str] = None,
         
     return (response, total_pages, current_page)
 
+async def stream_commentary(query: str, result: str, lang: str = DEFAULT_LANGUAGE):
+    """基于推荐结果流式生成AI点评（SSE），未配置模型时不产出任何内容"""
+    client = get_client()
+    if not (LLM_COMMENTARY and client.api_key and query.strip()):
+        return
+    prompt = recommender.get_lang_text("commentary_prompt", lang, query=query, result=result)
+    with tracer.span("llm_commentary", lang=lang):
+        try:
+            async for chunk in client.astream_complete(prompt, temperature=0.7):
+                yield chunk
+        except Exception as e:
+            yield f"\n[{str(e)}]"
+
 async def user_login(username: str, password: str) -> Tuple[Optional[str], str]:
     """用户登录"""
     hashed_pw = hashlib.sha256(password.encode()).hexdigest()
@@ -767,27 +907,29 @@ with gr.Blocks(title=recommender.get_lang_text("app_title"), theme=gr.themes.Sof
     
     # 查询处理
     async def handle_query(query, token, page, lang):
-        # 显示加载状态
-        loading_visible = True
-        output_visible = False
-        
         # 执行查询
         result, total, current = await recommend_movie(query, token, page, lang)
         
-        # 隐藏加载状态，显示结果
-        loading_visible = False
-        output_visible = True
+        # 隐藏加载状态，先显示推荐结果
         pagination_visible = total > 1
         page_info_text = f"{current}/{total}"
         
-        return {
-            loading: gr.update(value=recommender.get_lang_text("loading", lang), visible=loading_visible),
-            output: gr.update(value=result, visible=output_visible),
+        yield {
+            loading: gr.update(value=recommender.get_lang_text("loading", lang), visible=False),
+            output: gr.update(value=result, visible=True),
             total_pages: total,
             current_page: current,
             pagination_row: gr.update(visible=pagination_visible),
             page_info: gr.update(value=page_info_text)
         }
+        
+        # 再把模型输出逐段追加到结果后面
+        text = None
+        async for chunk in stream_commentary(query, result, lang):
+            if text is None:
+                text = f"{result}\n\n{recommender.get_lang_text('ai_commentary', lang)}\n"
+            text += chunk
+            yield {output: gr.update(value=text)}
     
     submit_btn.click(
         fn=lambda q, t, l: {loading: gr.update(visible=True), output: gr.update(visible=False)},
@@ -977,6 +1119,12 @@ async def api_login(request: LoginRequest):
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+# 追踪数据：火焰图（collapsed格式）
+@app.get("/api/traces/flamegraph", dependencies=[Depends(get_api_key)], response_class=PlainTextResponse)
+async def api_flamegraph():
+    """导出已采样请求的火焰图数据"""
+    return tracer.flamegraph.dump()
+
 # 将Gradio应用挂载到FastAPI
 # app = gr.mount_gradio_app(app, demo, path="/")
 
@@ -994,16 +1142,48 @@ async def api_login(request: LoginRequest):
 # # 创建Gradio界面
 
 
-# 将Gradio应用挂载到FastAPI
-app = gr.mount_gradio_app(app, demo, path="/")
+# 配置Gradio队列并挂载到FastAPI（同一进程、同一事件循环）
+demo.queue(default_concurrency_limit=GRADIO_CONCURRENCY_LIMIT, max_size=GRADIO_MAX_QUEUE)
+if WEB_MOUNT_UI:
+    app = gr.mount_gradio_app(app, demo, path="/")
 
-if __name__ == "__main__":
+def run_single_server(workers: int = WEB_WORKERS, api_only: bool = not WEB_MOUNT_UI):
+    """单服务部署：FastAPI与Gradio共用一个uvicorn服务
+
+    Gradio队列用一个请求加入任务、另一个请求通过SSE取结果，两者必须落到同一进程，
+    所以挂载界面时只能单进程运行；多进程只用于纯API部署（api_only=True），
+    此时每个工作进程都有独立的user_sessions，登录令牌需配合粘性会话使用。
+    也可以用gunicorn启动纯API服务：
+        WEB_MOUNT_UI=0 gunicorn app3:app --chdir week1 -k uvicorn.workers.UvicornWorker -w 4 -b 127.0.0.1:7860
+    """
+    import uvicorn
+    
+    if workers > 1 and not api_only:
+        raise ValueError("挂载Gradio界面时只能使用1个工作进程；多进程部署请只提供API（--api-only或WEB_MOUNT_UI=0）")
+    
+    if api_only:
+        # 以导入字符串传入应用，工作进程重新导入app3时读到WEB_MOUNT_UI=0，不挂载界面
+        os.environ["WEB_MOUNT_UI"] = "0"
+        target = "app3:app"
+    else:
+        target = app
+    uvicorn.run(
+        target,
+        host=SERVER_HOST,
+        port=SERVER_PORT,
+        workers=workers,
+        limit_concurrency=SERVER_CONCURRENCY_LIMIT,
+        app_dir=os.path.dirname(os.path.abspath(__file__))  # 不依赖当前工作目录解析"app3:app"
+    )
+
+def run_share_server():
+    """旧的双服务模式：uvicorn线程提供API，demo.launch提供公网分享链接"""
     import threading
     import uvicorn
     
     # 启动FastAPI服务器的函数
     def run_fastapi():
-        uvicorn.run(app, host="127.0.0.1", port=7860)
+        uvicorn.run(app, host=SERVER_HOST, port=SERVER_PORT)
     
     # 在单独线程中启动FastAPI
     fastapi_thread = threading.Thread(target=run_fastapi, daemon=True)
@@ -1011,11 +1191,23 @@ if __name__ == "__main__":
     
     # 启动Gradio并启用分享功能（不传递app参数）
     demo.launch(
-        server_name="127.0.0.1", 
-        server_port=7861,  # 使用不同端口避免冲突
+        server_name=SERVER_HOST, 
+        server_port=SERVER_PORT + 1,  # 使用不同端口避免冲突
         share=True
     )
 
-
-
-    
\ No newline at end of file
+if __name__ == "__main__":
+    import argparse
+    
+    parser = argparse.ArgumentParser(description="AI电影顾问服务")
+    parser.add_argument("--workers", type=int, default=WEB_WORKERS, help="uvicorn工作进程数（大于1时需配合--api-only）")
+    parser.add_argument("--api-only", action="store_true", default=not WEB_MOUNT_UI, help="只提供API，不挂载Gradio界面")
+    parser.add_argument("--share", action="store_true", help="使用旧的双服务模式并生成Gradio分享链接")
+    args = parser.parse_args()
+    
+    if args.share:
+        run_share_server()
+    elif args.workers > 1 and not args.api_only:
+        parser.error("挂载Gradio界面时只能使用1个工作进程，多进程部署请加--api-only")
+    else:
+        run_single_server(args.workers, args.api_only)
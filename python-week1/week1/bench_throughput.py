@@ -0,0 +1,118 @@
+# bench_throughput.py
+"""单服务部署吞吐量基准：按不同工作进程数启动app3，统计每核吞吐量
+
+挂载Gradio界面时app3只能单进程运行，多进程的轮次以--api-only启动（只压测/api/predict，不受影响）；
+加--api-only可让所有轮次都不挂载界面，便于横向比较"""
+import os
+import sys
+import time
+import random
+import asyncio
+import argparse
+import subprocess
+import httpx
+
+API_KEY = os.getenv("TMDB_API_KEY", "048b542052a89f315fa7c6b74bd253f9")  # 与app3中的校验一致
+QUERIES = [
+    "推荐科幻电影",
+    "头号玩家影评",
+    "最近有什么好看的浪漫电影",
+    "科幻电影评分7.0以上",
+    "推荐喜剧电影"
+]
+
+
+async def wait_until_ready(base_url: str, timeout: float = 60) -> None:
+    """等待服务启动"""
+    deadline = time.time() + timeout
+    async with httpx.AsyncClient() as client:
+        while time.time() < deadline:
+            try:
+                await client.get(f"{base_url}/docs", timeout=1)
+                return
+            except httpx.HTTPError:
+                await asyncio.sleep(0.5)
+    raise RuntimeError(f"服务在{timeout}秒内未启动: {base_url}")
+
+
+async def run_load(base_url: str, concurrency: int, duration: float) -> dict:
+    """固定并发的闭环压测，返回请求数和错误数"""
+    completed = 0
+    errors = 0
+    deadline = time.perf_counter() + duration
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=30) as client:
+        async def worker():
+            nonlocal completed, errors
+            while time.perf_counter() < deadline:
+                payload = {"data": [random.choice(QUERIES)], "lang": random.choice(["zh", "en", "ja"])}
+                try:
+                    response = await client.post("/api/predict", json=payload, headers={"TMDB_API_KEY": API_KEY})
+                    if response.status_code == 200:
+                        completed += 1
+                    else:
+                        errors += 1
+                except httpx.HTTPError:
+                    errors += 1
+
+        start = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - start
+
+    return {"completed": completed, "errors": errors, "elapsed": elapsed}
+
+
+def benchmark_workers(workers: int, port: int, concurrency: int, duration: float, api_only: bool = False) -> dict:
+    """启动指定进程数的服务并压测"""
+    api_only = api_only or workers > 1
+    env = dict(os.environ, SERVER_PORT=str(port))
+    command = [sys.executable, "app3.py", "--workers", str(workers)]
+    if api_only:
+        command.append("--api-only")
+    server = subprocess.Popen(
+        command,
+        cwd=os.path.dirname(os.path.abspath(__file__)),
+        env=env,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL
+    )
+    base_url = f"http://127.0.0.1:{port}"
+    try:
+        asyncio.run(wait_until_ready(base_url))
+        result = asyncio.run(run_load(base_url, concurrency, duration))
+    finally:
+        server.terminate()
+        server.wait(timeout=30)
+
+    cores = min(workers, os.cpu_count() or 1)
+    rps = result["completed"] / result["elapsed"]
+    return {
+        "workers": workers,
+        "mode": "API" if api_only else "API+UI",
+        "rps": rps,
+        "rps_per_worker": rps / workers,
+        "rps_per_core": rps / cores,
+        "errors": result["errors"]
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="app3单服务吞吐量基准")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4], help="要测试的工作进程数")
+    parser.add_argument("--concurrency", type=int, default=64, help="客户端并发连接数")
+    parser.add_argument("--duration", type=float, default=20, help="每轮压测时长（秒）")
+    parser.add_argument("--port", type=int, default=7870)
+    parser.add_argument("--api-only", action="store_true", help="所有轮次都不挂载Gradio界面（多进程轮次总是如此）")
+    args = parser.parse_args()
+
+    print(f"CPU核数: {os.cpu_count()} | 并发: {args.concurrency} | 每轮: {args.duration}秒")
+    print(f"{'进程数':>6} {'模式':>8} {'RPS':>10} {'RPS/进程':>10} {'RPS/核':>10} {'错误':>6}")
+    for workers in args.workers:
+        stats = benchmark_workers(workers, args.port, args.concurrency, args.duration, args.api_only)
+        print(f"{stats['workers']:>6} {stats['mode']:>8} {stats['rps']:>10.1f} {stats['rps_per_worker']:>10.1f} "
+              f"{stats['rps_per_core']:>10.1f} {stats['errors']:>6}")
+
+
+if __name__ == "__main__":
+    main()
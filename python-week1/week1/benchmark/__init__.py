@@ -0,0 +1,2 @@
+# benchmark
+"""电影推荐API压测工具包：命名场景、HDR直方图统计、JSON结果与基线回归检查"""
@@ -0,0 +1,229 @@
+# capacity.py
+"""容量探测：开放模型（恒定到达率）逐级加压，找到p99超过SLO的拐点
+
+与locust的闭环用户不同，这里按计划时间发送请求，不等待上一个请求返回；
+延迟从"计划发送时间"开始计算，服务排队造成的等待也会计入（避免协调遗漏）。
+
+用法（在week1目录下）：
+    python -m benchmark.capacity --launch --workers 2 --slo-ms 500
+    python -m benchmark.capacity --host http://127.0.0.1:7860 --workers 4 --start-rps 20
+"""
+import os
+import sys
+import time
+import random
+import asyncio
+import argparse
+import subprocess
+import httpx
+from .histogram import HdrHistogram
+from .queries import HOT_QUERIES, cold_query
+from .results import write_results
+
+API_KEY = os.getenv("BENCH_API_KEY", os.getenv("TMDB_API_KEY", "048b542052a89f315fa7c6b74bd253f9"))
+WEEK1_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+async def run_step(host: str, rps: float, duration: float, timeout: float,
+                   max_in_flight: int, cold_ratio: float, rng: random.Random) -> dict:
+    """以恒定到达率运行一个阶段，返回该阶段的延迟与错误统计"""
+    loop = asyncio.get_running_loop()
+    histogram = HdrHistogram()
+    errors = 0
+    dropped = 0
+    in_flight = set()
+    limits = httpx.Limits(max_connections=max_in_flight, max_keepalive_connections=max_in_flight)
+
+    async with httpx.AsyncClient(base_url=host, limits=limits, timeout=timeout) as client:
+        async def send(payload: dict, scheduled: float):
+            nonlocal errors
+            try:
+                response = await client.post("/api/predict", json=payload, headers={"TMDB_API_KEY": API_KEY})
+                ok = response.status_code == 200
+            except httpx.HTTPError:
+                ok = False
+            # 从计划发送时间计时
+            histogram.record((loop.time() - scheduled) * 1_000_000)
+            if not ok:
+                errors += 1
+
+        total = int(rps * duration)
+        start = loop.time()
+        for i in range(total):
+            scheduled = start + i / rps
+            delay = scheduled - loop.time()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            if len(in_flight) >= max_in_flight:
+                # 客户端并发已满，说明服务早已过载，记为失败
+                dropped += 1
+                continue
+            query = cold_query(rng) if rng.random() < cold_ratio else rng.choice(HOT_QUERIES)
+            payload = {"data": [query], "lang": rng.choice(["zh", "en", "ja"])}
+            task = asyncio.create_task(send(payload, scheduled))
+            in_flight.add(task)
+            task.add_done_callback(in_flight.discard)
+        send_elapsed = loop.time() - start
+        if in_flight:
+            await asyncio.gather(*in_flight)
+
+    attempted = histogram.total_count + dropped
+    return {
+        "target_rps": rps,
+        "offered_rps": attempted / send_elapsed if send_elapsed > 0 else 0.0,
+        "requests": attempted,
+        "errors": errors + dropped,
+        "error_rate": (errors + dropped) / attempted if attempted else 0.0,
+        "p50_ms": histogram.percentile(50) / 1000,
+        "p99_ms": histogram.percentile(99) / 1000,
+        "max_ms": histogram.max_value / 1000
+    }
+
+
+def step_passes(step: dict, slo_ms: float, max_error_rate: float) -> bool:
+    return step["p99_ms"] <= slo_ms and step["error_rate"] <= max_error_rate
+
+
+async def find_capacity(args) -> dict:
+    """逐级加压找到拐点，再在最后一个达标阶段与拐点之间二分细化"""
+    rng = random.Random(args.seed)
+    steps = []
+
+    async def measure(rps: float) -> dict:
+        step = await run_step(args.host, rps, args.step_duration, args.timeout,
+                              args.max_in_flight, args.cold_ratio, rng)
+        step["passed"] = step_passes(step, args.slo_ms, args.max_error_rate)
+        steps.append(step)
+        mark = "✅" if step["passed"] else "❌"
+        print(f"{mark} 目标 {rps:8.1f} rps | 实发 {step['offered_rps']:8.1f} | "
+              f"p50 {step['p50_ms']:8.1f}ms | p99 {step['p99_ms']:8.1f}ms | 错误率 {step['error_rate']:.2%}")
+        if step["offered_rps"] < rps * 0.95:
+            print("⚠️ 压测客户端未能达到目标速率，结果可能受客户端限制")
+        return step
+
+    if args.warmup > 0:
+        await run_step(args.host, args.start_rps, args.warmup, args.timeout,
+                       args.max_in_flight, args.cold_ratio, rng)
+
+    last_good, first_bad = 0.0, None
+    rps = args.start_rps
+    while rps <= args.max_rps:
+        if (await measure(rps))["passed"]:
+            last_good = rps
+            rps *= args.step_factor
+        else:
+            first_bad = rps
+            break
+
+    # 二分细化拐点
+    if first_bad is not None:
+        low, high = last_good, first_bad
+        for _ in range(args.refine_steps):
+            mid = (low + high) / 2
+            if high - mid < 1:
+                break
+            if (await measure(mid))["passed"]:
+                low = mid
+            else:
+                high = mid
+        last_good, first_bad = low, high
+
+    cores = min(args.workers, os.cpu_count() or 1)
+    return {
+        "slo_p99_ms": args.slo_ms,
+        "max_error_rate": args.max_error_rate,
+        "workers": args.workers,
+        "cores": cores,
+        "max_rps": last_good,
+        "knee_rps": first_bad,
+        "max_rps_per_worker": last_good / args.workers,
+        "max_rps_per_core": last_good / cores,
+        "steps": steps
+    }
+
+
+def wait_for(url: str, timeout: float = 60) -> None:
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            httpx.get(url, timeout=1)
+            return
+        except httpx.HTTPError:
+            time.sleep(0.5)
+    raise RuntimeError(f"服务在{timeout}秒内未启动: {url}")
+
+
+def launch_stack(args) -> list:
+    """启动TMDB模拟服务和app3，返回子进程列表"""
+    mock_url = f"http://127.0.0.1:{args.mock_port}"
+    mock = subprocess.Popen(
+        [sys.executable, "-m", "benchmark.mock_tmdb", "--port", str(args.mock_port),
+         "--latency-ms", str(args.mock_latency_ms)],
+        cwd=WEEK1_DIR, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    env = dict(os.environ, TMDB_BASE_URL=f"{mock_url}/3", SERVER_PORT=str(args.app_port))
+    command = [sys.executable, "app3.py", "--workers", str(args.workers)]
+    if args.workers > 1:
+        command.append("--api-only")  # 挂载Gradio界面时app3只能单进程运行；压测只用到/api/predict
+    server = subprocess.Popen(
+        command,
+        cwd=WEEK1_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    processes = [mock, server]
+    try:
+        wait_for(f"{mock_url}/docs")
+        wait_for(f"http://127.0.0.1:{args.app_port}/docs")
+    except RuntimeError:
+        stop_stack(processes)
+        raise
+    args.host = f"http://127.0.0.1:{args.app_port}"
+    return processes
+
+
+def stop_stack(processes: list) -> None:
+    for process in processes:
+        process.terminate()
+        process.wait(timeout=30)
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="推荐API容量探测（开放模型）")
+    parser.add_argument("--host", default="http://127.0.0.1:7860")
+    parser.add_argument("--workers", type=int, default=1, help="被测服务的工作进程数（用于折算每进程/每核容量）")
+    parser.add_argument("--slo-ms", type=float, default=500, help="p99延迟SLO")
+    parser.add_argument("--max-error-rate", type=float, default=0.01)
+    parser.add_argument("--start-rps", type=float, default=10)
+    parser.add_argument("--max-rps", type=float, default=5000)
+    parser.add_argument("--step-factor", type=float, default=1.5, help="每级到达率的增长倍数")
+    parser.add_argument("--step-duration", type=float, default=20, help="每级持续时间（秒）")
+    parser.add_argument("--refine-steps", type=int, default=4, help="拐点二分细化次数")
+    parser.add_argument("--warmup", type=float, default=5)
+    parser.add_argument("--timeout", type=float, default=10)
+    parser.add_argument("--max-in-flight", type=int, default=1000)
+    parser.add_argument("--cold-ratio", type=float, default=0.3, help="冷查询占比")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--launch", action="store_true", help="自动启动TMDB模拟服务和app3")
+    parser.add_argument("--app-port", type=int, default=7870)
+    parser.add_argument("--mock-port", type=int, default=7900)
+    parser.add_argument("--mock-latency-ms", type=float, default=50)
+    parser.add_argument("--output", default=os.path.join(WEEK1_DIR, "benchmark", "results", "capacity.json"))
+    args = parser.parse_args()
+
+    processes = launch_stack(args) if args.launch else []
+    try:
+        report = asyncio.run(find_capacity(args))
+    finally:
+        stop_stack(processes)
+
+    os.makedirs(os.path.dirname(args.output), exist_ok=True)
+    write_results(report, args.output)
+    print(f"\n===== 容量报告 (p99 SLO {args.slo_ms}ms) =====")
+    print(f"最大可持续吞吐: {report['max_rps']:.1f} rps")
+    print(f"拐点: {report['knee_rps'] or '未达到'}")
+    print(f"每进程: {report['max_rps_per_worker']:.1f} rps | 每核: {report['max_rps_per_core']:.1f} rps "
+          f"({report['workers']}进程 / {report['cores']}核)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
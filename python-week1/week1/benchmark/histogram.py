@@ -0,0 +1,108 @@
+# histogram.py
+"""HDR风格的对数-线性直方图：固定有效位数，内存只与取值范围有关，与样本数无关"""
+import math
+from typing import Dict, Iterable
+
+
+class HdrHistogram:
+    """记录整数值（默认单位微秒），在给定有效数字精度下计算任意百分位"""
+
+    def __init__(self, significant_figures: int = 3):
+        if not 1 <= significant_figures <= 5:
+            raise ValueError("significant_figures必须在1到5之间")
+        self.significant_figures = significant_figures
+        # 每个量级内的线性子桶数：保证相对误差不超过 10^-significant_figures
+        self.sub_bucket_bits = math.ceil(math.log2(2 * 10 ** significant_figures))
+        self.sub_bucket_count = 1 << self.sub_bucket_bits
+        self.sub_bucket_half = self.sub_bucket_count >> 1
+        self.counts: Dict[int, int] = {}
+        self.total_count = 0
+        self.total_sum = 0
+        self.min_value = None
+        self.max_value = 0
+
+    def _index(self, value: int) -> int:
+        if value < self.sub_bucket_count:
+            return value
+        shift = value.bit_length() - self.sub_bucket_bits
+        return self.sub_bucket_count + (shift - 1) * self.sub_bucket_half + ((value >> shift) - self.sub_bucket_half)
+
+    def _highest_equivalent(self, index: int) -> int:
+        """桶内最大值（与HdrHistogram的highestEquivalentValue一致）"""
+        if index < self.sub_bucket_count:
+            return index
+        offset = index - self.sub_bucket_count
+        shift = offset // self.sub_bucket_half + 1
+        sub_bucket = offset % self.sub_bucket_half + self.sub_bucket_half
+        return (sub_bucket << shift) + (1 << shift) - 1
+
+    def record(self, value: float, count: int = 1) -> None:
+        """记录一个取值（负数按0处理）"""
+        value = max(0, int(value))
+        index = self._index(value)
+        self.counts[index] = self.counts.get(index, 0) + count
+        self.total_count += count
+        self.total_sum += value * count
+        if self.min_value is None or value < self.min_value:
+            self.min_value = value
+        if value > self.max_value:
+            self.max_value = value
+
+    def merge(self, other: "HdrHistogram") -> None:
+        """合并另一个同精度直方图"""
+        if other.significant_figures != self.significant_figures:
+            raise ValueError("只能合并相同精度的直方图")
+        for index, count in other.counts.items():
+            self.counts[index] = self.counts.get(index, 0) + count
+        self.total_count += other.total_count
+        self.total_sum += other.total_sum
+        if other.min_value is not None and (self.min_value is None or other.min_value < self.min_value):
+            self.min_value = other.min_value
+        self.max_value = max(self.max_value, other.max_value)
+
+    def percentile(self, percent: float) -> int:
+        """返回百分位值，例如 percentile(99.9)"""
+        if self.total_count == 0:
+            return 0
+        target = max(1, math.ceil(percent / 100 * self.total_count))
+        seen = 0
+        for index in sorted(self.counts):
+            seen += self.counts[index]
+            if seen >= target:
+                return min(self._highest_equivalent(index), self.max_value)
+        return self.max_value
+
+    def percentiles(self, percents: Iterable[float] = (50, 95, 99, 99.9)) -> Dict[str, int]:
+        """一次性计算多个百分位，键形如 p50 / p999"""
+        return {f"p{str(p).replace('.', '')}": self.percentile(p) for p in percents}
+
+    @property
+    def mean(self) -> float:
+        return self.total_sum / self.total_count if self.total_count else 0.0
+
+    def reset(self) -> None:
+        self.counts.clear()
+        self.total_count = 0
+        self.total_sum = 0
+        self.min_value = None
+        self.max_value = 0
+
+    def to_dict(self) -> Dict:
+        """序列化为JSON友好结构（稀疏桶），可用于合并多进程结果"""
+        return {
+            "significant_figures": self.significant_figures,
+            "counts": {str(index): count for index, count in sorted(self.counts.items())},
+            "total_sum": self.total_sum,
+            "min": self.min_value,
+            "max": self.max_value
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> "HdrHistogram":
+        histogram = cls(data["significant_figures"])
+        histogram.counts = {int(index): count for index, count in data["counts"].items()}
+        histogram.total_count = sum(histogram.counts.values())
+        histogram.total_sum = data["total_sum"]
+        histogram.min_value = data["min"]
+        histogram.max_value = data["max"]
+        return histogram
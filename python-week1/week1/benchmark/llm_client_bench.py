@@ -0,0 +1,83 @@
+# llm_client_bench.py
+"""对比裸requests.post与共享LLMClient（连接池/线程并发/asyncio）在本地桩服务上的开销
+
+用法（在week1目录下）：
+    python -m benchmark.llm_client_bench --calls 200 --concurrency 8 --latency-ms 20
+"""
+import time
+import asyncio
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+import requests
+from llm_client import LLMClient
+import common_path  # noqa: F401  各周共用的模块（python-week1/common）
+from openai_stub import start_stub_server
+
+
+def bench_naive(endpoint: str, calls: int) -> float:
+    """原来的写法：每次requests.post都新建连接"""
+    payload = {"model": "stub", "messages": [{"role": "user", "content": "你好"}]}
+    start = time.perf_counter()
+    for _ in range(calls):
+        requests.post(endpoint, json=payload).raise_for_status()
+    return time.perf_counter() - start
+
+
+def bench_pooled(client: LLMClient, calls: int) -> float:
+    start = time.perf_counter()
+    for _ in range(calls):
+        client.complete("你好")
+    return time.perf_counter() - start
+
+
+def bench_threaded(client: LLMClient, calls: int, concurrency: int) -> float:
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        list(executor.map(lambda _: client.complete("你好"), range(calls)))
+    return time.perf_counter() - start
+
+
+def bench_async(client: LLMClient, calls: int) -> float:
+    async def run():
+        start = time.perf_counter()
+        await asyncio.gather(*(client.acomplete("你好") for _ in range(calls)))
+        elapsed = time.perf_counter() - start
+        await client.aclose()
+        return elapsed
+    return asyncio.run(run())
+
+
+def main():
+    parser = argparse.ArgumentParser(description="LLM客户端基准")
+    parser.add_argument("--calls", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--latency-ms", type=float, default=20)
+    args = parser.parse_args()
+
+    server = start_stub_server(latency_ms=args.latency_ms)
+    endpoint = f"http://127.0.0.1:{server.server_port}/v1/chat/completions"
+    client = LLMClient(endpoint=endpoint, api_key="stub", max_concurrency=args.concurrency,
+                       pool_size=args.concurrency, use_cache=False)  # 关闭响应缓存，只测网络开销
+
+    # (名称, 是否串行, 耗时)
+    results = [
+        ("requests.post（无连接池，串行）", True, bench_naive(endpoint, args.calls)),
+        ("LLMClient.complete（连接池，串行）", True, bench_pooled(client, args.calls)),
+        (f"LLMClient.complete（{args.concurrency}线程）", False,
+         bench_threaded(client, args.calls, args.concurrency)),
+        (f"LLMClient.acomplete（asyncio，并发上限{args.concurrency}）", False, bench_async(client, args.calls)),
+    ]
+    server.shutdown()
+
+    print(f"调用次数: {args.calls} | 桩服务延迟: {args.latency_ms}ms")
+    for name, serial, elapsed in results:
+        per_call_ms = elapsed / args.calls * 1000
+        line = f"{name:<44} 总耗时 {elapsed:7.2f}s | 每次 {per_call_ms:7.2f}ms | 吞吐 {args.calls / elapsed:8.1f}/s"
+        if serial:
+            # 串行时每次耗时减去桩延迟即为客户端/建连开销
+            line += f" | 额外开销 {per_call_ms - args.latency_ms:6.2f}ms"
+        print(line)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+# mock_tmdb.py
+"""本地TMDB模拟服务：返回确定性的假数据并注入可配置延迟，用于离线压测
+
+用法（在week1目录下）：
+    python -m benchmark.mock_tmdb --port 7900 --latency-ms 50
+    TMDB_BASE_URL=http://127.0.0.1:7900/3 python app3.py
+"""
+import os
+import random
+import asyncio
+import argparse
+from typing import Optional
+from fastapi import FastAPI
+
+MOCK_LATENCY_MS = float(os.getenv("MOCK_TMDB_LATENCY_MS", "50"))
+MOCK_JITTER = float(os.getenv("MOCK_TMDB_JITTER", "0.2"))  # 延迟的随机抖动比例
+RESULTS_PER_PAGE = 20
+TOTAL_PAGES = 5
+
+app = FastAPI(title="Mock TMDB")
+
+
+async def simulate_latency() -> None:
+    if MOCK_LATENCY_MS > 0:
+        jitter = random.uniform(1 - MOCK_JITTER, 1 + MOCK_JITTER)
+        await asyncio.sleep(MOCK_LATENCY_MS * jitter / 1000)
+
+
+def fake_movie(movie_id: int, language: str = "zh-CN") -> dict:
+    """根据ID生成确定性的电影数据"""
+    rng = random.Random(movie_id)
+    return {
+        "id": movie_id,
+        "title": f"Mock Movie {movie_id}",
+        "original_title": f"Mock Movie {movie_id}",
+        "vote_average": round(rng.uniform(5.0, 9.5), 1),
+        "release_date": f"{rng.randint(1990, 2024)}-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}",
+        "overview": f"[{language}] Overview of mock movie {movie_id}."
+    }
+
+
+def fake_page(seed: int, page: int, language: str) -> dict:
+    base = seed * 1000 + (page - 1) * RESULTS_PER_PAGE
+    return {
+        "page": page,
+        "results": [fake_movie(base + i, language) for i in range(RESULTS_PER_PAGE)],
+        "total_pages": TOTAL_PAGES,
+        "total_results": TOTAL_PAGES * RESULTS_PER_PAGE
+    }
+
+
+@app.get("/3/movie/popular")
+async def popular(page: int = 1, language: str = "zh-CN", with_genres: Optional[int] = None):
+    await simulate_latency()
+    return fake_page(with_genres or 1, page, language)
+
+
+@app.get("/3/search/movie")
+async def search_movie(query: str = "", page: int = 1, language: str = "zh-CN"):
+    await simulate_latency()
+    return fake_page(sum(map(ord, query)) % 997, page, language)
+
+
+@app.get("/3/movie/{movie_id}/similar")
+async def similar(movie_id: int, page: int = 1):
+    await simulate_latency()
+    return fake_page(movie_id % 997, page, "en-US")
+
+
+@app.get("/3/movie/{movie_id}")
+async def movie_details(movie_id: int, language: str = "zh-CN"):
+    await simulate_latency()
+    return fake_movie(movie_id, language)
+
+
+@app.get("/3/search/person")
+async def search_person(query: str = ""):
+    await simulate_latency()
+    person_id = sum(map(ord, query)) % 100000
+    return {"page": 1, "results": [{"id": person_id, "name": query}], "total_results": 1}
+
+
+@app.get("/3/person/{person_id}/movie_credits")
+async def movie_credits(person_id: int):
+    await simulate_latency()
+    crew = [dict(fake_movie(person_id * 100 + i), job="Director") for i in range(10)]
+    return {"id": person_id, "cast": [], "crew": crew}
+
+
+if __name__ == "__main__":
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description="TMDB模拟服务")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=7900)
+    parser.add_argument("--latency-ms", type=float, default=MOCK_LATENCY_MS)
+    args = parser.parse_args()
+
+    MOCK_LATENCY_MS = args.latency_ms
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
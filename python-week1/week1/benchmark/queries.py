@@ -0,0 +1,38 @@
+# queries.py
+"""压测查询集合（不依赖locust，供各类压测工具共用）"""
+
+# 热点查询：命中电影库和TMDB缓存
+HOT_QUERIES = [
+    "推荐科幻电影",
+    "头号玩家影评",
+    "最近有什么好看的浪漫电影",
+    "推荐喜剧电影",
+    "盗梦空间评价",
+    "泰坦尼克号影评",
+    "肖申克的救赎影评"
+]
+# 冷查询模板：评分条件和关键词组合不断变化，尽量绕开缓存
+COLD_QUERY_TEMPLATES = [
+    "{genre}电影评分{rating}以上",
+    "rating above {rating} {genre_en} movies",
+    "{genre}映画で評価{rating}以上",
+    "{rating}分以上的{genre}片"
+]
+GENRES = [("科幻", "sci-fi"), ("浪漫", "romance"), ("喜剧", "comedy"), ("剧情", "drama")]
+MULTI_GENRE_QUERIES = [
+    "推荐浪漫喜剧电影",
+    "科幻和剧情电影推荐",
+    "适合情侣看的搞笑电影",
+    "未来科技题材的爱情故事",
+    "romance comedy drama movies",
+    "SFとコメディの映画"
+]
+PAGINATION_QUERIES = ["推荐科幻电影", "最近有什么好看的浪漫电影", "推荐剧情片"]
+
+
+def cold_query(rng) -> str:
+    """生成一条冷查询"""
+    genre, genre_en = rng.choice(GENRES)
+    template = rng.choice(COLD_QUERY_TEMPLATES)
+    rating = round(rng.uniform(5.0, 9.5), 1)
+    return template.format(genre=genre, genre_en=genre_en, rating=rating)
@@ -0,0 +1,192 @@
+# results.py
+"""压测结果：按接口记录HDR直方图，输出JSON，并与基线对比"""
+import os
+import csv
+import json
+import time
+import platform
+import threading
+from typing import Dict, List, Optional, Tuple
+from .histogram import HdrHistogram
+
+PERCENTILES = (50, 95, 99, 99.9)
+
+
+class ResultRecorder:
+    """挂在locust的request事件上的流式聚合器
+
+    按(接口, 语言)维护两组HDR直方图：累计直方图用于最终结果，区间直方图在每次快照后清零。
+    内存只取决于接口×语言的组合数，与运行时长无关，适合数小时的浸泡测试。
+    """
+
+    def __init__(self, snapshot_path: Optional[str] = None, snapshot_interval: float = 10.0):
+        self.snapshot_path = snapshot_path
+        self.snapshot_interval = snapshot_interval
+        self.histograms: Dict[Tuple[str, str], HdrHistogram] = {}
+        self.errors: Dict[Tuple[str, str], int] = {}
+        self._interval_histograms: Dict[Tuple[str, str], HdrHistogram] = {}
+        self._interval_errors: Dict[Tuple[str, str], int] = {}
+        self._interval_start = time.time()
+        self._lock = threading.Lock()
+        self._stopped = threading.Event()
+        self._snapshot_thread = None
+        self.start_time = time.time()
+        self.end_time = None
+
+    def on_request(self, request_type, name, response_time, response_length,
+                   exception=None, context=None, **kwargs):
+        key = (f"{request_type} {name}", (context or {}).get("lang", "-"))
+        value = response_time * 1000
+        with self._lock:
+            for histograms, errors in ((self.histograms, self.errors),
+                                       (self._interval_histograms, self._interval_errors)):
+                histogram = histograms.get(key)
+                if histogram is None:
+                    histogram = histograms[key] = HdrHistogram()
+                histogram.record(value)
+                if exception is not None:
+                    errors[key] = errors.get(key, 0) + 1
+
+    def start_snapshots(self) -> None:
+        """启动后台快照线程（locust下线程已被gevent替换为协程）"""
+        if not self.snapshot_path:
+            return
+        self._snapshot_thread = threading.Thread(target=self._snapshot_loop, daemon=True)
+        self._snapshot_thread.start()
+
+    def _snapshot_loop(self) -> None:
+        while not self._stopped.wait(self.snapshot_interval):
+            self.snapshot()
+
+    def snapshot(self) -> List[Dict]:
+        """取出当前区间的统计并追加写入时间序列文件（.jsonl或.csv）"""
+        now = time.time()
+        with self._lock:
+            histograms, self._interval_histograms = self._interval_histograms, {}
+            errors, self._interval_errors = self._interval_errors, {}
+            elapsed = now - self._interval_start
+            self._interval_start = now
+
+        rows = []
+        for (endpoint, lang), histogram in sorted(histograms.items()):
+            rows.append({
+                "timestamp": round(now, 3),
+                "endpoint": endpoint,
+                "lang": lang,
+                "count": histogram.total_count,
+                "errors": errors.get((endpoint, lang), 0),
+                "rps": histogram.total_count / elapsed if elapsed > 0 else 0.0,
+                **{f"{name}_ms": value / 1000 for name, value in histogram.percentiles(PERCENTILES).items()}
+            })
+        if rows and self.snapshot_path:
+            self._append_rows(rows)
+        return rows
+
+    def _append_rows(self, rows: List[Dict]) -> None:
+        if self.snapshot_path.endswith(".csv"):
+            new_file = not os.path.exists(self.snapshot_path)
+            with open(self.snapshot_path, "a", encoding="utf-8", newline="") as f:
+                writer = csv.DictWriter(f, fieldnames=list(rows[0]))
+                if new_file:
+                    writer.writeheader()
+                writer.writerows(rows)
+        else:
+            with open(self.snapshot_path, "a", encoding="utf-8") as f:
+                for row in rows:
+                    f.write(json.dumps(row, ensure_ascii=False) + "\n")
+
+    def stop(self) -> None:
+        self.end_time = time.time()
+        self._stopped.set()
+        if self._snapshot_thread is not None:
+            self._snapshot_thread.join()
+            self.snapshot()
+
+    @staticmethod
+    def _stats(histogram: HdrHistogram, errors: int, elapsed: float) -> Dict:
+        return {
+            "count": histogram.total_count,
+            "errors": errors,
+            "error_rate": errors / histogram.total_count if histogram.total_count else 0.0,
+            "rps": histogram.total_count / elapsed if elapsed > 0 else 0.0,
+            "mean_ms": histogram.mean / 1000,
+            "max_ms": histogram.max_value / 1000,
+            **{name: value / 1000 for name, value in histogram.percentiles(PERCENTILES).items()}
+        }
+
+    def summary(self, scenario: str, config: Dict) -> Dict:
+        """生成机器可读的结果（延迟单位：毫秒），接口汇总各语言，另附按语言拆分的统计"""
+        elapsed = (self.end_time or time.time()) - self.start_time
+        with self._lock:
+            items = sorted(self.histograms.items())
+            errors = dict(self.errors)
+
+        merged: Dict[str, HdrHistogram] = {}
+        merged_errors: Dict[str, int] = {}
+        by_language: Dict[str, Dict] = {}
+        for (endpoint, lang), histogram in items:
+            if endpoint not in merged:
+                merged[endpoint] = HdrHistogram(histogram.significant_figures)
+            merged[endpoint].merge(histogram)
+            merged_errors[endpoint] = merged_errors.get(endpoint, 0) + errors.get((endpoint, lang), 0)
+            by_language.setdefault(endpoint, {})[lang] = self._stats(histogram, errors.get((endpoint, lang), 0), elapsed)
+
+        return {
+            "scenario": scenario,
+            "config": config,
+            "started_at": self.start_time,
+            "duration_s": elapsed,
+            "python": platform.python_version(),
+            "endpoints": {
+                endpoint: self._stats(histogram, merged_errors[endpoint], elapsed)
+                for endpoint, histogram in merged.items()
+            },
+            "by_language": by_language
+        }
+
+
+def write_results(results: Dict, path: str) -> None:
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(results, f, ensure_ascii=False, indent=2)
+
+
+def load_results(path: str) -> Optional[Dict]:
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+
+def compare_with_baseline(results: Dict, baseline: Dict, tolerance: float = 0.10,
+                          error_rate_tolerance: float = 0.01) -> List[str]:
+    """返回回归列表：百分位延迟超过基线(1+tolerance)倍，或错误率上升超过阈值"""
+    regressions = []
+    for key, base in baseline.get("endpoints", {}).items():
+        current = results["endpoints"].get(key)
+        if current is None:
+            regressions.append(f"{key}: 本次运行没有请求")
+            continue
+        for name in ("p50", "p95", "p99", "p999"):
+            limit = base[name] * (1 + tolerance)
+            if base[name] > 0 and current[name] > limit:
+                regressions.append(
+                    f"{key} {name}: {current[name]:.1f}ms > 基线 {base[name]:.1f}ms (+{tolerance:.0%})"
+                )
+        if current["error_rate"] > base["error_rate"] + error_rate_tolerance:
+            regressions.append(
+                f"{key} 错误率: {current['error_rate']:.2%} > 基线 {base['error_rate']:.2%}"
+            )
+    return regressions
+
+
+def format_summary(results: Dict) -> str:
+    """终端输出用的简表"""
+    lines = [f"===== 场景 {results['scenario']} ({results['duration_s']:.1f}秒) ====="]
+    lines.append(f"{'接口':<24}{'请求':>8}{'错误':>6}{'RPS':>8}{'p50':>9}{'p95':>9}{'p99':>9}{'p999':>9}")
+    for key, stats in results["endpoints"].items():
+        lines.append(
+            f"{key:<24}{stats['count']:>8}{stats['errors']:>6}{stats['rps']:>8.1f}"
+            f"{stats['p50']:>9.1f}{stats['p95']:>9.1f}{stats['p99']:>9.1f}{stats['p999']:>9.1f}"
+        )
+    return "\n".join(lines)
@@ -0,0 +1,97 @@
+# run.py
+"""压测入口：运行命名场景，输出JSON结果并与基线对比，出现回归时以非0状态退出
+
+用法（在week1目录下）：
+    python -m benchmark.run --scenario hot_query --host http://127.0.0.1:7860 --duration 60
+    python -m benchmark.run --scenario all --update-baseline
+"""
+import gevent
+from locust.env import Environment
+
+import os
+import sys
+import argparse
+from . import scenarios
+from .scenarios import SCENARIOS
+from .results import (ResultRecorder, write_results, load_results,
+                      compare_with_baseline, format_summary)
+
+PACKAGE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def run_scenario(name: str, host: str, users: int, spawn_rate: float, duration: float, seed: int,
+                 snapshot_path: str = None, snapshot_interval: float = 10.0) -> dict:
+    """以库模式运行locust（无Web界面），返回结果字典；可按固定间隔写出时间序列快照"""
+    scenarios.BENCH_SEED = seed
+    scenarios.MovieApiUser.user_count = 0
+
+    env = Environment(user_classes=[SCENARIOS[name]], host=host)
+    recorder = ResultRecorder(snapshot_path, snapshot_interval)
+    env.events.request.add_listener(recorder.on_request)
+    recorder.start_snapshots()
+
+    runner = env.create_local_runner()
+    runner.start(users, spawn_rate=spawn_rate)
+    gevent.spawn_later(duration, runner.quit)
+    runner.greenlet.join()
+    recorder.stop()
+
+    config = {"host": host, "users": users, "spawn_rate": spawn_rate, "duration": duration, "seed": seed}
+    return recorder.summary(name, config)
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="电影推荐API压测")
+    parser.add_argument("--scenario", choices=list(SCENARIOS) + ["all"], default="all")
+    parser.add_argument("--host", default="http://127.0.0.1:7860")
+    parser.add_argument("--users", type=int, default=50)
+    parser.add_argument("--spawn-rate", type=float, default=10)
+    parser.add_argument("--duration", type=float, default=60, help="每个场景的运行时长（秒）")
+    parser.add_argument("--seed", type=int, default=scenarios.BENCH_SEED)
+    parser.add_argument("--output-dir", default=os.path.join(PACKAGE_DIR, "results"))
+    parser.add_argument("--baseline-dir", default=os.path.join(PACKAGE_DIR, "baselines"))
+    parser.add_argument("--tolerance", type=float, default=0.10, help="允许的百分位延迟增幅")
+    parser.add_argument("--snapshot-interval", type=float, default=10, help="时间序列快照间隔（秒），0表示关闭")
+    parser.add_argument("--snapshot-format", choices=["jsonl", "csv"], default="jsonl")
+    parser.add_argument("--update-baseline", action="store_true", help="用本次结果覆盖基线")
+    args = parser.parse_args()
+
+    os.makedirs(args.output_dir, exist_ok=True)
+    names = list(SCENARIOS) if args.scenario == "all" else [args.scenario]
+    failed = False
+
+    for name in names:
+        snapshot_path = None
+        if args.snapshot_interval > 0:
+            snapshot_path = os.path.join(args.output_dir, f"{name}.timeseries.{args.snapshot_format}")
+            if os.path.exists(snapshot_path):
+                os.remove(snapshot_path)
+        results = run_scenario(name, args.host, args.users, args.spawn_rate, args.duration, args.seed,
+                               snapshot_path, args.snapshot_interval)
+        write_results(results, os.path.join(args.output_dir, f"{name}.json"))
+        print(format_summary(results))
+
+        baseline_path = os.path.join(args.baseline_dir, f"{name}.json")
+        if args.update_baseline:
+            write_results(results, baseline_path)
+            print(f"✅ 已更新基线: {baseline_path}")
+            continue
+
+        baseline = load_results(baseline_path)
+        if baseline is None:
+            print(f"⚠️ 没有基线文件 {baseline_path}，跳过对比")
+            continue
+        regressions = compare_with_baseline(results, baseline, args.tolerance)
+        if regressions:
+            failed = True
+            print("❌ 性能回归:")
+            for item in regressions:
+                print(f"- {item}")
+        else:
+            print("✅ 与基线相比无回归")
+
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,146 @@
+# scenarios.py
+"""命名压测场景：每个场景是一个locust用户类，统一请求头、认证和随机种子"""
+import os
+import json
+import random
+from locust import HttpUser, task, between
+from .queries import HOT_QUERIES, MULTI_GENRE_QUERIES, PAGINATION_QUERIES, cold_query as make_cold_query
+
+# 与app3中TMDB_API_KEY一致（/api/predict的请求头校验）
+API_KEY = os.getenv("BENCH_API_KEY", os.getenv("TMDB_API_KEY", "048b542052a89f315fa7c6b74bd253f9"))
+BENCH_SEED = int(os.getenv("BENCH_SEED", "42"))
+LANGUAGES = ["zh", "en", "ja"]
+
+VALID_CREDENTIALS = [
+    {"username": "user1", "password": "password123"},
+    {"username": "user2", "password": "456password"}
+]
+INVALID_CREDENTIALS = [
+    {"username": "invalid", "password": "wrong"},
+    {"username": "user1", "password": "wrong"},
+    {"username": "", "password": ""}
+]
+
+
+class MovieApiUser(HttpUser):
+    """所有场景共用的基类：统一请求头、登录和预测请求"""
+    abstract = True
+    wait_time = between(1, 3)
+    user_count = 0
+
+    def on_start(self):
+        # 每个用户独立的随机序列，保证同一种子下请求序列可复现
+        MovieApiUser.user_count += 1
+        self.rng = random.Random(BENCH_SEED + MovieApiUser.user_count)
+        self.token = None
+        self.headers = {"Content-Type": "application/json", "TMDB_API_KEY": API_KEY}
+
+    def login(self, credentials: dict, expect_success: bool = True) -> None:
+        """登录，校验结果是否符合预期"""
+        with self.client.post("/api/login", json=credentials, headers=self.headers,
+                              catch_response=True, name="/api/login") as response:
+            try:
+                result = json.loads(response.text)
+            except ValueError:
+                response.failure("登录响应不是有效的JSON")
+                return
+            succeeded = response.status_code == 200 and result.get("status") == "success"
+            if succeeded == expect_success:
+                if succeeded:
+                    self.token = result.get("token")
+                response.success()
+            else:
+                response.failure(f"登录结果不符合预期: {response.text[:100]}")
+
+    def predict(self, query: str, page: int = 1, lang: str = "zh") -> dict:
+        """调用/api/predict，返回响应JSON（失败时返回空字典）"""
+        payload = {"data": [query], "page": page, "lang": lang}
+        if self.token:
+            payload["user_token"] = self.token
+        with self.client.post("/api/predict", json=payload, headers=self.headers,
+                              catch_response=True, name="/api/predict",
+                              context={"lang": lang}) as response:
+            if response.status_code != 200:
+                response.failure(f"状态码错误: {response.status_code}")
+                return {}
+            try:
+                result = json.loads(response.text)
+            except ValueError:
+                response.failure("响应不是有效的JSON")
+                return {}
+            if "data" not in result:
+                response.failure("响应不包含数据字段")
+                return {}
+            response.success()
+            return result
+
+
+class LoginStormUser(MovieApiUser):
+    """登录风暴：大量有效/无效登录"""
+    wait_time = between(0, 0.5)
+
+    @task(7)
+    def valid_login(self):
+        self.login(self.rng.choice(VALID_CREDENTIALS))
+
+    @task(3)
+    def invalid_login(self):
+        self.login(self.rng.choice(INVALID_CREDENTIALS), expect_success=False)
+
+
+class HotQueryUser(MovieApiUser):
+    """热点查询：少量重复查询，衡量缓存命中路径"""
+
+    def on_start(self):
+        super().on_start()
+        self.login(self.rng.choice(VALID_CREDENTIALS))
+
+    @task
+    def hot_query(self):
+        self.predict(self.rng.choice(HOT_QUERIES), lang=self.rng.choice(LANGUAGES))
+
+
+class ColdQueryUser(MovieApiUser):
+    """冷查询：评分条件与页码不断变化，衡量未命中缓存的路径"""
+
+    @task
+    def cold_query(self):
+        self.predict(make_cold_query(self.rng), page=self.rng.randint(1, 5), lang=self.rng.choice(LANGUAGES))
+
+
+class MultiGenreUser(MovieApiUser):
+    """多类型查询：一次请求触发多个类型的TMDB获取与拼装"""
+
+    @task
+    def multi_genre(self):
+        self.predict(self.rng.choice(MULTI_GENRE_QUERIES), lang=self.rng.choice(LANGUAGES))
+
+
+class PaginationWalkUser(MovieApiUser):
+    """翻页浏览：从第1页一直翻到最后一页"""
+
+    def on_start(self):
+        super().on_start()
+        self.login(self.rng.choice(VALID_CREDENTIALS))
+
+    @task
+    def pagination_walk(self):
+        query = self.rng.choice(PAGINATION_QUERIES)
+        lang = self.rng.choice(LANGUAGES)
+        page, total_pages = 1, 1
+        while page <= total_pages:
+            result = self.predict(query, page=page, lang=lang)
+            if not result:
+                break
+            total_pages = min(result.get("total_pages", 1), 10)
+            page += 1
+
+
+# 场景名 -> 用户类
+SCENARIOS = {
+    "login_storm": LoginStormUser,
+    "hot_query": HotQueryUser,
+    "cold_query": ColdQueryUser,
+    "multi_genre": MultiGenreUser,
+    "pagination_walk": PaginationWalkUser
+}
@@ -0,0 +1,9 @@
+# common_path.py
+"""把python-week1/common（各周共用的模块）加入sys.path，脚本里import common_path即可"""
+import os
+import sys
+
+COMMON_DIR = os.path.normpath(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "common"))
+
+if COMMON_DIR not in sys.path:
+    sys.path.append(COMMON_DIR)
@@ -1,35 +1,6 @@
-import os
-from dotenv import load_dotenv
-import requests
 import json
 import re
-
-# 加载环境变量
-load_dotenv("deepseek.env", encoding="utf-8") 
-
-def call_deepseek(prompt: str, temperature: float = 0.3) -> str:
-    """调用DeepSeek API"""
-    headers = {
-        "Authorization": f"Bearer {os.getenv('DEEPSEEK_API_KEY')}",
-        "Content-Type": "application/json"
-    }
-    payload = {
-        "model": os.getenv("DEEPSEEK_MODEL"),
-        "messages": [{"role": "user", "content": prompt}],
-        "temperature": temperature,
-        "max_tokens": 500
-    }
-    
-    try:
-        response = requests.post(
-            os.getenv("DEEPSEEK_ENDPOINT"),
-            headers=headers,
-            data=json.dumps(payload))
-        response.raise_for_status()
-        return response.json()["choices"][0]["message"]["content"]
-    except Exception as e:
-        print(f"API调用失败: {str(e)}")
-        return None
+from llm_client import call_deepseek
 
 def validate_recommendation(movie: dict, criteria: dict) -> bool:
     """检查推荐是否满足条件"""
@@ -0,0 +1,121 @@
+# deepseek_llm.py
+"""LangChain用的DeepSeek LLM包装器（底层使用llm_client的共享连接池）"""
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, AsyncIterator, Dict, Iterator, List, Optional
+from langchain_core.language_models.llms import BaseLLM
+from langchain_core.outputs import Generation, GenerationChunk, LLMResult
+from llm_client import get_client
+
+
+class DeepSeekLLM(BaseLLM):
+    """自定义DeepSeek LLM包装器"""
+
+    temperature: float = 0.3
+    max_tokens: int = 500
+    model: str = "deepseek-chat"
+    max_concurrency: int = 4  # 批量生成时同时在途的请求数
+
+    @property
+    def _llm_type(self) -> str:
+        return "deepseek"
+
+    def _call(
+        self,
+        prompt: str,
+        stop: Optional[List[str]] = None,
+        **kwargs: Any,
+    ) -> str:
+        return self._generate([prompt], stop=stop, **kwargs).generations[0][0].text
+
+    def _request_kwargs(self, stop: Optional[List[str]]) -> Dict[str, Any]:
+        return {"temperature": self.temperature, "max_tokens": self.max_tokens,
+                "model": self.model, "stop": stop}
+
+    def _generate(
+        self,
+        prompts: List[str],
+        stop: Optional[List[str]] = None,
+        **kwargs: Any,
+    ) -> Any:
+        # 每个prompt是独立的一次补全，不能合并进同一个messages数组
+        client = get_client()
+        request_kwargs = self._request_kwargs(stop)
+
+        def complete_one(prompt: str) -> Dict:
+            return client.chat([{"role": "user", "content": prompt}], **request_kwargs)
+
+        try:
+            if len(prompts) == 1:
+                responses = [complete_one(prompts[0])]
+            else:
+                workers = max(1, min(self.max_concurrency, len(prompts)))
+                with ThreadPoolExecutor(max_workers=workers) as executor:
+                    responses = list(executor.map(complete_one, prompts))  # map保持输入顺序
+            return self._create_llm_result(responses)
+        except Exception as e:
+            raise ValueError(f"DeepSeek API调用失败: {str(e)}")
+
+    async def _agenerate(
+        self,
+        prompts: List[str],
+        stop: Optional[List[str]] = None,
+        **kwargs: Any,
+    ) -> Any:
+        # 并发上限由LLMClient的异步信号量控制
+        client = get_client()
+        request_kwargs = self._request_kwargs(stop)
+        try:
+            responses = await asyncio.gather(*(
+                client.achat([{"role": "user", "content": prompt}], **request_kwargs)
+                for prompt in prompts
+            ))
+            return self._create_llm_result(list(responses))
+        except Exception as e:
+            raise ValueError(f"DeepSeek API调用失败: {str(e)}")
+
+    def _stream(
+        self,
+        prompt: str,
+        stop: Optional[List[str]] = None,
+        run_manager: Any = None,
+        **kwargs: Any,
+    ) -> Iterator[GenerationChunk]:
+        """SSE流式输出，LangChain的.stream()和回调on_llm_new_token都会逐段收到文本"""
+        messages = [{"role": "user", "content": prompt}]
+        for text in get_client().stream_chat(messages, **self._request_kwargs(stop)):
+            chunk = GenerationChunk(text=text)
+            if run_manager:
+                run_manager.on_llm_new_token(text, chunk=chunk)
+            yield chunk
+
+    async def _astream(
+        self,
+        prompt: str,
+        stop: Optional[List[str]] = None,
+        run_manager: Any = None,
+        **kwargs: Any,
+    ) -> AsyncIterator[GenerationChunk]:
+        messages = [{"role": "user", "content": prompt}]
+        async for text in get_client().astream_chat(messages, **self._request_kwargs(stop)):
+            chunk = GenerationChunk(text=text)
+            if run_manager:
+                await run_manager.on_llm_new_token(text, chunk=chunk)
+            yield chunk
+
+    def _create_llm_result(self, responses: List[Dict]) -> LLMResult:
+        """每个响应对应一个prompt的生成结果，token用量累加到llm_output"""
+        generations = []
+        token_usage: Dict[str, int] = {}
+        for response in responses:
+            choices = response.get("choices", [])
+            generations.append([Generation(text=choice["message"]["content"]) for choice in choices])
+            for key, value in (response.get("usage") or {}).items():
+                if isinstance(value, int):
+                    token_usage[key] = token_usage.get(key, 0) + value
+        return LLMResult(generations=generations,
+                         llm_output={"token_usage": token_usage, "model_name": self.model})
+
+    @property
+    def _identifying_params(self) -> Dict[str, Any]:
+        return {"model": self.model}
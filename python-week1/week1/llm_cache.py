@@ -0,0 +1,221 @@
+# llm_cache.py
+"""LLM响应缓存：按(模型, 温度, 规范化prompt)做精确匹配，可选向量相似度匹配近似prompt；内存LRU+TTL，SQLite持久化"""
+import os
+import re
+import json
+import math
+import time
+import sqlite3
+import hashlib
+import threading
+import unicodedata
+import zlib
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+LLM_CACHE_ENABLED = os.getenv("LLM_CACHE_ENABLED", "1") == "1"
+LLM_CACHE_TTL = float(os.getenv("LLM_CACHE_TTL", "86400"))  # 过期时间（秒）
+LLM_CACHE_MAX_ENTRIES = int(os.getenv("LLM_CACHE_MAX_ENTRIES", "1024"))  # 内存中最多保留的条目数
+LLM_CACHE_PATH = os.getenv(  # 置空则只用内存缓存
+    "LLM_CACHE_PATH", os.path.join(os.path.dirname(os.path.abspath(__file__)), ".llm_cache.sqlite3"))
+LLM_CACHE_SIMILARITY = float(os.getenv("LLM_CACHE_SIMILARITY", "0"))  # 相似度阈值，0表示只做精确匹配
+
+EMBEDDING_DIM = 256
+
+_WHITESPACE_RE = re.compile(r"\s+")
+
+
+def normalize_prompt(prompt: str) -> str:
+    """统一全角/半角字符并压缩空白，使只差排版的prompt命中同一条缓存"""
+    return _WHITESPACE_RE.sub(" ", unicodedata.normalize("NFKC", prompt)).strip()
+
+
+def messages_to_prompt(messages: List[Dict[str, Any]]) -> str:
+    """单轮对话直接用内容作为prompt；多轮对话每条消息转成规范化JSON（含tool_calls/tool_call_id/name等字段），
+    工具调用不同的对话不会共用缓存"""
+    if len(messages) == 1 and set(messages[0]) <= {"role", "content"} and messages[0].get("role") == "user":
+        return messages[0].get("content", "")
+    return "\n".join(
+        json.dumps({k: v for k, v in m.items() if v is not None}, ensure_ascii=False, sort_keys=True, default=str)
+        for m in messages
+    )
+
+
+def hashed_trigram_embedding(text: str, dim: int = EMBEDDING_DIM) -> List[float]:
+    """默认向量：字符三元组哈希到固定维度并做L2归一化（不依赖外部模型）"""
+    vector = [0.0] * dim
+    padded = f"  {text} "
+    for i in range(len(padded) - 2):
+        vector[zlib.crc32(padded[i:i + 3].encode("utf-8")) % dim] += 1.0
+    norm = math.sqrt(sum(v * v for v in vector)) or 1.0
+    return [v / norm for v in vector]
+
+
+def cosine_similarity(a: List[float], b: List[float]) -> float:
+    dot = sum(x * y for x, y in zip(a, b))
+    norm = math.sqrt(sum(x * x for x in a)) * math.sqrt(sum(y * y for y in b))
+    return dot / norm if norm else 0.0
+
+
+class LLMResponseCache:
+    """线程安全的响应缓存，值为可JSON序列化的响应"""
+
+    def __init__(self, ttl: float = LLM_CACHE_TTL, max_entries: int = LLM_CACHE_MAX_ENTRIES,
+                 path: Optional[str] = LLM_CACHE_PATH, similarity_threshold: float = LLM_CACHE_SIMILARITY,
+                 embed_fn: Callable[[str], List[float]] = hashed_trigram_embedding):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.similarity_threshold = similarity_threshold
+        self.embed_fn = embed_fn
+        self._lock = threading.Lock()
+        # key -> (scope, value, expires_at)，按访问顺序排列
+        self._entries: "OrderedDict[str, Tuple[str, Any, float]]" = OrderedDict()
+        # scope -> {key: 向量}，只对内存中的条目建索引
+        self._vectors: Dict[str, Dict[str, List[float]]] = {}
+        self.hits = 0
+        self.semantic_hits = 0
+        self.misses = 0
+
+        self._db = None
+        if path:
+            self._db = sqlite3.connect(path, check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS llm_cache ("
+                "key TEXT PRIMARY KEY, scope TEXT, prompt TEXT, response TEXT, expires_at REAL)"
+            )
+            self._db.execute("DELETE FROM llm_cache WHERE expires_at < ?", (time.time(),))
+            self._db.commit()
+
+    @staticmethod
+    def make_scope(model: str, temperature: float, **params) -> str:
+        """同一scope内的请求只有prompt不同（max_tokens、stop等参数不同的结果不能互用）"""
+        params = {k: v for k, v in params.items() if v is not None}
+        return json.dumps([model, round(float(temperature), 3), params], sort_keys=True, ensure_ascii=False)
+
+    @staticmethod
+    def make_key(scope: str, prompt: str) -> str:
+        return hashlib.sha256(f"{scope}\n{normalize_prompt(prompt)}".encode("utf-8")).hexdigest()
+
+    def get(self, scope: str, prompt: str) -> Optional[Any]:
+        """先查精确匹配（内存→磁盘），未命中且开启了相似度匹配时再查近似prompt"""
+        key = self.make_key(scope, prompt)
+        now = time.time()
+        with self._lock:
+            value = self._get_memory(key, now)
+            if value is None:
+                value = self._get_disk(key, prompt, now)
+            if value is not None:
+                self.hits += 1
+                return value
+
+            if self.similarity_threshold > 0:
+                value = self._get_similar(scope, prompt, now)
+                if value is not None:
+                    self.semantic_hits += 1
+                    return value
+            self.misses += 1
+            return None
+
+    def set(self, scope: str, prompt: str, value: Any, ttl: Optional[float] = None) -> None:
+        key = self.make_key(scope, prompt)
+        expires_at = time.time() + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            self._put_memory(key, scope, prompt, value, expires_at)
+            if self._db is not None:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO llm_cache (key, scope, prompt, response, expires_at) VALUES (?, ?, ?, ?, ?)",
+                    (key, scope, prompt, json.dumps(value, ensure_ascii=False), expires_at)
+                )
+                self._db.commit()
+
+    def _get_memory(self, key: str, now: float) -> Optional[Any]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        scope, value, expires_at = entry
+        if expires_at < now:
+            self._evict(key)
+            return None
+        self._entries.move_to_end(key)
+        return value
+
+    def _get_disk(self, key: str, prompt: str, now: float) -> Optional[Any]:
+        if self._db is None:
+            return None
+        row = self._db.execute(
+            "SELECT scope, response, expires_at FROM llm_cache WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            return None
+        scope, response, expires_at = row
+        if expires_at < now:
+            self._db.execute("DELETE FROM llm_cache WHERE key = ?", (key,))
+            self._db.commit()
+            return None
+        value = json.loads(response)
+        self._put_memory(key, scope, prompt, value, expires_at)  # 提升到内存
+        return value
+
+    def _get_similar(self, scope: str, prompt: str, now: float) -> Optional[Any]:
+        candidates = self._vectors.get(scope)
+        if not candidates:
+            return None
+        query = self.embed_fn(normalize_prompt(prompt))
+        best_key, best_score = None, self.similarity_threshold
+        for key, vector in candidates.items():
+            score = cosine_similarity(query, vector)
+            if score >= best_score:
+                best_key, best_score = key, score
+        if best_key is None:
+            return None
+        return self._get_memory(best_key, now)
+
+    def _put_memory(self, key: str, scope: str, prompt: str, value: Any, expires_at: float) -> None:
+        self._entries[key] = (scope, value, expires_at)
+        self._entries.move_to_end(key)
+        if self.similarity_threshold > 0:
+            self._vectors.setdefault(scope, {})[key] = self.embed_fn(normalize_prompt(prompt))
+        while len(self._entries) > self.max_entries:
+            self._evict(next(iter(self._entries)))
+
+    def _evict(self, key: str) -> None:
+        scope, _, _ = self._entries.pop(key)
+        vectors = self._vectors.get(scope)
+        if vectors is not None:
+            vectors.pop(key, None)
+            if not vectors:
+                del self._vectors[scope]
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {"hits": self.hits, "semantic_hits": self.semantic_hits,
+                    "misses": self.misses, "entries": len(self._entries)}
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._vectors.clear()
+            if self._db is not None:
+                self._db.execute("DELETE FROM llm_cache")
+                self._db.commit()
+
+    def close(self) -> None:
+        with self._lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
+
+
+_default_cache = None
+_default_cache_lock = threading.Lock()
+
+
+def get_cache() -> Optional[LLMResponseCache]:
+    """进程内共享的默认缓存；LLM_CACHE_ENABLED=0时返回None"""
+    global _default_cache
+    if not LLM_CACHE_ENABLED:
+        return None
+    if _default_cache is None:
+        with _default_cache_lock:
+            if _default_cache is None:
+                _default_cache = LLMResponseCache()
+    return _default_cache
@@ -0,0 +1,286 @@
+# llm_client.py
+"""DeepSeek（OpenAI兼容接口）共享客户端：长连接池、可配置超时与并发上限、响应缓存、SSE流式输出，同时提供同步和asyncio接口"""
+import os
+import json
+import asyncio
+import threading
+from typing import Any, AsyncIterator, Dict, Iterable, Iterator, List, Optional
+import requests
+from requests.adapters import HTTPAdapter
+from dotenv import load_dotenv
+from llm_cache import LLMResponseCache, get_cache, messages_to_prompt
+
+# 加载环境变量
+load_dotenv("deepseek.env", encoding="utf-8")
+
+DEFAULT_ENDPOINT = "https://api.deepseek.com/v1/chat/completions"
+DEFAULT_MODEL = "deepseek-chat"
+LLM_CONNECT_TIMEOUT = float(os.getenv("LLM_CONNECT_TIMEOUT", "5"))  # 建连超时（秒）
+LLM_READ_TIMEOUT = float(os.getenv("LLM_READ_TIMEOUT", "60"))  # 读取超时（秒）
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "8"))  # 同时在途的请求上限
+LLM_POOL_SIZE = int(os.getenv("LLM_POOL_SIZE", "16"))  # 每个主机保持的长连接数
+
+
+SSE_DONE = object()  # 流结束标记
+
+
+def parse_sse_line(line: str) -> Any:
+    """解析一行OpenAI格式的SSE（data: {...}），返回delta文本；空行/无文本返回None，[DONE]返回SSE_DONE"""
+    if not line.startswith("data:"):
+        return None
+    data = line[5:].strip()
+    if data == "[DONE]":
+        return SSE_DONE
+    choices = json.loads(data).get("choices") or []
+    if not choices:
+        return None
+    return (choices[0].get("delta") or {}).get("content") or None
+
+
+def iter_sse_content(lines: Iterable[str]) -> Iterator[str]:
+    """逐段产出SSE中的文本，遇到[DONE]结束"""
+    for line in lines:
+        content = parse_sse_line(line)
+        if content is SSE_DONE:
+            break
+        if content:
+            yield content
+
+
+def _completion_from_text(text: str) -> Dict[str, Any]:
+    """把流式拼好的文本包装成非流式响应的结构，便于和chat()共用缓存"""
+    return {"choices": [{"index": 0, "message": {"role": "assistant", "content": text}, "finish_reason": "stop"}]}
+
+
+class LLMClient:
+    """OpenAI兼容的chat/completions客户端，同一进程内复用连接"""
+
+    def __init__(self, endpoint: Optional[str] = None, api_key: Optional[str] = None,
+                 model: Optional[str] = None, connect_timeout: float = LLM_CONNECT_TIMEOUT,
+                 read_timeout: float = LLM_READ_TIMEOUT, max_concurrency: int = LLM_MAX_CONCURRENCY,
+                 pool_size: int = LLM_POOL_SIZE, use_cache: bool = True):
+        self.endpoint = endpoint or os.getenv("DEEPSEEK_ENDPOINT") or DEFAULT_ENDPOINT
+        self.api_key = api_key or os.getenv("DEEPSEEK_API_KEY")
+        self.model = model or os.getenv("DEEPSEEK_MODEL") or DEFAULT_MODEL
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self.max_concurrency = max_concurrency
+        self.pool_size = pool_size
+        self.cache = get_cache() if use_cache else None
+
+        # 同步接口：requests.Session + 连接池
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self._semaphore = threading.BoundedSemaphore(max_concurrency)
+
+        # 异步接口：按事件循环懒加载httpx.AsyncClient
+        self._async_client = None
+        self._async_semaphore = None
+        self._async_loop = None
+
+    def _headers(self) -> Dict[str, str]:
+        return {
+            "Authorization": f"Bearer {self.api_key}",
+            "Content-Type": "application/json"
+        }
+
+    def build_payload(self, messages: List[Dict[str, str]], temperature: float = 0.3,
+                      max_tokens: int = 500, model: Optional[str] = None, **extra) -> Dict[str, Any]:
+        payload = {
+            "model": model or self.model,
+            "messages": messages,
+            "temperature": temperature,
+            "max_tokens": max_tokens
+        }
+        payload.update({k: v for k, v in extra.items() if v is not None})
+        return payload
+
+    def _cache_args(self, payload: Dict[str, Any]):
+        """返回(scope, prompt)；未启用缓存时返回None"""
+        if self.cache is None:
+            return None
+        params = {k: v for k, v in payload.items() if k not in ("model", "temperature", "messages", "stream")}
+        scope = LLMResponseCache.make_scope(payload["model"], payload["temperature"], **params)
+        return scope, messages_to_prompt(payload["messages"])
+
+    def chat(self, messages: List[Dict[str, str]], temperature: float = 0.3,
+             max_tokens: int = 500, model: Optional[str] = None, **extra) -> Dict[str, Any]:
+        """同步调用，返回完整的响应JSON"""
+        payload = self.build_payload(messages, temperature, max_tokens, model, **extra)
+        cache_args = self._cache_args(payload)
+        if cache_args is not None:
+            cached = self.cache.get(*cache_args)
+            if cached is not None:
+                return cached
+
+        with self._semaphore:
+            response = self.session.post(
+                self.endpoint,
+                headers=self._headers(),
+                json=payload,
+                timeout=(self.connect_timeout, self.read_timeout)
+            )
+        response.raise_for_status()
+        data = response.json()
+        if cache_args is not None:
+            self.cache.set(*cache_args, data)
+        return data
+
+    def complete(self, prompt: str, temperature: float = 0.3, max_tokens: int = 500,
+                 model: Optional[str] = None, **extra) -> str:
+        """单轮对话，直接返回回复文本"""
+        data = self.chat([{"role": "user", "content": prompt}], temperature, max_tokens, model, **extra)
+        return data["choices"][0]["message"]["content"]
+
+    def stream_chat(self, messages: List[Dict[str, str]], temperature: float = 0.3,
+                    max_tokens: int = 500, model: Optional[str] = None, **extra) -> Iterator[str]:
+        """同步流式调用（SSE），收到一段就产出一段文本；完整结束后写入缓存"""
+        payload = self.build_payload(messages, temperature, max_tokens, model, stream=True, **extra)
+        cache_args = self._cache_args(payload)
+        if cache_args is not None:
+            cached = self.cache.get(*cache_args)
+            if cached is not None:
+                yield cached["choices"][0]["message"]["content"]
+                return
+
+        parts = []
+        with self._semaphore:
+            with self.session.post(
+                self.endpoint,
+                headers=self._headers(),
+                json=payload,
+                timeout=(self.connect_timeout, self.read_timeout),
+                stream=True
+            ) as response:
+                response.raise_for_status()
+                # text/event-stream通常不带charset，requests会按ISO-8859-1解码，这里自己按UTF-8解码
+                lines = (line.decode("utf-8") for line in response.iter_lines())
+                for content in iter_sse_content(lines):
+                    parts.append(content)
+                    yield content
+        if cache_args is not None:
+            self.cache.set(*cache_args, _completion_from_text("".join(parts)))
+
+    def stream_complete(self, prompt: str, temperature: float = 0.3, max_tokens: int = 500,
+                        model: Optional[str] = None, **extra) -> Iterator[str]:
+        return self.stream_chat([{"role": "user", "content": prompt}], temperature, max_tokens, model, **extra)
+
+    def _get_async_client(self):
+        """每个事件循环各自持有AsyncClient和信号量（asyncio对象不能跨循环使用）"""
+        import httpx
+
+        loop = asyncio.get_running_loop()
+        if self._async_client is None or self._async_loop is not loop:
+            self._drop_async_client()
+            self._async_client = httpx.AsyncClient(
+                timeout=httpx.Timeout(self.read_timeout, connect=self.connect_timeout),
+                limits=httpx.Limits(max_connections=self.pool_size, max_keepalive_connections=self.pool_size)
+            )
+            self._async_semaphore = asyncio.Semaphore(self.max_concurrency)
+            self._async_loop = loop
+        return self._async_client
+
+    def _drop_async_client(self) -> None:
+        """换事件循环前释放旧循环的AsyncClient：旧循环还在运行就在它上面关闭，已结束的只能丢弃引用"""
+        client, old_loop = self._async_client, self._async_loop
+        self._async_client = self._async_semaphore = self._async_loop = None
+        if client is not None and old_loop is not None and old_loop.is_running():
+            asyncio.run_coroutine_threadsafe(client.aclose(), old_loop)
+
+    async def achat(self, messages: List[Dict[str, str]], temperature: float = 0.3,
+                    max_tokens: int = 500, model: Optional[str] = None, **extra) -> Dict[str, Any]:
+        """异步调用，返回完整的响应JSON"""
+        client = self._get_async_client()
+        payload = self.build_payload(messages, temperature, max_tokens, model, **extra)
+        cache_args = self._cache_args(payload)
+        if cache_args is not None:
+            cached = await asyncio.to_thread(self.cache.get, *cache_args)  # SQLite读写不阻塞事件循环
+            if cached is not None:
+                return cached
+
+        async with self._async_semaphore:
+            response = await client.post(self.endpoint, headers=self._headers(), json=payload)
+        response.raise_for_status()
+        data = response.json()
+        if cache_args is not None:
+            await asyncio.to_thread(self.cache.set, *cache_args, data)
+        return data
+
+    async def acomplete(self, prompt: str, temperature: float = 0.3, max_tokens: int = 500,
+                        model: Optional[str] = None, **extra) -> str:
+        data = await self.achat([{"role": "user", "content": prompt}], temperature, max_tokens, model, **extra)
+        return data["choices"][0]["message"]["content"]
+
+    async def astream_chat(self, messages: List[Dict[str, str]], temperature: float = 0.3,
+                           max_tokens: int = 500, model: Optional[str] = None, **extra) -> AsyncIterator[str]:
+        """stream_chat的asyncio版本"""
+        client = self._get_async_client()
+        payload = self.build_payload(messages, temperature, max_tokens, model, stream=True, **extra)
+        cache_args = self._cache_args(payload)
+        if cache_args is not None:
+            cached = await asyncio.to_thread(self.cache.get, *cache_args)  # SQLite读写不阻塞事件循环
+            if cached is not None:
+                yield cached["choices"][0]["message"]["content"]
+                return
+
+        parts = []
+        async with self._async_semaphore:
+            async with client.stream("POST", self.endpoint, headers=self._headers(), json=payload) as response:
+                response.raise_for_status()
+                async for line in response.aiter_lines():
+                    content = parse_sse_line(line)
+                    if content is SSE_DONE:
+                        break
+                    if content:
+                        parts.append(content)
+                        yield content
+        if cache_args is not None:
+            await asyncio.to_thread(self.cache.set, *cache_args, _completion_from_text("".join(parts)))
+
+    async def astream_complete(self, prompt: str, temperature: float = 0.3, max_tokens: int = 500,
+                               model: Optional[str] = None, **extra) -> AsyncIterator[str]:
+        async for content in self.astream_chat([{"role": "user", "content": prompt}], temperature,
+                                               max_tokens, model, **extra):
+            yield content
+
+    def close(self) -> None:
+        self.session.close()
+
+    async def aclose(self) -> None:
+        if self._async_client is not None:
+            await self._async_client.aclose()
+            self._async_client = None
+
+
+_default_client = None
+_default_client_lock = threading.Lock()
+
+
+def get_client() -> LLMClient:
+    """进程内共享的默认客户端"""
+    global _default_client
+    if _default_client is None:
+        with _default_client_lock:
+            if _default_client is None:
+                _default_client = LLMClient()
+    return _default_client
+
+
+def call_deepseek(prompt: str, temperature: float = 0.3) -> Optional[str]:
+    """调用DeepSeek API（失败时打印错误并返回None）"""
+    try:
+        return get_client().complete(prompt, temperature)
+    except Exception as e:
+        print(f"API调用失败: {str(e)}")
+        return None
+
+
+async def acall_deepseek(prompt: str, temperature: float = 0.3) -> Optional[str]:
+    """call_deepseek的asyncio版本"""
+    try:
+        return await get_client().acomplete(prompt, temperature)
+    except Exception as e:
+        print(f"API调用失败: {str(e)}")
+        return None
@@ -4,6 +4,7 @@ import random
 import tiktoken
 from dotenv import load_dotenv
 from datetime import datetime
+from llm_client import get_client
 from urllib.parse import quote
 
 # 加载环境变量
@@ -60,34 +61,47 @@ class MovieBotV1:
             f"4. 专业媒体：可在《看电影》杂志或Variety网站搜索相关评论"
         )
     
+    def llm_stream(self, prompt: str, reference: str):
+        """以本地知识库结果为参考，流式获取模型回答（SSE）"""
+        llm_prompt = (
+            "你是电影推荐助手。请参考下面的资料回答用户问题，资料中没有的信息不要编造。\n\n"
+            f"参考资料：\n{reference}\n\n用户问题：{prompt}"
+        )
+        return get_client().stream_complete(llm_prompt, temperature=0.7)
+    
     def stream_response(self, prompt: str):
-        """流式输出响应"""
+        """流式输出响应：配置了DEEPSEEK_API_KEY时逐段打印模型输出，否则直接输出本地结果"""
         self.interaction_count += 1
-        print("思考中", end="", flush=True)
-        
-        # 模拟思考过程
-        for _ in range(3):
-            time.sleep(0.5)
-            print(".", end="", flush=True)
-        
-        print("\n")  # 思考结束，开始输出
+        start = time.perf_counter()
+        first_token_ms = None
         
-        # 生成响应
+        # 本地知识库结果：没有模型时直接作为回答，有模型时作为参考资料
         response = self.generate_response(prompt)
-        safe_response = self.safe_response(response, confidence=0.8)
+        parts = []
+        if get_client().api_key:
+            try:
+                for chunk in self.llm_stream(prompt, response):
+                    if first_token_ms is None:
+                        first_token_ms = (time.perf_counter() - start) * 1000
+                    print(chunk, end='', flush=True)
+                    parts.append(chunk)
+            except Exception as e:
+                print(f"\n模型调用失败，使用本地结果: {str(e)}\n")
+                parts = []
         
-        # 流式输出
-        token_count = 0
-        for char in safe_response:
-            print(char, end='', flush=True)
-            token_count += self.calculate_tokens(char)
-            time.sleep(0.03)  # 控制输出速度
+        if not parts:
+            safe_response = self.safe_response(response, confidence=0.8)
+            first_token_ms = (time.perf_counter() - start) * 1000
+            print(safe_response, end='', flush=True)
+            parts.append(safe_response)
         
         # 更新Token计数
+        full_response = "".join(parts)
+        token_count = self.calculate_tokens(full_response)
         self.total_tokens += token_count
         
-        print(f"\n\n本次消耗Token: {token_count}")
-        return safe_response
+        print(f"\n\n本次消耗Token: {token_count} | 首字延迟: {first_token_ms:.0f}ms")
+        return full_response
     
     def generate_response(self, prompt: str) -> str:
         """根据提示生成响应"""
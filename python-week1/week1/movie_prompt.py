@@ -1,37 +1,6 @@
-import os
-from dotenv import load_dotenv
-import requests
-import json
+from llm_client import call_deepseek
 
 
-# 加载环境变量
-load_dotenv("deepseek.env", encoding="utf-8") 
-
-def call_deepseek(prompt: str, temperature: float = 0.3) -> str:
-    """调用DeepSeek API"""
-    headers = {
-        "Authorization": f"Bearer {os.getenv('DEEPSEEK_API_KEY')}",
-        "Content-Type": "application/json"
-    }
-    payload = {
-        "model": os.getenv("DEEPSEEK_MODEL"),
-        "messages": [{"role": "user", "content": prompt}],
-        "temperature": temperature,
-        "max_tokens": 500
-    }
-    
-    try:
-        response = requests.post(
-            os.getenv("DEEPSEEK_ENDPOINT"),
-            headers=headers,
-            data=json.dumps(payload)
-        )
-        response.raise_for_status()
-        return response.json()["choices"][0]["message"]["content"]
-    except Exception as e:
-        print(f"API调用失败: {str(e)}")
-        return None
-
 def build_prompt(question: str) -> str:
     """构建专业影评人Prompt"""
     return f"""
@@ -68,4 +37,3 @@ if __name__ == "__main__":
         prompt = build_prompt(question)
         answers = [call_deepseek(prompt, t) for t in [0.3, 0.7, 1.0]]
         print(f"回答：{answers}\n{'-'*50}")
-        print(f"Token用量: {requests.json()['usage']}")
\ No newline at end of file
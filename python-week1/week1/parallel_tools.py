@@ -0,0 +1,188 @@
+# parallel_tools.py
+"""支持并行函数调用的Agent：模型每一步可以返回多个tool_calls，工具并发执行后一次性回传，减少LLM往返次数"""
+import json
+import uuid
+import asyncio
+import inspect
+from types import SimpleNamespace
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional
+from llm_client import LLMClient, get_client
+
+JSON_TYPES = {str: "string", int: "integer", float: "number", bool: "boolean"}
+
+
+def tool_schema(name: str, func: Callable, description: str) -> Dict[str, Any]:
+    """根据函数签名生成OpenAI function calling格式的工具描述"""
+    properties, required = {}, []
+    for param in inspect.signature(func).parameters.values():
+        if param.kind in (inspect.Parameter.VAR_POSITIONAL, inspect.Parameter.VAR_KEYWORD):
+            continue
+        properties[param.name] = {"type": JSON_TYPES.get(param.annotation, "string")}
+        if param.default is inspect.Parameter.empty:
+            required.append(param.name)
+    return {
+        "type": "function",
+        "function": {
+            "name": name,
+            "description": description,
+            "parameters": {"type": "object", "properties": properties, "required": required}
+        }
+    }
+
+
+def _llm_result(data: Dict[str, Any]) -> Any:
+    """把chat响应包装成回调处理器期望的LLMResult形状（generations/llm_output）"""
+    message = data["choices"][0]["message"]
+    return SimpleNamespace(generations=[[SimpleNamespace(text=message.get("content") or "", message=None)]],
+                           llm_output={"token_usage": data.get("usage") or {}})
+
+
+class ParallelToolAgent:
+    """接口与AgentExecutor一致（invoke({"input": ...}, config={"callbacks": [...]}) -> {"output": ...}），
+    工具对象只需有name/func/description；回调按LangChain的on_chain/on_llm/on_tool_*事件通知"""
+
+    def __init__(self, tools: List[Any], client: Optional[LLMClient] = None, system_prompt: Optional[str] = None,
+                 temperature: float = 0, max_tokens: int = 1000, max_steps: int = 5, max_workers: int = 4,
+                 verbose: bool = False):
+        self.tools = {tool.name: tool for tool in tools}
+        self.schemas = [tool_schema(tool.name, tool.func, tool.description) for tool in tools]
+        self.client = client or get_client()
+        self.system_prompt = system_prompt
+        self.temperature = temperature
+        self.max_tokens = max_tokens
+        self.max_steps = max_steps
+        self.verbose = verbose
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="agent-tool")
+
+    def _initial_messages(self, query: str) -> List[Dict[str, Any]]:
+        messages = []
+        if self.system_prompt:
+            messages.append({"role": "system", "content": self.system_prompt})
+        messages.append({"role": "user", "content": query})
+        return messages
+
+    @staticmethod
+    def _notify(callbacks: List[Any], event: str, *args, **kwargs) -> None:
+        for handler in callbacks:
+            method = getattr(handler, event, None)
+            if method is not None:
+                method(*args, **kwargs)
+
+    def _run_tool(self, call: Dict[str, Any], callbacks: List[Any] = (), parent_run_id=None) -> str:
+        """执行单个tool_call，工具错误作为文本返回给模型而不是中断整个回答（回调抛出的异常除外）"""
+        name = call["function"]["name"]
+        arguments = call["function"].get("arguments") or "{}"
+        run_id = uuid.uuid4()
+        self._notify(callbacks, "on_tool_start", {"name": name}, arguments, run_id=run_id, parent_run_id=parent_run_id)
+        tool = self.tools.get(name)
+        if tool is None:
+            result = f"未知工具: {name}"
+        else:
+            try:
+                args = json.loads(arguments)
+                if self.verbose:
+                    print(f"🔧 调用工具 {name}({args})")
+                result = str(tool.func(**args))
+            except Exception as e:
+                result = f"工具{name}执行失败: {str(e)}"
+        self._notify(callbacks, "on_tool_end", result, run_id=run_id, parent_run_id=parent_run_id)
+        return result
+
+    def _step(self, messages: List[Dict[str, Any]], message: Dict[str, Any], results: List[str]) -> None:
+        """把模型的tool_calls和对应的执行结果追加到对话中"""
+        calls = message["tool_calls"]
+        messages.append({"role": "assistant", "content": message.get("content") or "", "tool_calls": calls})
+        for call, result in zip(calls, results):
+            messages.append({"role": "tool", "tool_call_id": call["id"], "content": result})
+
+    def _request_kwargs(self) -> Dict[str, Any]:
+        return {"temperature": self.temperature, "max_tokens": self.max_tokens,
+                "tools": self.schemas, "tool_choice": "auto"}
+
+    def _chat(self, messages: List[Dict[str, Any]], callbacks: List[Any], parent_run_id) -> Dict[str, Any]:
+        run_id = uuid.uuid4()
+        self._notify(callbacks, "on_llm_start", {"name": "ParallelToolAgent"}, [messages[-1].get("content") or ""],
+                     run_id=run_id, parent_run_id=parent_run_id)
+        try:
+            data = self.client.chat(messages, **self._request_kwargs())
+        except Exception as e:
+            self._notify(callbacks, "on_llm_error", e, run_id=run_id, parent_run_id=parent_run_id)
+            raise
+        self._notify(callbacks, "on_llm_end", _llm_result(data), run_id=run_id, parent_run_id=parent_run_id)
+        return data
+
+    async def _achat(self, messages: List[Dict[str, Any]], callbacks: List[Any], parent_run_id) -> Dict[str, Any]:
+        run_id = uuid.uuid4()
+        self._notify(callbacks, "on_llm_start", {"name": "ParallelToolAgent"}, [messages[-1].get("content") or ""],
+                     run_id=run_id, parent_run_id=parent_run_id)
+        try:
+            data = await self.client.achat(messages, **self._request_kwargs())
+        except Exception as e:
+            self._notify(callbacks, "on_llm_error", e, run_id=run_id, parent_run_id=parent_run_id)
+            raise
+        self._notify(callbacks, "on_llm_end", _llm_result(data), run_id=run_id, parent_run_id=parent_run_id)
+        return data
+
+    def run(self, query: str, callbacks: List[Any] = ()) -> Dict[str, Any]:
+        root_id = uuid.uuid4()
+        self._notify(callbacks, "on_chain_start", {"name": "ParallelToolAgent"}, {"input": query},
+                     run_id=root_id, parent_run_id=None)
+        try:
+            result = self._run_steps(query, callbacks, root_id)
+        except Exception as e:
+            self._notify(callbacks, "on_chain_error", e, run_id=root_id, parent_run_id=None)
+            raise
+        self._notify(callbacks, "on_chain_end", result, run_id=root_id, parent_run_id=None)
+        return result
+
+    def _run_steps(self, query: str, callbacks: List[Any], root_id) -> Dict[str, Any]:
+        messages = self._initial_messages(query)
+        tool_calls = 0
+        for step in range(1, self.max_steps + 1):
+            message = self._chat(messages, callbacks, root_id)["choices"][0]["message"]
+            calls = message.get("tool_calls") or []
+            if not calls:
+                return {"input": query, "output": message.get("content") or "",
+                        "llm_calls": step, "tool_calls": tool_calls}
+            # 同一步里的多个工具调用互不依赖，并发执行
+            results = list(self._executor.map(lambda call: self._run_tool(call, callbacks, root_id), calls))
+            tool_calls += len(calls)
+            self._step(messages, message, results)
+        return {"input": query, "output": "达到最大步数仍未得到最终答案",
+                "llm_calls": self.max_steps, "tool_calls": tool_calls}
+
+    async def arun(self, query: str, callbacks: List[Any] = ()) -> Dict[str, Any]:
+        """asyncio版本：工具在默认线程池中并发执行"""
+        root_id = uuid.uuid4()
+        self._notify(callbacks, "on_chain_start", {"name": "ParallelToolAgent"}, {"input": query},
+                     run_id=root_id, parent_run_id=None)
+        try:
+            result = await self._arun_steps(query, callbacks, root_id)
+        except Exception as e:
+            self._notify(callbacks, "on_chain_error", e, run_id=root_id, parent_run_id=None)
+            raise
+        self._notify(callbacks, "on_chain_end", result, run_id=root_id, parent_run_id=None)
+        return result
+
+    async def _arun_steps(self, query: str, callbacks: List[Any], root_id) -> Dict[str, Any]:
+        messages = self._initial_messages(query)
+        tool_calls = 0
+        for step in range(1, self.max_steps + 1):
+            message = (await self._achat(messages, callbacks, root_id))["choices"][0]["message"]
+            calls = message.get("tool_calls") or []
+            if not calls:
+                return {"input": query, "output": message.get("content") or "",
+                        "llm_calls": step, "tool_calls": tool_calls}
+            results = await asyncio.gather(*(asyncio.to_thread(self._run_tool, call, callbacks, root_id)
+                                             for call in calls))
+            tool_calls += len(calls)
+            self._step(messages, message, list(results))
+        return {"input": query, "output": "达到最大步数仍未得到最终答案",
+                "llm_calls": self.max_steps, "tool_calls": tool_calls}
+
+    def invoke(self, inputs: Dict[str, Any], config: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        return self.run(inputs["input"], (config or {}).get("callbacks") or [])
+
+    async def ainvoke(self, inputs: Dict[str, Any], config: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        return await self.arun(inputs["input"], (config or {}).get("callbacks") or [])
@@ -1,75 +1,19 @@
 from langchain.agents import Tool, AgentExecutor, initialize_agent
-from langchain_core.language_models.llms import BaseLLM
-from typing import Optional, List, Dict, Any
 import requests
 from dotenv import load_dotenv
 import os
-import json
 import warnings
+from deepseek_llm import DeepSeekLLM
+from parallel_tools import ParallelToolAgent
+import common_path  # noqa: F401  各周共用的模块（python-week1/common）
+from agent_callbacks import invoke_with_budget, AGENT_DEADLINE_SECONDS, AGENT_VERBOSE  # 与week2的Agent共用埋点（python-week1/common）
 
 # 忽略LangChain的弃用警告
 warnings.filterwarnings("ignore", category=PendingDeprecationWarning)
 
 # 加载环境变量
 load_dotenv("deepseek.env", encoding="utf-8")
-
-class DeepSeekLLM(BaseLLM):
-    """自定义DeepSeek LLM包装器"""
-    
-    temperature: float = 0.3
-    max_tokens: int = 500
-    
-    @property
-    def _llm_type(self) -> str:
-        return "deepseek"
-    
-    def _call(
-        self,
-        prompt: str,
-        stop: Optional[List[str]] = None,
-        **kwargs: Any,
-    ) -> str:
-        return self._generate([prompt], stop=stop, **kwargs).generations[0][0].text
-    
-    def _generate(
-        self,
-        prompts: List[str],
-        stop: Optional[List[str]] = None,
-        **kwargs: Any,
-    ) -> Any:
-        headers = {
-            "Authorization": f"Bearer {os.getenv('DEEPSEEK_API_KEY')}",
-            "Content-Type": "application/json"
-        }
-        payload = {
-            "model": "deepseek-chat",
-            "messages": [{"role": "user", "content": prompt} for prompt in prompts],
-            "temperature": self.temperature,
-            "max_tokens": self.max_tokens
-        }
-        
-        try:
-            response = requests.post(
-                "https://api.deepseek.com/v1/chat/completions",
-                headers=headers,
-                data=json.dumps(payload))
-            response.raise_for_status()
-            return self._create_llm_result(response.json())
-        except Exception as e:
-            raise ValueError(f"DeepSeek API调用失败: {str(e)}")
-    
-    def _create_llm_result(self, response: Dict) -> Any:
-        from langchain.schema import LLMResult, Generation
-        choices = response.get("choices", [])
-        generations = []
-        for choice in choices:
-            text = choice["message"]["content"]
-            generations.append([Generation(text=text)])
-        return LLMResult(generations=generations)
-    
-    @property
-    def _identifying_params(self) -> Dict[str, Any]:
-        return {"model": "deepseek-chat"}
+AGENT_MODE = os.getenv("AGENT_MODE", "react")  # react 或 parallel（并行函数调用，需模型支持tools）
 
 # TMDB搜索工具
 def tmdb_search(query: str) -> str:
@@ -109,15 +53,19 @@ tools = [
 # 初始化DeepSeek LLM
 llm = DeepSeekLLM(temperature=0)
 
-# 创建并运行代理
-agent = initialize_agent(
-    tools=tools,
-    llm=llm,
-    agent="zero-shot-react-description",
-    verbose=True,
-    max_iterations=3,
-    handle_parsing_errors=True  # 添加输出解析错误处理
-)
+# 创建代理：默认使用原来的ReAct代理，AGENT_MODE=parallel时使用并行函数调用（模型一步可发出多个工具调用并发执行）
+if AGENT_MODE == "parallel":
+    agent = ParallelToolAgent(tools, max_steps=3, verbose=AGENT_VERBOSE)
+else:
+    agent = initialize_agent(
+        tools=tools,
+        llm=llm,
+        agent="zero-shot-react-description",
+        verbose=AGENT_VERBOSE,
+        max_execution_time=AGENT_DEADLINE_SECONDS,
+        max_iterations=3,
+        handle_parsing_errors=True  # 添加输出解析错误处理
+    )
 
 # 执行查询
 if __name__ == "__main__":
@@ -125,7 +73,7 @@ if __name__ == "__main__":
         query = "诺兰最新导演的电影是什么？"
         print(f"正在查询: {query}")
         # 使用新的invoke方法替代run
-        result = agent.invoke({"input": query})
+        result = invoke_with_budget(agent, {"input": query}, agent_name="react_agent")
         print("\n最终结果:")
         print(result["output"])
     except Exception as e:
@@ -1,11 +1,12 @@
 from langchain.agents import Tool, AgentExecutor, initialize_agent
-from langchain_core.language_models.llms import BaseLLM
-from typing import Optional, List, Dict, Any
-import requests
 from dotenv import load_dotenv
 import os
-import json
 import warnings
+from deepseek_llm import DeepSeekLLM
+from parallel_tools import ParallelToolAgent
+import common_path  # noqa: F401  各周共用的模块（python-week1/common）
+from agent_callbacks import invoke_with_budget, AGENT_DEADLINE_SECONDS, AGENT_VERBOSE  # 与week2的Agent共用埋点（python-week1/common）
+from tmdb_client import get_tmdb_client
 from urllib.parse import quote
 
 # 忽略警告
@@ -13,73 +14,11 @@ warnings.filterwarnings("ignore", category=DeprecationWarning)
 
 # 加载环境变量
 load_dotenv("deepseek.env", encoding="utf-8")
-
-class DeepSeekLLM(BaseLLM):
-    """自定义DeepSeek LLM包装器"""
-    
-    temperature: float = 0.3
-    max_tokens: int = 500
-    
-    @property
-    def _llm_type(self) -> str:
-        return "deepseek"
-    
-    def _call(
-        self,
-        prompt: str,
-        stop: Optional[List[str]] = None,
-        **kwargs: Any,
-    ) -> str:
-        return self._generate([prompt], stop=stop, **kwargs).generations[0][0].text
-    
-    def _generate(
-        self,
-        prompts: List[str],
-        stop: Optional[List[str]] = None,
-        **kwargs: Any,
-    ) -> Any:
-        headers = {
-            "Authorization": f"Bearer {os.getenv('DEEPSEEK_API_KEY')}",
-            "Content-Type": "application/json"
-        }
-        payload = {
-            "model": "deepseek-chat",
-            "messages": [{"role": "user", "content": prompt} for prompt in prompts],
-            "temperature": self.temperature,
-            "max_tokens": self.max_tokens
-        }
-        
-        try:
-            response = requests.post(
-                "https://api.deepseek.com/v1/chat/completions",
-                headers=headers,
-                data=json.dumps(payload)
-            )
-            response.raise_for_status()
-            return self._create_llm_result(response.json())
-        except Exception as e:
-            raise ValueError(f"DeepSeek API调用失败: {str(e)}")
-    
-    def _create_llm_result(self, response: Dict) -> Any:
-        from langchain.schema import LLMResult, Generation
-        choices = response.get("choices", [])
-        generations = []
-        for choice in choices:
-            text = choice["message"]["content"]
-            generations.append([Generation(text=text)])
-        return LLMResult(generations=generations)
-    
-    @property
-    def _identifying_params(self) -> Dict[str, Any]:
-        return {"model": "deepseek-chat"}
+AGENT_MODE = os.getenv("AGENT_MODE", "react")  # react 或 parallel（并行函数调用，需模型支持tools）
 
 def get_director_id(director_name: str) -> int:
-    """获取导演ID"""
-    url = f"https://api.themoviedb.org/3/search/person?query={director_name}&api_key={os.getenv('TMDB_API_KEY')}"
-    response = requests.get(url).json()
-    if response["results"]:
-        return response["results"][0]["id"]
-    return 0
+    """获取导演ID（带缓存，并在后台预取候选人作品）"""
+    return get_tmdb_client().get_person_id(director_name)
 
 def tmdb_search(query: str) -> str:
     """搜索指定导演的电影"""
@@ -92,20 +31,8 @@ def tmdb_search(query: str) -> str:
         if not director_id:
             return f"找不到导演{director}的信息"
         
-        # 获取该导演的电影
-        url = f"https://api.themoviedb.org/3/person/{director_id}/movie_credits?api_key={os.getenv('TMDB_API_KEY')}"
-        response = requests.get(url).json()
-        
-        # 筛选导演作品并按日期排序
-        directed_movies = [
-            m for m in response["crew"] 
-            if m.get("job") == "Director"
-        ]
-        sorted_movies = sorted(
-            directed_movies,
-            key=lambda x: x.get("release_date", ""),
-            reverse=True
-        )
+        # 获取该导演的电影（已按日期排序，通常在查ID时就已预取完成）
+        sorted_movies = get_tmdb_client().directed_movies(director_id)
         
         # 格式化结果
         return str([{
@@ -146,14 +73,18 @@ tools = [
 # 初始化DeepSeek LLM
 llm = DeepSeekLLM(temperature=0)
 
-# 创建代理
-agent = initialize_agent(
-    tools=tools,
-    llm=llm,
-    agent="zero-shot-react-description",
-    verbose=True,
-    handle_parsing_errors=True
-)
+# 创建代理：默认使用原来的ReAct代理，AGENT_MODE=parallel时使用并行函数调用（模型一步可发出多个工具调用并发执行）
+if AGENT_MODE == "parallel":
+    agent = ParallelToolAgent(tools, verbose=AGENT_VERBOSE)
+else:
+    agent = initialize_agent(
+        tools=tools,
+        llm=llm,
+        agent="zero-shot-react-description",
+        verbose=AGENT_VERBOSE,
+        max_execution_time=AGENT_DEADLINE_SECONDS,
+        handle_parsing_errors=True
+    )
 
 def display_result(raw_output: str):
     """美化输出结果"""
@@ -187,7 +118,7 @@ def main():
                 continue
                 
             print(f"\n正在查询: {query}...")
-            result = agent.invoke({"input": query})
+            result = invoke_with_budget(agent, {"input": query}, agent_name="react_agent")
             display_result(result["output"])
             
         except KeyboardInterrupt:
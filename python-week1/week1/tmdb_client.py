@@ -0,0 +1,150 @@
+# tmdb_client.py
+"""Agent工具用的TMDB客户端：共享Session连接池，人名→ID和作品列表的TTL缓存，并发预取前N个候选人的作品"""
+import os
+import time
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Dict, List, Optional
+import requests
+from requests.adapters import HTTPAdapter
+from dotenv import load_dotenv
+
+# 加载环境变量
+load_dotenv("deepseek.env", encoding="utf-8")
+
+TMDB_BASE_URL = os.getenv("TMDB_BASE_URL", "https://api.themoviedb.org/3")
+TMDB_CACHE_TTL = float(os.getenv("TMDB_CACHE_TTL", "3600"))  # 缓存过期时间（秒）
+TMDB_PREFETCH_TOP_N = int(os.getenv("TMDB_PREFETCH_TOP_N", "3"))  # 搜索人名后预取前N个候选人的作品
+TMDB_CONNECT_TIMEOUT = float(os.getenv("TMDB_CONNECT_TIMEOUT", "3"))
+TMDB_READ_TIMEOUT = float(os.getenv("TMDB_READ_TIMEOUT", "10"))
+
+
+class TTLCache:
+    """线程安全的过期缓存，超过容量时先淘汰最早写入的条目"""
+
+    def __init__(self, ttl: float = TMDB_CACHE_TTL, max_entries: int = 1024):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._data: Dict[Any, tuple] = {}
+        self._lock = threading.Lock()
+
+    def get(self, key: Any) -> Optional[Any]:
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return None
+            value, expires_at = entry
+            if expires_at < time.monotonic():
+                del self._data[key]
+                return None
+            return value
+
+    def set(self, key: Any, value: Any) -> None:
+        with self._lock:
+            self._data.pop(key, None)
+            self._data[key] = (value, time.monotonic() + self.ttl)
+            while len(self._data) > self.max_entries:
+                del self._data[next(iter(self._data))]
+
+    def __contains__(self, key: Any) -> bool:
+        return self.get(key) is not None
+
+
+class TMDBClient:
+    """TMDB导演/作品查询，同一进程内的Agent工具共享一个实例"""
+
+    def __init__(self, api_key: Optional[str] = None, base_url: str = TMDB_BASE_URL,
+                 ttl: float = TMDB_CACHE_TTL, prefetch_top_n: int = TMDB_PREFETCH_TOP_N, pool_size: int = 8):
+        self.api_key = api_key or os.getenv("TMDB_API_KEY")
+        self.base_url = base_url.rstrip("/")
+        self.prefetch_top_n = prefetch_top_n
+        self.timeout = (TMDB_CONNECT_TIMEOUT, TMDB_READ_TIMEOUT)
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self._executor = ThreadPoolExecutor(max_workers=max(1, prefetch_top_n), thread_name_prefix="tmdb-prefetch")
+
+        self.person_cache = TTLCache(ttl)  # 规范化人名 -> 搜索结果列表
+        self.credits_cache = TTLCache(ttl)  # person_id -> movie_credits响应
+        self._inflight: Dict[int, Future] = {}  # 正在预取的person_id，避免重复请求
+        self._inflight_lock = threading.Lock()
+        self.requests_sent = 0
+
+    def _get(self, path: str, **params) -> Dict[str, Any]:
+        params["api_key"] = self.api_key
+        self.requests_sent += 1
+        response = self.session.get(f"{self.base_url}/{path}", params=params, timeout=self.timeout)
+        response.raise_for_status()
+        return response.json()
+
+    def search_person(self, name: str) -> List[Dict[str, Any]]:
+        """按人名搜索，结果缓存；同时在后台预取前N个候选人的作品"""
+        key = " ".join(name.lower().split())
+        results = self.person_cache.get(key)
+        if results is None:
+            results = self._get("search/person", query=name).get("results", [])
+            self.person_cache.set(key, results)
+        self.prefetch_credits([person["id"] for person in results[:self.prefetch_top_n]])
+        return results
+
+    def get_person_id(self, name: str) -> int:
+        """返回最匹配的人物ID，找不到时返回0"""
+        results = self.search_person(name)
+        return results[0]["id"] if results else 0
+
+    def prefetch_credits(self, person_ids: List[int]) -> None:
+        for person_id in person_ids:
+            if person_id in self.credits_cache:
+                continue
+            with self._inflight_lock:
+                if person_id in self._inflight:
+                    continue
+                future = self._executor.submit(self._fetch_credits, person_id)
+                self._inflight[person_id] = future
+            future.add_done_callback(lambda _, pid=person_id: self._finish_prefetch(pid))
+
+    def _finish_prefetch(self, person_id: int) -> None:
+        with self._inflight_lock:
+            self._inflight.pop(person_id, None)
+
+    def _fetch_credits(self, person_id: int) -> Dict[str, Any]:
+        credits = self._get(f"person/{person_id}/movie_credits")
+        self.credits_cache.set(person_id, credits)
+        return credits
+
+    def get_movie_credits(self, person_id: int) -> Dict[str, Any]:
+        """优先读缓存，其次等待正在进行的预取，最后才直接请求"""
+        credits = self.credits_cache.get(person_id)
+        if credits is not None:
+            return credits
+        with self._inflight_lock:
+            future = self._inflight.get(person_id)
+        if future is not None:
+            return future.result()
+        return self._fetch_credits(person_id)
+
+    def directed_movies(self, person_id: int) -> List[Dict[str, Any]]:
+        """该人物担任导演的作品，按上映日期从新到旧排序"""
+        crew = self.get_movie_credits(person_id).get("crew", [])
+        directed = [m for m in crew if m.get("job") == "Director"]
+        return sorted(directed, key=lambda x: x.get("release_date", ""), reverse=True)
+
+    def close(self) -> None:
+        self._executor.shutdown(wait=False)
+        self.session.close()
+
+
+_default_client = None
+_default_client_lock = threading.Lock()
+
+
+def get_tmdb_client() -> TMDBClient:
+    """进程内共享的默认TMDB客户端"""
+    global _default_client
+    if _default_client is None:
+        with _default_client_lock:
+            if _default_client is None:
+                _default_client = TMDBClient()
+    return _default_client
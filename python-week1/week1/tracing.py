@@ -0,0 +1,289 @@
+# tracing.py
+"""轻量级链路追踪：兼容OpenTelemetry数据模型，可导出到本地文件、OTLP采集器和火焰图"""
+import os
+import json
+import time
+import random
+import secrets
+import threading
+import functools
+import inspect
+import contextvars
+import urllib.request
+from collections import defaultdict
+from contextlib import contextmanager
+from typing import Any, Dict, List, Optional
+
+# 配置（环境变量）
+TRACE_SAMPLE_RATE = float(os.getenv("TRACE_SAMPLE_RATE", "0"))  # 采样率，0表示关闭
+TRACE_EXPORT_FILE = os.getenv("TRACE_EXPORT_FILE", "")  # 例如 traces.jsonl
+TRACE_OTLP_ENDPOINT = os.getenv("TRACE_OTLP_ENDPOINT", "")  # 例如 http://127.0.0.1:4318/v1/traces
+TRACE_FLAMEGRAPH_FILE = os.getenv("TRACE_FLAMEGRAPH_FILE", "")  # 例如 traces.folded
+SERVICE_NAME = os.getenv("TRACE_SERVICE_NAME", "movie-recommender")
+
+# 未被采样的链路使用的占位符，子span直接跳过
+_NOT_SAMPLED = object()
+_current_span = contextvars.ContextVar("current_span", default=None)
+
+
+class Span:
+    """单个追踪片段，字段与OTLP Span一一对应"""
+    __slots__ = ("name", "trace_id", "span_id", "parent", "start_ns", "end_ns",
+                 "attributes", "status", "children_ns")
+
+    def __init__(self, name: str, trace_id: str, parent: Optional["Span"], attributes: Dict[str, Any]):
+        self.name = name
+        self.trace_id = trace_id
+        self.span_id = secrets.token_hex(8)
+        self.parent = parent
+        self.start_ns = time.time_ns()
+        self.end_ns = 0
+        self.attributes = attributes
+        self.status = "OK"
+        self.children_ns = 0  # 子span耗时之和，用于计算自身耗时
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        self.attributes[key] = value
+
+    @property
+    def duration_ns(self) -> int:
+        return self.end_ns - self.start_ns
+
+    @property
+    def stack(self) -> str:
+        """火焰图使用的调用栈（root;child;grandchild）"""
+        names = []
+        span = self
+        while span is not None:
+            names.append(span.name)
+            span = span.parent
+        return ";".join(reversed(names))
+
+    def to_otlp(self) -> Dict[str, Any]:
+        """转换为OTLP/JSON格式"""
+        return {
+            "traceId": self.trace_id,
+            "spanId": self.span_id,
+            "parentSpanId": self.parent.span_id if self.parent else "",
+            "name": self.name,
+            "kind": 1,  # SPAN_KIND_INTERNAL
+            "startTimeUnixNano": str(self.start_ns),
+            "endTimeUnixNano": str(self.end_ns),
+            "attributes": [_otlp_attribute(k, v) for k, v in self.attributes.items()],
+            "status": {"code": 1 if self.status == "OK" else 2},
+        }
+
+
+def _otlp_attribute(key: str, value: Any) -> Dict[str, Any]:
+    """按OTLP规范编码属性值"""
+    if isinstance(value, bool):
+        return {"key": key, "value": {"boolValue": value}}
+    if isinstance(value, int):
+        return {"key": key, "value": {"intValue": str(value)}}
+    if isinstance(value, float):
+        return {"key": key, "value": {"doubleValue": value}}
+    return {"key": key, "value": {"stringValue": str(value)}}
+
+
+def _otlp_payload(spans: List[Span]) -> Dict[str, Any]:
+    """把一条完整链路包装成OTLP ExportTraceServiceRequest"""
+    return {
+        "resourceSpans": [{
+            "resource": {"attributes": [_otlp_attribute("service.name", SERVICE_NAME)]},
+            "scopeSpans": [{
+                "scope": {"name": "tracing"},
+                "spans": [span.to_otlp() for span in spans]
+            }]
+        }]
+    }
+
+
+class FileSpanExporter:
+    """每条链路写一行OTLP/JSON到本地文件"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+
+    def export(self, spans: List[Span]) -> None:
+        line = json.dumps(_otlp_payload(spans), ensure_ascii=False)
+        with self._lock:
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(line + "\n")
+
+    def shutdown(self) -> None:
+        pass
+
+
+class OTLPHttpExporter:
+    """通过OTLP/HTTP(JSON)发送到采集器，后台线程发送，不阻塞请求"""
+
+    def __init__(self, endpoint: str, timeout: float = 2.0):
+        self.endpoint = endpoint
+        self.timeout = timeout
+        self._pending: List[Span] = []
+        self._cond = threading.Condition()
+        self._stopped = False
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def export(self, spans: List[Span]) -> None:
+        with self._cond:
+            self._pending.extend(spans)
+            self._cond.notify()
+
+    def _run(self) -> None:
+        while True:
+            with self._cond:
+                while not self._pending and not self._stopped:
+                    self._cond.wait()
+                batch, self._pending = self._pending, []
+                stopped = self._stopped
+            if batch:
+                self._send(batch)
+            if stopped:
+                return
+
+    def _send(self, spans: List[Span]) -> None:
+        request = urllib.request.Request(
+            self.endpoint,
+            data=json.dumps(_otlp_payload(spans)).encode("utf-8"),
+            headers={"Content-Type": "application/json"},
+            method="POST"
+        )
+        try:
+            urllib.request.urlopen(request, timeout=self.timeout).close()
+        except Exception as e:
+            print(f"Trace export error: {str(e)}")
+
+    def shutdown(self) -> None:
+        with self._cond:
+            self._stopped = True
+            self._cond.notify()
+        self._thread.join(timeout=self.timeout)
+
+
+class FlameGraphRecorder:
+    """按调用栈累计自身耗时（微秒），输出collapsed格式，可直接用flamegraph.pl或speedscope打开"""
+
+    def __init__(self):
+        self._stacks = defaultdict(int)
+        self._lock = threading.Lock()
+
+    def export(self, spans: List[Span]) -> None:
+        with self._lock:
+            for span in spans:
+                self_ns = max(0, span.duration_ns - span.children_ns)
+                self._stacks[span.stack] += self_ns // 1000
+
+    def dump(self) -> str:
+        with self._lock:
+            return "\n".join(f"{stack} {us}" for stack, us in sorted(self._stacks.items()))
+
+    def write(self, path: str) -> None:
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(self.dump() + "\n")
+
+    def shutdown(self) -> None:
+        if TRACE_FLAMEGRAPH_FILE:
+            self.write(TRACE_FLAMEGRAPH_FILE)
+
+
+class Tracer:
+    """追踪器：在根span处决定是否采样，整条链路结束后统一导出"""
+
+    def __init__(self, sample_rate: float = TRACE_SAMPLE_RATE):
+        self.sample_rate = sample_rate
+        self.exporters = []
+        self.flamegraph = FlameGraphRecorder()
+        self._traces: Dict[str, List[Span]] = {}
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return self.sample_rate > 0
+
+    def add_exporter(self, exporter) -> None:
+        self.exporters.append(exporter)
+
+    @contextmanager
+    def span(self, name: str, **attributes):
+        """创建span，同步代码和协程内部都可使用"""
+        parent = _current_span.get()
+        if parent is _NOT_SAMPLED or (parent is None and not self._should_sample()):
+            token = _current_span.set(_NOT_SAMPLED)
+            try:
+                yield None
+            finally:
+                _current_span.reset(token)
+            return
+
+        trace_id = parent.trace_id if parent else secrets.token_hex(16)
+        span = Span(name, trace_id, parent, attributes)
+        with self._lock:
+            self._traces.setdefault(trace_id, []).append(span)
+        token = _current_span.set(span)
+        try:
+            yield span
+        except BaseException as e:
+            span.status = "ERROR"
+            span.set_attribute("exception.type", type(e).__name__)
+            raise
+        finally:
+            span.end_ns = time.time_ns()
+            _current_span.reset(token)
+            if parent is not None:
+                parent.children_ns += span.duration_ns
+            else:
+                self._finish_trace(trace_id)
+
+    def traced(self, name: Optional[str] = None):
+        """装饰器：为同步函数或协程函数自动创建span"""
+        def decorator(func):
+            span_name = name or func.__name__
+            if inspect.iscoroutinefunction(func):
+                @functools.wraps(func)
+                async def async_wrapper(*args, **kwargs):
+                    with self.span(span_name):
+                        return await func(*args, **kwargs)
+                return async_wrapper
+
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                with self.span(span_name):
+                    return func(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    def _should_sample(self) -> bool:
+        return self.sample_rate >= 1 or (self.sample_rate > 0 and random.random() < self.sample_rate)
+
+    def _finish_trace(self, trace_id: str) -> None:
+        with self._lock:
+            spans = self._traces.pop(trace_id, [])
+        self.flamegraph.export(spans)
+        for exporter in self.exporters:
+            try:
+                exporter.export(spans)
+            except Exception as e:
+                print(f"Trace export error: {str(e)}")
+
+    def shutdown(self) -> None:
+        """刷新所有导出器并写出火焰图"""
+        for exporter in self.exporters:
+            exporter.shutdown()
+        self.flamegraph.shutdown()
+
+
+def create_tracer() -> Tracer:
+    """根据环境变量创建追踪器"""
+    tracer = Tracer()
+    if TRACE_EXPORT_FILE:
+        tracer.add_exporter(FileSpanExporter(TRACE_EXPORT_FILE))
+    if TRACE_OTLP_ENDPOINT:
+        tracer.add_exporter(OTLPHttpExporter(TRACE_OTLP_ENDPOINT))
+    return tracer
+
+
+# 全局追踪器实例
+tracer = create_tracer()
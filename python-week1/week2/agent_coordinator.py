@@ -1,36 +1,68 @@
 # agent_coordinator.py
+import os
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from keyword_router import KeywordRouter
+from conversation_memory import ConversationMemory
+
+AGENT_TIMEOUT_SECONDS = float(os.getenv("AGENT_TIMEOUT_SECONDS", "30"))  # 并发分发时每个Agent的默认超时
+COORDINATOR_MAX_WORKERS = int(os.getenv("COORDINATOR_MAX_WORKERS", "8"))  # 并发分发的线程数
+
+
 class AgentCoordinator:
     """简单的Agent协调器"""
     
-    def __init__(self):
+    # 关键词路由表（命中关键词越多得分越高，同分时靠前的优先；也可传{关键词: 权重}）
+    ROUTES = [
+        ('financial', ['分析', '投资', '股票', '财务']),
+        ('research', ['数据', '研究', '统计', '市场']),
+        ('risk', ['风险', '警告', '问题']),
+    ]
+    
+    def __init__(self, max_workers=COORDINATOR_MAX_WORKERS, memory=None):
         self.agents = {}
-        self.conversation_history = []
+        # 对话记忆：Token预算窗口 + 后台摘要，不再无限增长
+        self.memory = memory or ConversationMemory()
+        self.last_fanout = {}  # 最近一次并发分发中各Agent的状态和耗时
+        self.stuck = {}  # 超时后仍占着工作线程的调用：Agent名 -> Future，完成后自动移除
+        self._stuck_lock = threading.Lock()
+        self.router = KeywordRouter(default_route='general')
+        for name, words in self.ROUTES:
+            self.router.add_route(name, words)
+        self.max_workers = max_workers
+        self.executor = None  # 第一次并发分发时按Agent数创建
+        self._executor_size = 0
     
-    def register_agent(self, name, agent_func, description):
-        """注册Agent"""
+    def register_agent(self, name, agent_func, description, timeout=None):
+        """注册Agent（timeout为并发分发时该Agent的超时秒数，默认AGENT_TIMEOUT_SECONDS）"""
         self.agents[name] = {
             'function': agent_func,
-            'description': description
+            'description': description,
+            'timeout': AGENT_TIMEOUT_SECONDS if timeout is None else timeout
         }
+        # Agent描述作为关键词都未命中时TF-IDF兜底分类的示例（ROUTER_FALLBACK_ENABLED=1时生效）
+        self.router.add_examples(name, [description])
     
     def route_question(self, question):
         """路由问题到合适的Agent"""
-        question_lower = question.lower()
-        
-        # 简单的关键词路由
-        if any(word in question_lower for word in ['分析', '投资', '股票', '财务']):
-            return 'financial'
-        elif any(word in question_lower for word in ['数据', '研究', '统计', '市场']):
-            return 'research'
-        elif any(word in question_lower for word in ['风险', '警告', '问题']):
-            return 'risk'
-        else:
-            return 'general'
+        return self.route_question_all(question)[0]
+    
+    def route_question_all(self, question):
+        """返回所有相关的Agent（按得分从高到低），都不相关时返回['general']"""
+        return self.router.route_all(question)
+    
+    def route_questions(self, questions):
+        """批量路由多个问题"""
+        return self.router.route_batch(questions)
     
-    def coordinate_response(self, question):
-        """协调多个Agent生成回答"""
+    def coordinate_response(self, question, fan_out=False):
+        """协调多个Agent生成回答（fan_out=True时同时询问所有相关Agent并合并回答）"""
+        if fan_out:
+            return self.coordinate_fanout(question)
+        
         # 记录对话历史
-        self.conversation_history.append(f"用户: {question}")
+        self.memory.add("human", question)
         
         # 路由到合适的Agent
         agent_type = self.route_question(question)
@@ -43,13 +75,105 @@ class AgentCoordinator:
             response = first_agent['function'](question)
         
         # 记录响应
-        self.conversation_history.append(f"AI ({agent_type}): {response}")
+        self.memory.add("ai", f"({agent_type}) {response}")
+        
+        return response, agent_type
+    
+    def coordinate_fanout(self, question):
+        """把问题并发分发给所有相关Agent，各自超时互不影响，总耗时取决于最慢（或超时）的那个"""
+        self.memory.add("human", question)
+        
+        names = [name for name in self.route_question_all(question) if name in self.agents]
+        if not names:
+            # 没有注册对应的Agent时使用第一个Agent
+            names = [next(iter(self.agents))]
+        
+        executor = self._get_executor()
+        start = time.perf_counter()
+        finished_at = {}
+        futures = {}
+        results = {}
+        for name in names:
+            # 上一次超时的调用还没结束时不再派发，避免卡住的调用占满线程池，让后续分发全部排队超时
+            with self._stuck_lock:
+                busy = name in self.stuck
+            if busy:
+                results[name] = {'status': 'busy', 'response': None, 'latency_ms': 0.0}
+                continue
+            futures[name] = executor.submit(self.agents[name]['function'], question)
+            futures[name].add_done_callback(lambda _, name=name: finished_at.setdefault(name, time.perf_counter()))
+        
+        # 按超时从短到长等待，每个Agent最多等到start + 自己的timeout
+        for name in sorted(futures, key=lambda n: self.agents[n]['timeout']):
+            remaining = start + self.agents[name]['timeout'] - time.perf_counter()
+            try:
+                response = futures[name].result(timeout=max(0, remaining))
+                results[name] = {'status': 'ok', 'response': response}
+            except FutureTimeoutError:
+                if not futures[name].cancel():  # 已在运行的线程无法中断，结束前该Agent不再接受分发
+                    self._mark_stuck(name, futures[name])
+                results[name] = {'status': 'timeout', 'response': None}
+            except Exception as e:
+                results[name] = {'status': 'error', 'response': None, 'error': str(e)}
+            results[name]['latency_ms'] = round((finished_at.get(name, time.perf_counter()) - start) * 1000, 1)
+        
+        self.last_fanout = {name: results[name] for name in names}
+        response = self.merge_responses(self.last_fanout)
+        agent_type = '+'.join(names)
+        self.memory.add("ai", f"({agent_type}) {response}")
         
         return response, agent_type
     
+    def _mark_stuck(self, name, future):
+        with self._stuck_lock:
+            self.stuck[name] = future
+
+        def release(_):
+            with self._stuck_lock:
+                if self.stuck.get(name) is future:
+                    del self.stuck[name]
+        future.add_done_callback(release)
+
+    def stuck_workers(self):
+        """超时后仍在运行、占着工作线程的调用数"""
+        with self._stuck_lock:
+            return len(self.stuck)
+
+    def _get_executor(self):
+        """线程数至少为Agent数的两倍：每个Agent最多一个卡住的调用，剩下的线程保证新的分发不用排队"""
+        size = max(self.max_workers, 2 * len(self.agents))
+        with self._stuck_lock:
+            if self._executor_size < size:
+                old = self.executor
+                self.executor = ThreadPoolExecutor(max_workers=size, thread_name_prefix="agent-fanout")
+                self._executor_size = size
+                if old is not None:
+                    old.shutdown(wait=False)  # 旧线程池里还在运行的调用结束后线程自行退出
+            return self.executor
+
+    def merge_responses(self, results):
+        """按路由得分顺序合并各Agent的回答，超时或出错的注明原因"""
+        if len(results) == 1:
+            result = next(iter(results.values()))
+            if result['status'] == 'ok':
+                return result['response']
+        
+        parts = []
+        for name, result in results.items():
+            title = self.agents[name]['description']
+            if result['status'] == 'ok':
+                parts.append(f"【{title}】{result['response']}")
+            elif result['status'] == 'timeout':
+                parts.append(f"【{title}】（超过{self.agents[name]['timeout']:g}秒未返回，已跳过）")
+            elif result['status'] == 'busy':
+                parts.append(f"【{title}】（上一次调用仍未结束，已跳过）")
+            else:
+                parts.append(f"【{title}】（出错: {result['error'][:100]}）")
+        return "\n".join(parts)
+    
     def get_conversation_summary(self):
-        """获取对话摘要"""
-        return "\n".join(self.conversation_history[-6:])  # 返回最近3轮对话
+        """获取对话摘要（较早对话的摘要 + 最近的原文）"""
+        return self.memory.context_text()
 
 # 使用示例
 if __name__ == "__main__":
@@ -83,4 +207,14 @@ if __name__ == "__main__":
         print(f"问题: {question}")
         print(f"使用的Agent: {agent_used}")
         print(f"回答: {response}")
-        print("-" * 50)
\ No newline at end of file
+        print("-" * 50)
+    
+    # 并发分发：同时涉及投资和风险的问题会得到两个Agent的回答
+    question = "分析投资茅台股票有哪些风险"
+    response, agent_used = coordinator.coordinate_response(question, fan_out=True)
+    print(f"问题: {question}")
+    print(f"并发询问的Agent: {agent_used}")
+    print(f"合并回答:\n{response}")
+    for name, result in coordinator.last_fanout.items():
+        print(f"- {name}: {result['status']} {result['latency_ms']}ms")
+    print(f"超时后仍在运行的调用: {coordinator.stuck_workers()}")
@@ -0,0 +1,53 @@
+# async_batch.py
+"""异步批量执行工具：令牌桶限流、带抖动的指数退避重试、按完成顺序流式返回结果"""
+import time
+import random
+import asyncio
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Iterable, Tuple
+
+
+class TokenBucket:
+    """令牌桶：平均每秒rate个请求，允许capacity个突发"""
+
+    def __init__(self, rate: float, capacity: float = 1):
+        self.rate = rate
+        self.capacity = max(1.0, capacity)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self) -> None:
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+
+def jittered_backoff(attempt: int, base_delay: float, max_delay: float) -> float:
+    """全抖动指数退避：在[0, min(max_delay, base_delay*2^attempt)]内随机取值，避免重试同时涌向数据源"""
+    return random.uniform(0, min(max_delay, base_delay * (2 ** attempt)))
+
+
+async def run_as_completed(jobs: Iterable[Tuple[Any, Callable[[], Awaitable[Any]]]],
+                           max_concurrency: int = 8) -> AsyncIterator[Dict[str, Any]]:
+    """并发执行(key, 协程工厂)列表，按完成顺序产出{"key", "result", "latency_ms"}"""
+    semaphore = asyncio.Semaphore(max_concurrency)
+
+    async def run(key, factory):
+        async with semaphore:
+            start = time.perf_counter()
+            result = await factory()
+            return {"key": key, "result": result, "latency_ms": round((time.perf_counter() - start) * 1000, 2)}
+
+    tasks = [asyncio.ensure_future(run(key, factory)) for key, factory in jobs]
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            yield await next_done
+    finally:
+        for task in tasks:
+            task.cancel()
@@ -0,0 +1,69 @@
+# bench_llm_registry.py
+"""对比每次调用都新建ChatOpenAI（原investment_analysis_tool的写法）与llm_registry共享实例的单次调用开销
+
+用法：
+    python bench_llm_registry.py --calls 100 --latency-ms 20
+"""
+import time
+import argparse
+from langchain_openai import ChatOpenAI
+import common_path  # noqa: F401  各周共用的模块（python-week1/common）
+from openai_stub import start_stub_server
+from llm_registry import get_llm, clear_registry
+
+PROMPT = "作为专业投资顾问，请分析贵州茅台的投资价值"
+
+
+def bench_fresh(base_url: str, calls: int) -> float:
+    """每次调用都新建ChatOpenAI"""
+    start = time.perf_counter()
+    for _ in range(calls):
+        llm = ChatOpenAI(model="deepseek-chat", openai_api_key="stub", openai_api_base=base_url, temperature=0.3)
+        llm.invoke(PROMPT)
+    return time.perf_counter() - start
+
+
+def bench_registry(base_url: str, calls: int) -> float:
+    """从注册表获取共享实例（首次调用时创建）"""
+    clear_registry()
+    start = time.perf_counter()
+    for _ in range(calls):
+        get_llm(temperature=0.3, api_key="stub", base_url=base_url).invoke(PROMPT)
+    return time.perf_counter() - start
+
+
+def bench_construct(base_url: str, calls: int) -> float:
+    """只创建实例不发请求，单独看构造开销"""
+    start = time.perf_counter()
+    for _ in range(calls):
+        ChatOpenAI(model="deepseek-chat", openai_api_key="stub", openai_api_base=base_url, temperature=0.3)
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description="LLM实例复用基准")
+    parser.add_argument("--calls", type=int, default=100)
+    parser.add_argument("--latency-ms", type=float, default=20)
+    args = parser.parse_args()
+
+    server = start_stub_server(latency_ms=args.latency_ms)
+    base_url = f"http://127.0.0.1:{server.server_port}/v1"
+    # 预热一次（导入、首次建连），避免计入第一组
+    get_llm(temperature=0.3, api_key="stub", base_url=base_url).invoke(PROMPT)
+
+    results = [
+        ("每次新建ChatOpenAI", bench_fresh(base_url, args.calls)),
+        ("llm_registry共享实例", bench_registry(base_url, args.calls)),
+    ]
+    construct = bench_construct(base_url, args.calls)
+    server.shutdown()
+
+    print(f"调用次数: {args.calls} | 桩服务延迟: {args.latency_ms}ms")
+    for name, elapsed in results:
+        per_call_ms = elapsed / args.calls * 1000
+        print(f"{name:<24} 每次 {per_call_ms:7.2f}ms | 额外开销 {per_call_ms - args.latency_ms:6.2f}ms")
+    print(f"{'仅构造ChatOpenAI':<24} 每次 {construct / args.calls * 1000:7.2f}ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,55 @@
+# bench_quote_memory.py
+"""对比批量行情三种表示的内存占用和构造耗时（tracemalloc统计，合成行情，不联网）
+
+- 字典：原get_stock_prices的返回形式，成交量/成交额是预先格式化的字符串
+- Quote列表：每只股票一个NamedTuple，只存原始数值
+- QuoteBatch：每个字段一个NumPy数组
+
+用法：
+    python bench_quote_memory.py --symbols 5000
+"""
+import time
+import logging
+import argparse
+import tracemalloc
+from market_providers import SyntheticMarketProvider
+from stock_api_client import StockDataAPI
+
+
+def measure(build):
+    """返回(构造结果占用的字节数, 构造耗时秒)"""
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = build()
+    elapsed = time.perf_counter() - start
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del result
+    return size, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="行情表示内存基准")
+    parser.add_argument("--symbols", type=int, default=5000)
+    args = parser.parse_args()
+    logging.disable(logging.INFO)
+
+    provider = SyntheticMarketProvider(n_symbols=args.symbols)
+    api = StockDataAPI(provider=provider)
+    symbols = [code[2:] for code in provider.codes]
+    api.get_quote_batch(symbols)  # 预热：拉取快照、建索引
+    batch = api.get_quote_batch(symbols)
+
+    results = [
+        ("字典（预格式化字符串）", measure(lambda: [batch[i].to_dict() for i in range(len(batch))])),
+        ("Quote列表", measure(lambda: [batch[i] for i in range(len(batch))])),
+        ("QuoteBatch数组", measure(lambda: api.get_quote_batch(symbols))),
+    ]
+
+    print(f"股票数: {args.symbols}")
+    for name, (size, elapsed) in results:
+        print(f"{name:<16} 内存 {size / 1024:9.1f}KB ({size / args.symbols:6.1f}B/只) | 耗时 {elapsed * 1000:7.2f}ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+# bench_router.py
+"""路由微基准：原route_question的逐词any()扫描 vs KeywordRouter编译后的多模式匹配（单条和批量）
+
+route/route_batch包含加权打分（TF-IDF兜底默认关闭，未命中问题直接走默认路由），matches只统计匹配器本身；
+4x4词表走逐个in检查，其余两档走编译后的匹配器
+
+用法：
+    python bench_router.py --questions 2000
+"""
+import time
+import random
+import argparse
+from keyword_router import KeywordRouter
+
+CHARS = [chr(c) for c in range(0x4E00, 0x4E00 + 800)]  # 常用区段的汉字做合成词表
+
+
+def make_vocab(rng: random.Random, routes: int, keywords: int):
+    return {f"route{r}": list({"".join(rng.choices(CHARS, k=rng.randint(2, 4))) for _ in range(keywords)})
+            for r in range(routes)}
+
+
+def make_questions(rng: random.Random, vocab, count: int):
+    words = [word for words in vocab.values() for word in words]
+    questions = []
+    for _ in range(count):
+        parts = rng.choices(CHARS, k=rng.randint(10, 30))
+        if rng.random() < 0.7:  # 七成问题包含1~2个关键词
+            for word in rng.sample(words, rng.randint(1, 2)):
+                parts.insert(rng.randrange(len(parts)), word)
+        questions.append("".join(parts))
+    return questions
+
+
+def linear_route(vocab, question: str) -> str:
+    """原实现：按路由顺序逐个any(word in question)"""
+    question_lower = question.lower()
+    for route, words in vocab.items():
+        if any(word in question_lower for word in words):
+            return route
+    return "general"
+
+
+def bench(label: str, fn, count: int):
+    start = time.perf_counter()
+    fn()
+    elapsed = time.perf_counter() - start
+    print(f"  {label:<22} {elapsed / count * 1e6:8.2f}us/条")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="关键词路由基准")
+    parser.add_argument("--questions", type=int, default=2000)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+    rng = random.Random(args.seed)
+
+    for routes, keywords in [(4, 4), (20, 50), (50, 200)]:
+        vocab = make_vocab(rng, routes, keywords)
+        questions = make_questions(rng, vocab, args.questions)
+        router = KeywordRouter()
+        for route, words in vocab.items():
+            router.add_route(route, words)
+        start = time.perf_counter()
+        router.compile()
+        compile_ms = (time.perf_counter() - start) * 1000
+
+        print(f"{routes}个路由 x {keywords}个关键词（编译 {compile_ms:.1f}ms）:")
+        bench("逐词any()扫描", lambda: [linear_route(vocab, q) for q in questions], len(questions))
+        bench("仅关键词匹配matches", lambda: [router.matches(q) for q in questions], len(questions))
+        bench("KeywordRouter.route", lambda: [router.route(q) for q in questions], len(questions))
+        bench("KeywordRouter.route_batch", lambda: router.route_batch(questions), len(questions))
+
+
+if __name__ == "__main__":
+    main()
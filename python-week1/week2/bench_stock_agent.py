@@ -0,0 +1,63 @@
+# bench_stock_agent.py
+"""离线压测RobustStockAgent：合成全市场行情（可配置拉取延迟）代替AKShare，结果可复现，不依赖网络
+
+用法：
+    python bench_stock_agent.py --market-size 5000 --symbols 500 --latency-ms 300
+"""
+import time
+import argparse
+import logging
+import numpy as np
+from market_providers import SyntheticMarketProvider
+from stock_api_client import StockDataAPI
+from robust_stock_agent import RobustStockAgent
+
+
+def percentile_ms(values, q):
+    return float(np.percentile(values, q)) if values else 0.0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="股票Agent离线基准")
+    parser.add_argument("--market-size", type=int, default=5000, help="合成市场股票数")
+    parser.add_argument("--symbols", type=int, default=500, help="每批查询的股票数")
+    parser.add_argument("--latency-ms", type=float, default=300, help="整表拉取的模拟延迟")
+    parser.add_argument("--rounds", type=int, default=3, help="热缓存批量查询轮数")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+    logging.disable(logging.INFO)  # 压测时关闭逐条日志
+
+    provider = SyntheticMarketProvider(n_symbols=args.market_size, latency_ms=args.latency_ms, seed=args.seed)
+    agent = RobustStockAgent()
+    agent.stock_api = StockDataAPI(provider=provider)
+    rng = np.random.default_rng(args.seed)
+    symbols = [code[2:] for code in rng.choice(provider.codes, size=args.symbols, replace=False)]
+    functions = ["price", "company_info"]
+
+    start = time.perf_counter()
+    agent.batch_query(symbols, functions)
+    cold = time.perf_counter() - start
+
+    warm = []
+    for _ in range(args.rounds):
+        start = time.perf_counter()
+        agent.batch_query(symbols, functions)
+        warm.append(time.perf_counter() - start)
+    latencies = [ms for timings in agent.last_batch_latency.values() for ms in timings.values()]
+
+    start = time.perf_counter()
+    for symbol in symbols:
+        for function in functions:
+            agent.safe_api_call(symbol, function)
+    sequential = time.perf_counter() - start
+
+    print(f"合成市场: {args.market_size}只 | 每批: {args.symbols}只 x {len(functions)}项 | 整表延迟: {args.latency_ms}ms")
+    print(f"{'首批（含整表拉取）':<20} {cold * 1000:9.1f}ms")
+    print(f"{'批量查询（热快照）':<20} {np.mean(warm) * 1000:9.1f}ms | 单项 p50 {percentile_ms(latencies, 50):.2f}ms"
+          f" p95 {percentile_ms(latencies, 95):.2f}ms")
+    print(f"{'逐个safe_api_call':<20} {sequential * 1000:9.1f}ms")
+    print(f"整表拉取次数: {provider.fetch_count} | 总请求数: {agent.request_count}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,231 @@
+# conversation_memory.py
+"""有界对话记忆：最近若干轮放在按Token预算裁剪的环形缓冲区里，被挤出的旧对话在后台线程增量合并进摘要，
+每轮送进提示词的记忆 = 摘要 + 窗口，Token数不随会话长度增长"""
+import os
+import re
+import logging
+import threading
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, NamedTuple, Optional
+
+logger = logging.getLogger(__name__)
+
+MEMORY_MAX_TOKENS = int(os.getenv("MEMORY_MAX_TOKENS", "1200"))  # 窗口内原文对话的Token上限
+MEMORY_SUMMARY_TOKENS = int(os.getenv("MEMORY_SUMMARY_TOKENS", "300"))  # 摘要的Token上限
+MEMORY_MAX_TURNS = int(os.getenv("MEMORY_MAX_TURNS", "40"))  # 环形缓冲区最多保留的消息条数
+
+ROLE_LABELS = {"human": "用户", "ai": "AI", "system": "系统"}
+
+try:
+    import tiktoken
+    _encoder = tiktoken.get_encoding("cl100k_base")
+except Exception:  # 未安装tiktoken或无法下载编码表时用估算
+    _encoder = None
+
+
+def count_tokens(text: str) -> int:
+    """Token数：有tiktoken时精确计数，否则按中文每字1个、其他约4个字符1个估算"""
+    if _encoder is not None:
+        return len(_encoder.encode(text))
+    cjk = len(re.findall(r"[一-鿿]", text))
+    return cjk + (len(text) - cjk + 3) // 4
+
+
+class Turn(NamedTuple):
+    role: str  # human / ai
+    content: str
+    tokens: int
+
+
+Summarizer = Callable[[str, List[Turn]], str]
+
+
+def extractive_summarizer(summary: str, turns: List[Turn]) -> str:
+    """默认摘要（不调用模型）：每条旧消息保留第一句，追加到已有摘要后面"""
+    lines = [summary] if summary else []
+    for turn in turns:
+        first_sentence = re.split(r"(?<=[。！？!?\n])", turn.content.strip(), maxsplit=1)[0]
+        lines.append(f"{ROLE_LABELS.get(turn.role, turn.role)}: {first_sentence[:80]}")
+    return "\n".join(lines)
+
+
+def llm_summarizer(llm) -> Summarizer:
+    """用LLM做增量摘要：输入旧摘要和新挤出的对话，输出合并后的摘要"""
+    def summarize(summary: str, turns: List[Turn]) -> str:
+        dialogue = "\n".join(f"{ROLE_LABELS.get(t.role, t.role)}: {t.content}" for t in turns)
+        prompt = (
+            f"请把新的对话内容合并进已有摘要，保留用户关注的股票、结论和待办事项，不超过{MEMORY_SUMMARY_TOKENS}字。\n"
+            f"已有摘要：\n{summary or '（无）'}\n\n新的对话：\n{dialogue}\n\n合并后的摘要："
+        )
+        response = llm.invoke(prompt)
+        return getattr(response, "content", response).strip()
+    return summarize
+
+
+def truncate_to_tokens(text: str, max_tokens: int) -> str:
+    """超出预算时从开头按行丢弃（保留较新的内容）"""
+    lines = text.split("\n")
+    while len(lines) > 1 and count_tokens("\n".join(lines)) > max_tokens:
+        lines.pop(0)
+    result = "\n".join(lines)
+    while result and count_tokens(result) > max_tokens:
+        result = result[len(result) // 4:]
+    return result
+
+
+class ConversationMemory:
+    """Token预算窗口 + 环形缓冲区 + 后台增量摘要
+
+    - add()只做追加和裁剪，被挤出的消息交给单线程执行器合并进摘要，不阻塞当前轮
+    - 摘要完成前被挤出的消息不出现在上下文里；超过max_tokens的单条消息按truncate_to_tokens截断，
+      因此上下文Token数始终不超过 max_tokens + summary_max_tokens
+    """
+
+    def __init__(self, max_tokens: int = MEMORY_MAX_TOKENS, summary_max_tokens: int = MEMORY_SUMMARY_TOKENS,
+                 max_turns: int = MEMORY_MAX_TURNS, summarizer: Optional[Summarizer] = None, background: bool = True):
+        self.max_tokens = max_tokens
+        self.summary_max_tokens = summary_max_tokens
+        self.summarizer = summarizer or extractive_summarizer
+        self.turns: deque = deque()
+        self.max_turns = max_turns
+        self.window_tokens = 0
+        self.summary = ""
+        self.summarized_turns = 0
+        self._pending: List[Turn] = []
+        self._summarizing = False  # 是否已有摘要任务在处理积压消息
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="memory-summary") if background else None
+        self._future: Optional[Future] = None
+
+    def add(self, role: str, content: str) -> None:
+        tokens = count_tokens(content)
+        if tokens > self.max_tokens:
+            # 单条消息超过整个窗口时只保留结尾部分，否则上下文会超出预算
+            content = truncate_to_tokens(content, self.max_tokens)
+            tokens = count_tokens(content)
+        turn = Turn(role, content, tokens)
+        with self._lock:
+            self.turns.append(turn)
+            self.window_tokens += turn.tokens
+            # 至少保留最新一条，超出条数或Token预算的旧消息移出窗口
+            while len(self.turns) > 1 and (len(self.turns) > self.max_turns or self.window_tokens > self.max_tokens):
+                evicted = self.turns.popleft()
+                self.window_tokens -= evicted.tokens
+                self._pending.append(evicted)
+            start = bool(self._pending) and not self._summarizing
+            if start:
+                self._summarizing = True
+        if start:
+            if self._executor is None:
+                self._summarize_pending()
+            else:
+                self._future = self._executor.submit(self._summarize_pending)
+
+    def add_exchange(self, user_input: str, output: str) -> None:
+        self.add("human", user_input)
+        self.add("ai", output)
+
+    def _summarize_pending(self) -> None:
+        """把积压的旧消息合并进摘要；执行期间新挤出的消息留到下一次"""
+        while True:
+            with self._lock:
+                pending, self._pending = self._pending, []
+                summary = self.summary
+                if not pending:
+                    self._summarizing = False
+                    return
+            try:
+                summary = truncate_to_tokens(self.summarizer(summary, pending), self.summary_max_tokens)
+            except Exception as e:
+                logger.warning(f"⚠️ 对话摘要失败，改用抽取式摘要: {str(e)[:100]}")
+                summary = truncate_to_tokens(extractive_summarizer(summary, pending), self.summary_max_tokens)
+            with self._lock:
+                self.summary = summary
+                self.summarized_turns += len(pending)
+
+    def messages(self) -> List[Dict[str, str]]:
+        """上下文消息：摘要（作为system消息）+ 窗口内原文"""
+        with self._lock:
+            summary, turns = self.summary, list(self.turns)
+        messages = [{"role": "system", "content": f"此前对话摘要：\n{summary}"}] if summary else []
+        messages.extend({"role": turn.role, "content": turn.content} for turn in turns)
+        return messages
+
+    def context_text(self) -> str:
+        return "\n".join(f"{ROLE_LABELS.get(m['role'], m['role'])}: {m['content']}" for m in self.messages())
+
+    def context_tokens(self) -> int:
+        with self._lock:
+            return self.window_tokens + (count_tokens(self.summary) if self.summary else 0)
+
+    def flush(self, timeout: Optional[float] = None) -> None:
+        """等待后台摘要完成（测试或退出前调用）"""
+        if self._future is not None:
+            self._future.result(timeout=timeout)
+
+    def clear(self) -> None:
+        self.flush()
+        with self._lock:
+            self.turns.clear()
+            self.window_tokens = 0
+            self.summary = ""
+            self.summarized_turns = 0
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "window_turns": len(self.turns),
+                "window_tokens": self.window_tokens,
+                "summary_tokens": count_tokens(self.summary) if self.summary else 0,
+                "summarized_turns": self.summarized_turns,
+                "pending_turns": len(self._pending),
+            }
+
+
+try:
+    from langchain_core.memory import BaseMemory
+    from langchain_core.messages import AIMessage, HumanMessage, SystemMessage, get_buffer_string
+except ImportError as e:  # 未安装LangChain或langchain-core>=1（已移除BaseMemory）时只提供ConversationMemory
+    BaseMemory = None
+    _langchain_import_error = e
+
+if BaseMemory is None:
+    class BoundedConversationMemory:
+        """当前环境没有langchain_core.memory.BaseMemory，构造时报错说明原因"""
+
+        def __init__(self, **kwargs: Any):
+            raise ImportError("BoundedConversationMemory需要langchain-core<1（提供langchain_core.memory.BaseMemory），"
+                              f"当前环境导入失败: {_langchain_import_error}；不依赖LangChain时请直接使用ConversationMemory"
+                              ) from _langchain_import_error
+else:
+    class BoundedConversationMemory(BaseMemory):
+        """ConversationBufferMemory的替代：接口相同，但只回放摘要 + Token预算窗口"""
+
+        memory: Any = None  # ConversationMemory实例
+        memory_key: str = "history"
+        return_messages: bool = False
+        input_key: Optional[str] = None
+        output_key: Optional[str] = None
+
+        def __init__(self, **kwargs: Any):
+            super().__init__(**kwargs)
+            if self.memory is None:
+                self.memory = ConversationMemory()
+
+        @property
+        def memory_variables(self) -> List[str]:
+            return [self.memory_key]
+
+        def load_memory_variables(self, inputs: Dict[str, Any]) -> Dict[str, Any]:
+            message_types = {"system": SystemMessage, "human": HumanMessage, "ai": AIMessage}
+            messages = [message_types[m["role"]](content=m["content"]) for m in self.memory.messages()]
+            return {self.memory_key: messages if self.return_messages else get_buffer_string(messages)}
+
+        def save_context(self, inputs: Dict[str, Any], outputs: Dict[str, str]) -> None:
+            input_key = self.input_key or next(k for k in inputs if k not in (*self.memory_variables, "stop"))
+            output_key = self.output_key or next(iter(outputs))
+            self.memory.add_exchange(str(inputs[input_key]), str(outputs[output_key]))
+
+        def clear(self) -> None:
+            self.memory.clear()
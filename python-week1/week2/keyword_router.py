@@ -0,0 +1,211 @@
+# keyword_router.py
+"""关键词路由索引：所有关键词编译成一个多模式匹配器，按权重给各路由打分；
+可选在没有关键词命中时用字符n-gram TF-IDF相似度兜底；支持一次路由多个问题
+
+匹配器按词表大小选择：关键词很少时逐个`in`检查最快（编译匹配器反而多出调用开销）；中等词表用字典树形正则（一次扫描，C实现）；
+关键词多时CPython正则会在每个位置逐个尝试分支，改用按长度取子串、与关键词集合求交集的哈希索引，开销只与问题长度和关键词长度种类有关"""
+import os
+import re
+import threading
+from typing import Dict, Iterable, List, Optional, Tuple, Union
+import numpy as np
+
+ROUTER_FALLBACK_ENABLED = os.getenv("ROUTER_FALLBACK_ENABLED", "0") == "1"  # 关键词都未命中时是否用TF-IDF兜底（默认关闭，未命中走默认路由）
+ROUTER_FALLBACK_MIN_SIMILARITY = float(os.getenv("ROUTER_FALLBACK_MIN_SIMILARITY", "0.35"))  # TF-IDF兜底的最低余弦相似度
+LINEAR_MAX_KEYWORDS = 32  # 关键词数不超过该值时逐个in检查，不编译匹配器（见bench_router.py）
+REGEX_MAX_KEYWORDS = 64  # 关键词数不超过该值时用正则匹配器，否则用子串哈希索引
+
+
+def _trie_pattern(words: Iterable[str]) -> str:
+    """把关键词集合转成字典树形的正则：共享前缀只匹配一次，长词优先，匹配开销与词表大小无关"""
+    trie: Dict = {}
+    for word in words:
+        node = trie
+        for ch in word:
+            node = node.setdefault(ch, {})
+        node[""] = {}  # 词尾标记
+
+    def build(node: Dict) -> str:
+        terminal = "" in node
+        branches = [re.escape(ch) + build(child) for ch, child in sorted(node.items()) if ch]
+        if not branches:
+            return ""
+        if len(branches) == 1 and not terminal:
+            return branches[0]
+        group = f"(?:{'|'.join(branches)})"
+        return f"{group}?" if terminal else group  # 贪婪匹配：先尝试更长的词
+
+    return build(trie)
+
+
+def char_ngrams(text: str, n_range: Tuple[int, int] = (2, 3)) -> List[str]:
+    """字符n-gram（中文不分词），去掉空白；不用单字，避免只共享一个字（如“估”）就被归类"""
+    text = re.sub(r"\s+", "", text.lower())
+    return [text[i:i + n] for n in range(n_range[0], n_range[1] + 1) for i in range(len(text) - n + 1)]
+
+
+class TfidfFallback:
+    """每个路由的示例文本合成一篇文档，算字符n-gram TF-IDF质心，问题按余弦相似度归类"""
+
+    def __init__(self):
+        self.routes: List[str] = []
+        self.vocab: Dict[str, int] = {}
+        self.idf = np.zeros(0)
+        self.centroids = np.zeros((0, 0))
+
+    def fit(self, examples: Dict[str, List[str]]) -> None:
+        self.routes = [route for route, texts in examples.items() if texts]
+        docs = [char_ngrams(" ".join(examples[route])) for route in self.routes]
+        self.vocab = {gram: i for i, gram in enumerate(sorted({gram for doc in docs for gram in doc}))}
+        counts = self._counts(docs)
+        df = (counts > 0).sum(axis=0)
+        self.idf = np.log((1 + len(docs)) / (1 + df)) + 1
+        self.centroids = self._normalize(counts * self.idf)
+
+    def _counts(self, docs: List[List[str]]) -> np.ndarray:
+        counts = np.zeros((len(docs), len(self.vocab)))
+        for row, doc in enumerate(docs):
+            for gram in doc:
+                col = self.vocab.get(gram)
+                if col is not None:
+                    counts[row, col] += 1
+        return counts
+
+    @staticmethod
+    def _normalize(matrix: np.ndarray) -> np.ndarray:
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        return matrix / np.where(norms == 0, 1, norms)
+
+    def similarities(self, questions: List[str]) -> np.ndarray:
+        """返回(问题数, 路由数)的余弦相似度矩阵；问题向量很稀疏，只取出现过的n-gram列计算"""
+        result = np.zeros((len(questions), len(self.routes)))
+        for row, question in enumerate(questions):
+            cols = [self.vocab[gram] for gram in char_ngrams(question) if gram in self.vocab]
+            if not cols:
+                continue
+            cols, tf = np.unique(cols, return_counts=True)
+            weights = tf * self.idf[cols]
+            result[row] = self.centroids[:, cols] @ weights / np.linalg.norm(weights)
+        return result
+
+
+class KeywordRouter:
+    """加权关键词路由：同一关键词可属于多个路由；同分时按路由注册顺序（先注册的优先）"""
+
+    def __init__(self, default_route: str = "general", fallback: bool = ROUTER_FALLBACK_ENABLED,
+                 fallback_min_similarity: float = ROUTER_FALLBACK_MIN_SIMILARITY):
+        self.default_route = default_route
+        self.fallback_enabled = fallback
+        self.fallback_min_similarity = fallback_min_similarity
+        self.routes: List[str] = []
+        self.keywords: Dict[str, Dict[str, float]] = {}  # 关键词 -> {路由: 权重}
+        self.examples: Dict[str, List[str]] = {}  # 路由 -> TF-IDF兜底用的示例文本
+        self._dirty = True  # 路由表变化后需要重新编译
+        self._linear: Tuple[str, ...] = ()  # 小词表：逐个in检查
+        self._pattern: Optional[re.Pattern] = None
+        self._vocabulary: frozenset = frozenset()
+        self._lengths: List[int] = []
+        self._order: Dict[str, int] = {}
+        self._contained: Dict[str, List[str]] = {}  # 关键词 -> 它包含的所有关键词（含自身）
+        self._fallback = TfidfFallback()
+        self._lock = threading.Lock()
+
+    def add_route(self, route: str, keywords: Union[Dict[str, float], Iterable[str]], examples: Iterable[str] = ()) -> None:
+        """注册路由：keywords为关键词列表（权重1）或{关键词: 权重}；examples为兜底分类器的示例问题"""
+        if route not in self.routes:
+            self.routes.append(route)
+        weights = keywords if isinstance(keywords, dict) else {word: 1.0 for word in keywords}
+        with self._lock:
+            for word, weight in weights.items():
+                self.keywords.setdefault(word.lower(), {})[route] = float(weight)
+            self.examples.setdefault(route, []).extend(weights)
+            self.examples[route].extend(examples)
+            self._dirty = True
+
+    def add_examples(self, route: str, examples: Iterable[str]) -> None:
+        with self._lock:
+            self.examples.setdefault(route, []).extend(examples)
+            self._dirty = True
+
+    def compile(self) -> None:
+        """（重新）构建匹配器和兜底分类器，路由表变化后第一次查询时自动调用"""
+        with self._lock:
+            if not self._dirty:
+                return
+            words = sorted(self.keywords)
+            self._vocabulary = frozenset(words)
+            self._lengths = sorted({len(word) for word in words})
+            self._linear = ()
+            self._pattern = None
+            if len(words) <= LINEAR_MAX_KEYWORDS:
+                self._linear = tuple(words)
+            elif len(words) <= REGEX_MAX_KEYWORDS:
+                # 前瞻匹配在每个位置取最长的关键词；再补上它包含的短关键词，结果与Aho-Corasick输出的命中集合相同
+                self._pattern = re.compile(f"(?=({_trie_pattern(words)}))")
+                self._contained = {
+                    word: [w for w in {word[i:j] for i in range(len(word)) for j in range(i + 1, len(word) + 1)}
+                           if w in self._vocabulary]
+                    for word in words
+                }
+            fallback = TfidfFallback()
+            if self.fallback_enabled:
+                fallback.fit(self.examples)
+            self._fallback = fallback
+            self._order = {route: i for i, route in enumerate(self.routes)}
+            self._dirty = False
+
+    def matches(self, question: str) -> List[str]:
+        """问题中出现的所有关键词（去重）"""
+        if self._dirty:
+            self.compile()
+        question = question.lower()
+        if self._linear or not self._vocabulary:
+            return [word for word in self._linear if word in question]  # _linear已排序
+        if self._pattern is not None:
+            found = set()
+            for longest in self._pattern.findall(question):
+                found.update(self._contained[longest])
+        else:
+            n = len(question)
+            found = self._vocabulary.intersection(
+                [question[i:i + length] for length in self._lengths for i in range(n - length + 1)]
+            )
+        return sorted(found)
+
+    def scores(self, question: str) -> Dict[str, float]:
+        """各路由得分：命中关键词（每个只算一次）的权重之和"""
+        scores: Dict[str, float] = {}
+        for word in self.matches(question):
+            for route, weight in self.keywords[word].items():
+                scores[route] = scores.get(route, 0.0) + weight
+        return scores
+
+    def _rank(self, scores: Dict[str, float]) -> List[str]:
+        return sorted((r for r, s in scores.items() if s > 0), key=lambda r: (-scores[r], self._order[r]))
+
+    def route_all(self, question: str) -> List[str]:
+        """按得分从高到低返回所有命中的路由；没有命中时用兜底分类器（若开启），仍无结果返回[default_route]"""
+        ranked = self._rank(self.scores(question))
+        if ranked or not self._fallback.routes:
+            return ranked or [self.default_route]
+        return self.route_all_batch([question])[0]
+
+    def route(self, question: str) -> str:
+        return self.route_all(question)[0]
+
+    def route_all_batch(self, questions: List[str]) -> List[List[str]]:
+        """批量路由：关键词逐条匹配，未命中的问题一次性做TF-IDF矩阵运算"""
+        if self._dirty:
+            self.compile()
+        ranked = [self._rank(self.scores(question)) for question in questions]
+        missing = [i for i, routes in enumerate(ranked) if not routes]
+        if missing and self._fallback.routes:
+            similarities = self._fallback.similarities([questions[i] for i in missing])
+            best = similarities.argmax(axis=1)
+            for row, i in enumerate(missing):
+                if similarities[row, best[row]] >= self.fallback_min_similarity:
+                    ranked[i] = [self._fallback.routes[best[row]]]
+        return [routes or [self.default_route] for routes in ranked]
+
+    def route_batch(self, questions: List[str]) -> List[str]:
+        return [routes[0] for routes in self.route_all_batch(questions)]
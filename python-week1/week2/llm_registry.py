@@ -0,0 +1,94 @@
+# llm_registry.py
+"""进程内LLM注册表：相同配置的ChatOpenAI只创建一次，所有工具和Agent共享有上限的httpx连接池（同步和异步各一个）
+
+异步连接池绑定第一次使用它的事件循环，异步调用应在同一个长期运行的事件循环里进行"""
+import os
+import logging
+import threading
+from typing import Any, Dict, Optional, Tuple
+import httpx
+from dotenv import load_dotenv
+from langchain_openai import ChatOpenAI
+
+# 加载环境变量
+load_dotenv()
+
+logger = logging.getLogger("LLMRegistry")
+
+DEEPSEEK_BASE_URL = os.getenv("DEEPSEEK_BASE_URL", "https://api.deepseek.com/v1")
+DEEPSEEK_MODEL = os.getenv("DEEPSEEK_MODEL", "deepseek-chat")
+LLM_POOL_SIZE = int(os.getenv("LLM_POOL_SIZE", "16"))  # 所有模型实例共享的最大连接数
+LLM_CONNECT_TIMEOUT = float(os.getenv("LLM_CONNECT_TIMEOUT", "5"))
+LLM_READ_TIMEOUT = float(os.getenv("LLM_READ_TIMEOUT", "60"))
+
+_lock = threading.Lock()
+_http_client: Optional[httpx.Client] = None
+_async_http_client: Optional[httpx.AsyncClient] = None
+_registry: Dict[Tuple, ChatOpenAI] = {}
+
+
+def get_http_client() -> httpx.Client:
+    """共享的同步httpx客户端，长连接在各次调用之间复用"""
+    global _http_client
+    if _http_client is None:
+        with _lock:
+            if _http_client is None:
+                _http_client = httpx.Client(
+                    timeout=httpx.Timeout(LLM_READ_TIMEOUT, connect=LLM_CONNECT_TIMEOUT),
+                    limits=httpx.Limits(max_connections=LLM_POOL_SIZE, max_keepalive_connections=LLM_POOL_SIZE)
+                )
+    return _http_client
+
+
+def get_async_http_client() -> httpx.AsyncClient:
+    """共享的异步httpx客户端，ainvoke/astream等异步调用走这个连接池"""
+    global _async_http_client
+    if _async_http_client is None:
+        with _lock:
+            if _async_http_client is None:
+                _async_http_client = httpx.AsyncClient(
+                    timeout=httpx.Timeout(LLM_READ_TIMEOUT, connect=LLM_CONNECT_TIMEOUT),
+                    limits=httpx.Limits(max_connections=LLM_POOL_SIZE, max_keepalive_connections=LLM_POOL_SIZE)
+                )
+    return _async_http_client
+
+
+def get_llm(model: str = DEEPSEEK_MODEL, temperature: Optional[float] = None, api_key: Optional[str] = None,
+            base_url: str = DEEPSEEK_BASE_URL, **kwargs: Any) -> ChatOpenAI:
+    """按(模型, 温度, 地址, 其他参数)返回缓存的ChatOpenAI实例，第一次调用时才创建；temperature为None时用模型默认值"""
+    api_key = api_key or os.getenv("DEEPSEEK_API_KEY")
+    if not api_key or api_key.strip() == "":
+        raise ValueError("请设置有效的DEEPSEEK_API_KEY环境变量")
+
+    key = (model, temperature, base_url, api_key, tuple(sorted(kwargs.items())))
+    llm = _registry.get(key)
+    if llm is None:
+        http_client = get_http_client()
+        http_async_client = get_async_http_client()
+        if temperature is not None:
+            kwargs["temperature"] = temperature
+        with _lock:
+            llm = _registry.get(key)
+            if llm is None:
+                llm = ChatOpenAI(
+                    model=model,
+                    openai_api_key=api_key,
+                    openai_api_base=base_url,
+                    http_client=http_client,
+                    http_async_client=http_async_client,
+                    **kwargs
+                )
+                _registry[key] = llm
+                logger.info(f"✅ 已创建LLM实例: {model} (temperature={temperature})")
+    return llm
+
+
+def clear_registry() -> None:
+    """清空缓存的实例和共享连接池，之后get_llm会创建新的实例和连接池
+
+    旧连接池不主动关闭：已经拿到的实例仍引用它们，可以继续使用，随这些实例一起被回收"""
+    global _http_client, _async_http_client
+    with _lock:
+        _registry.clear()
+        _http_client = None
+        _async_http_client = None
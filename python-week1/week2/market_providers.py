@@ -0,0 +1,137 @@
+# market_providers.py
+"""行情数据源：AKShare实时行情、录制的快照文件、可复现的合成全市场行情；实例可直接作为MarketSnapshot的fetch_fn"""
+import os
+import time
+import threading
+from typing import Optional
+import numpy as np
+import pandas as pd
+
+MARKET_PROVIDER = os.getenv("MARKET_PROVIDER", "akshare")  # akshare / recorded / synthetic
+MARKET_RECORDING_PATH = os.getenv("MARKET_RECORDING_PATH", "a_share_spot.pkl")  # recorded数据源读取的快照文件（.pkl或.csv）
+SYNTHETIC_SYMBOLS = int(os.getenv("SYNTHETIC_SYMBOLS", "5000"))  # 合成行情的股票数量
+SYNTHETIC_LATENCY_MS = float(os.getenv("SYNTHETIC_LATENCY_MS", "0"))  # 合成行情每次整表拉取的模拟延迟
+SYNTHETIC_SEED = int(os.getenv("SYNTHETIC_SEED", "42"))
+
+SPOT_COLUMNS = ["代码", "名称", "最新价", "涨跌额", "涨跌幅", "昨收", "今开", "最高", "最低", "成交量", "成交额"]
+
+
+class MarketDataProvider:
+    """数据源接口：fetch_spot()返回与ak.stock_zh_a_spot()同字段的全市场DataFrame"""
+
+    source = "未知数据源"  # 写入行情结果的source字段
+
+    def fetch_spot(self) -> pd.DataFrame:
+        raise NotImplementedError
+
+    def __call__(self) -> pd.DataFrame:
+        return self.fetch_spot()
+
+
+class AKShareProvider(MarketDataProvider):
+    """AKShare沪深A股实时行情（整表，需联网）"""
+
+    source = "AKShare(实时数据)"
+
+    def fetch_spot(self) -> pd.DataFrame:
+        import akshare as ak
+        return ak.stock_zh_a_spot()
+
+
+class RecordedSnapshotProvider(MarketDataProvider):
+    """回放录制的快照文件，每次返回同一张表，适合离线复现问题"""
+
+    source = "录制快照"
+
+    def __init__(self, path: str = MARKET_RECORDING_PATH):
+        self.path = path
+        self._frame: Optional[pd.DataFrame] = None
+
+    def fetch_spot(self) -> pd.DataFrame:
+        if self._frame is None:
+            if self.path.endswith(".csv"):
+                self._frame = pd.read_csv(self.path, dtype={"代码": str})
+            else:
+                self._frame = pd.read_pickle(self.path)
+        return self._frame.copy()
+
+
+class SyntheticMarketProvider(MarketDataProvider):
+    """合成全市场行情：同一seed下第k次拉取的结果完全相同，价格做几何随机游走，成交量逐次累加"""
+
+    source = "合成行情"
+
+    def __init__(self, n_symbols: int = SYNTHETIC_SYMBOLS, latency_ms: float = SYNTHETIC_LATENCY_MS,
+                 seed: int = SYNTHETIC_SEED, volatility: float = 0.002):
+        self.latency_ms = latency_ms
+        self.volatility = volatility
+        self.fetch_count = 0
+        self._rng = np.random.default_rng(seed)
+        self._lock = threading.Lock()
+
+        # 一半沪市主板，其余平分深市主板和创业板
+        n_sh = n_symbols // 2
+        n_sz = (n_symbols - n_sh) // 2
+        n_cy = n_symbols - n_sh - n_sz
+        self.codes = np.concatenate([
+            np.char.add("sh", np.char.zfill(np.arange(600000, 600000 + n_sh).astype(str), 6)),
+            np.char.add("sz", np.char.zfill(np.arange(1, 1 + n_sz).astype(str), 6)),
+            np.char.add("sz", np.char.zfill(np.arange(300001, 300001 + n_cy).astype(str), 6)),
+        ])
+        self.names = np.char.add("合成", np.char.lstrip(self.codes, "shz"))
+        self.prev_close = np.round(self._rng.lognormal(np.log(20), 0.8, n_symbols), 2)
+        self.open = np.round(self.prev_close * (1 + self._rng.normal(0, 0.01, n_symbols)), 2)
+        self.price = self.open.copy()
+        self.high = self.open.copy()
+        self.low = self.open.copy()
+        self.volume = np.zeros(n_symbols)
+        self.amount = np.zeros(n_symbols)
+
+    def fetch_spot(self) -> pd.DataFrame:
+        if self.latency_ms > 0:
+            time.sleep(self.latency_ms / 1000)
+        with self._lock:
+            n = len(self.codes)
+            self.price = np.round(self.price * np.exp(self._rng.normal(0, self.volatility, n)), 2)
+            self.high = np.maximum(self.high, self.price)
+            self.low = np.minimum(self.low, self.price)
+            traded = self._rng.integers(100, 100000, n) * 100
+            self.volume += traded
+            self.amount += traded * self.price
+            self.fetch_count += 1
+            change = np.round(self.price - self.prev_close, 2)
+            return pd.DataFrame({
+                "代码": self.codes,
+                "名称": self.names,
+                "最新价": self.price,
+                "涨跌额": change,
+                "涨跌幅": np.round(change / self.prev_close * 100, 2),
+                "昨收": self.prev_close,
+                "今开": self.open,
+                "最高": self.high,
+                "最低": self.low,
+                "成交量": self.volume.copy(),
+                "成交额": np.round(self.amount, 2),
+            }, columns=SPOT_COLUMNS)
+
+
+def record_snapshot(path: str = MARKET_RECORDING_PATH, provider: Optional[MarketDataProvider] = None) -> int:
+    """从数据源（默认AKShare）拉一次整表并保存，供RecordedSnapshotProvider回放，返回股票数"""
+    frame = (provider or AKShareProvider()).fetch_spot()
+    if path.endswith(".csv"):
+        frame.to_csv(path, index=False)
+    else:
+        frame.to_pickle(path)
+    return len(frame)
+
+
+def get_provider(name: str = MARKET_PROVIDER) -> MarketDataProvider:
+    """按名称创建数据源（默认取MARKET_PROVIDER环境变量）"""
+    providers = {
+        "akshare": AKShareProvider,
+        "recorded": RecordedSnapshotProvider,
+        "synthetic": SyntheticMarketProvider,
+    }
+    if name not in providers:
+        raise ValueError(f"未知行情数据源: {name}，可选: {', '.join(providers)}")
+    return providers[name]()
@@ -0,0 +1,153 @@
+# market_snapshot.py
+"""全市场行情快照缓存：每个刷新周期整表拉取一次，按"代码"建哈希索引，单只股票查询直接读内存"""
+import os
+import time
+import logging
+import threading
+from typing import Any, Callable, Dict, List, Optional
+from market_providers import get_provider
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_REFRESH_SECONDS = float(os.getenv("SNAPSHOT_REFRESH_SECONDS", "30"))  # 正常刷新间隔
+SNAPSHOT_MAX_STALENESS = float(os.getenv("SNAPSHOT_MAX_STALENESS", "120"))  # 超过该时长的数据不再使用
+SNAPSHOT_BACKGROUND_REFRESH = os.getenv("SNAPSHOT_BACKGROUND_REFRESH", "0") == "1"  # 是否启动后台刷新线程
+QUOTE_STORE_ENABLED = os.getenv("QUOTE_STORE_ENABLED", "0") == "1"  # 每次刷新后把快照追加到本地行情库quote_store
+
+
+class StaleSnapshotError(RuntimeError):
+    """快照超过陈旧上限且刷新失败"""
+
+
+class MarketSnapshot:
+    """线程安全的行情快照
+
+    - 数据年龄 <= refresh_interval：直接读内存
+    - refresh_interval < 年龄 <= max_staleness：先返回旧数据，同时在后台线程刷新
+    - 年龄 > max_staleness 或尚无数据：同步刷新，失败则抛出StaleSnapshotError
+    """
+
+    def __init__(self, fetch_fn: Optional[Callable[[], Any]] = None,
+                 refresh_interval: float = SNAPSHOT_REFRESH_SECONDS, max_staleness: float = SNAPSHOT_MAX_STALENESS):
+        self.fetch_fn = fetch_fn or get_provider()  # 默认按MARKET_PROVIDER选择数据源
+        self.source = getattr(self.fetch_fn, "source", "AKShare(实时数据)")
+        self.refresh_interval = refresh_interval
+        self.max_staleness = max(max_staleness, refresh_interval)
+        self.frame = None  # 以"代码"为索引的DataFrame
+        self.records: Dict[str, Dict[str, Any]] = {}  # 代码 -> 行数据
+        self.fetched_at: Optional[float] = None
+        self.refresh_count = 0
+        self.listeners: List[Callable[[Any, float], Any]] = []  # 每次刷新成功后以(frame, 墙钟时间戳)调用
+        self._refresh_lock = threading.Lock()
+        self._refreshing = False
+        self._stop_event = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def age(self) -> float:
+        return float("inf") if self.fetched_at is None else time.monotonic() - self.fetched_at
+
+    def refresh(self) -> None:
+        with self._refresh_lock:
+            self._refresh_locked()
+
+    def _refresh_locked(self) -> None:
+        """拉取整表并重建索引；新索引建好后一次性替换，读者不会看到半成品"""
+        start = time.perf_counter()
+        stock_df = self.fetch_fn()
+        if "代码" not in stock_df.columns:
+            raise ValueError("数据源字段不匹配（旧版本AKShare特征）")
+        frame = stock_df.drop_duplicates("代码").set_index("代码", drop=False)
+        records = frame.to_dict("index")
+        self.frame, self.records, self.fetched_at = frame, records, time.monotonic()
+        self.refresh_count += 1
+        logger.info(f"✅ 行情快照已刷新: {len(records)}只股票，耗时{(time.perf_counter() - start) * 1000:.0f}ms")
+        fetched_ts = time.time()
+        for listener in self.listeners:
+            try:
+                listener(frame, fetched_ts)
+            except Exception as e:
+                logger.warning(f"⚠️ 快照刷新回调失败: {str(e)[:100]}")
+
+    def add_listener(self, listener: Callable[[Any, float], Any]) -> None:
+        """注册刷新回调（如行情库的增量追加），回调在持有刷新锁的线程里执行"""
+        self.listeners.append(listener)
+
+    def _refresh_in_background(self) -> None:
+        if self._refreshing:
+            return
+        self._refreshing = True
+
+        def run():
+            try:
+                self.refresh()
+            except Exception as e:
+                logger.warning(f"⚠️ 后台刷新行情快照失败: {str(e)[:100]}")
+            finally:
+                self._refreshing = False
+
+        threading.Thread(target=run, daemon=True, name="snapshot-refresh").start()
+
+    def ensure_fresh(self) -> None:
+        age = self.age()
+        if age > self.max_staleness:
+            with self._refresh_lock:
+                if self.age() <= self.max_staleness:
+                    return  # 等锁期间其他线程已经刷新
+                try:
+                    self._refresh_locked()
+                except Exception as e:
+                    raise StaleSnapshotError(f"行情快照已过期且刷新失败: {str(e)[:100]}") from e
+        elif age > self.refresh_interval and self._thread is None:
+            self._refresh_in_background()
+
+    def lookup(self, code: str) -> Optional[Dict[str, Any]]:
+        """按带前缀的代码（如sh600519）查询一行，O(1)"""
+        self.ensure_fresh()
+        return self.records.get(code)
+
+    def get_frame(self):
+        """返回以"代码"为索引的整表，供批量查询使用"""
+        self.ensure_fresh()
+        return self.frame
+
+    def start_background_refresh(self) -> None:
+        """启动后台线程按refresh_interval定期刷新，读者基本不会被同步刷新阻塞"""
+        if self._thread is not None:
+            return
+        self._stop_event.clear()
+
+        def loop():
+            while not self._stop_event.is_set():
+                try:
+                    self.refresh()
+                except Exception as e:
+                    logger.warning(f"⚠️ 后台刷新行情快照失败: {str(e)[:100]}")
+                self._stop_event.wait(self.refresh_interval)
+
+        self._thread = threading.Thread(target=loop, daemon=True, name="snapshot-refresher")
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join(timeout=1)
+            self._thread = None
+
+
+_default_snapshot = None
+_default_snapshot_lock = threading.Lock()
+
+
+def get_market_snapshot() -> MarketSnapshot:
+    """进程内共享的A股快照（SNAPSHOT_BACKGROUND_REFRESH=1时自动启动后台刷新，QUOTE_STORE_ENABLED=1时记录历史）"""
+    global _default_snapshot
+    if _default_snapshot is None:
+        with _default_snapshot_lock:
+            if _default_snapshot is None:
+                _default_snapshot = MarketSnapshot()
+                if QUOTE_STORE_ENABLED:
+                    from quote_store import get_quote_store
+                    _default_snapshot.add_listener(get_quote_store().append_snapshot)
+                if SNAPSHOT_BACKGROUND_REFRESH:
+                    _default_snapshot.start_background_refresh()
+    return _default_snapshot
@@ -0,0 +1,212 @@
+# model_pool.py
+"""本地模型池：第一次用到某个模型时才加载，按估算显存/内存占用做LRU淘汰（加载前先预留占用，调用中的模型不淘汰），
+加载失败的模型在一段时间内不再重试；占用上限默认按显存/内存自动确定"""
+import os
+import gc
+import re
+import sys
+import time
+import logging
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, NamedTuple, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+MODEL_POOL_MAX_MEMORY_GB = float(os.getenv("MODEL_POOL_MAX_MEMORY_GB", "0"))  # 同时驻留的模型估算占用上限，0表示按显存/内存自动确定
+MODEL_POOL_MEMORY_FRACTION = 0.8  # 自动确定上限时可用于模型的显存/内存比例
+MODEL_POOL_RETRY_SECONDS = float(os.getenv("MODEL_POOL_RETRY_SECONDS", "300"))  # 加载失败（下载/网络等）后多久允许重试
+
+
+class ModelSpec(NamedTuple):
+    model_id: str
+    revision: Optional[str] = None
+    task: str = "text-generation"
+    memory_gb: float = 0.0  # 估算占用（半精度权重），用于淘汰决策；必须大于0
+
+
+def estimate_memory_gb(model_id: str) -> float:
+    """按模型名里的参数量（如6b、13B、1.8b）估算半精度占用：每十亿参数约2GB，另加10%运行开销"""
+    match = re.search(r"(?<![\d.])(\d+(?:[._]\d+)?)\s*[bB](?![a-zA-Z])", model_id)  # Qwen-1_8B即1.8B
+    if not match:
+        raise ValueError(f"无法从模型名{model_id}估算占用，请在ModelSpec中指定memory_gb")
+    return round(float(match.group(1).replace("_", ".")) * 2 * 1.1, 1)
+
+
+def detect_memory_gb() -> float:
+    """可用于加载模型的总容量：已导入torch且有GPU时取显存，否则取物理内存；都拿不到时返回0"""
+    torch = sys.modules.get("torch")  # 不为探测显存专门导入torch
+    if torch is not None and torch.cuda.is_available():
+        return torch.cuda.get_device_properties(0).total_memory / 1024 ** 3
+    try:
+        import psutil
+        return psutil.virtual_memory().total / 1024 ** 3
+    except ImportError:
+        pass
+    try:
+        return os.sysconf("SC_PAGE_SIZE") * os.sysconf("SC_PHYS_PAGES") / 1024 ** 3
+    except (AttributeError, ValueError, OSError):
+        return 0.0
+
+
+def default_max_memory_gb() -> float:
+    """MODEL_POOL_MAX_MEMORY_GB未设置时按显存/内存的MODEL_POOL_MEMORY_FRACTION确定上限，探测不到时为32GB"""
+    if MODEL_POOL_MAX_MEMORY_GB > 0:
+        return MODEL_POOL_MAX_MEMORY_GB
+    total = detect_memory_gb()
+    return round(total * MODEL_POOL_MEMORY_FRACTION, 1) if total > 0 else 32.0
+
+
+def load_modelscope_pipeline(spec: ModelSpec) -> Any:
+    """默认加载器：导入modelscope很慢，放到第一次加载模型时"""
+    from modelscope.pipelines import pipeline
+    return pipeline(task=spec.task, model=spec.model_id, model_revision=spec.revision)
+
+
+class ModelLoadError(RuntimeError):
+    """模型加载失败（缺依赖、下载失败或超出内存预算）"""
+
+
+class ModelPool:
+    """LRU模型池：use()借用模型，未加载时按需加载，超出预算先卸载最久未用且没有被调用的模型"""
+
+    def __init__(self, max_memory_gb: Optional[float] = None,
+                 loader: Callable[[ModelSpec], Any] = load_modelscope_pipeline,
+                 retry_seconds: float = MODEL_POOL_RETRY_SECONDS):
+        self.max_memory_gb = default_max_memory_gb() if max_memory_gb is None else max_memory_gb
+        self.loader = loader
+        self.retry_seconds = retry_seconds
+        self.models: "OrderedDict[ModelSpec, Any]" = OrderedDict()
+        self.loading: set = set()  # 正在加载的模型，其占用已预留
+        self.in_use: Dict[ModelSpec, int] = {}  # 正在被调用的模型及调用数，调用期间不会被卸载
+        self.failed: Dict[ModelSpec, Tuple[str, float]] = {}  # 加载失败的模型 -> (原因, 可重试的时间点)
+        self.load_seconds: Dict[ModelSpec, float] = {}
+        self._lock = threading.Condition()
+
+    def used_memory_gb(self) -> float:
+        """已加载 + 正在加载（已预留）的估算占用"""
+        return sum(spec.memory_gb for spec in self.models) + sum(spec.memory_gb for spec in self.loading)
+
+    @contextmanager
+    def use(self, spec: ModelSpec) -> Iterator[Any]:
+        """借用模型：with块内模型不会被卸载，块结束后才可能释放内存"""
+        model = self._acquire(spec)
+        try:
+            yield model
+        finally:
+            with self._lock:
+                self.in_use[spec] -= 1
+                if not self.in_use[spec]:
+                    del self.in_use[spec]
+                self._lock.notify_all()
+
+    def get(self, spec: ModelSpec) -> Any:
+        """确保模型已加载（预热用）；调用模型请用use()，否则调用期间模型可能被卸载"""
+        with self.use(spec) as model:
+            return model
+
+    def fits(self, spec: ModelSpec) -> bool:
+        """模型的估算占用是否在上限以内（上限可在运行时调整）"""
+        return 0 < spec.memory_gb <= self.max_memory_gb
+
+    def _check_failed(self, spec: ModelSpec) -> None:
+        """调用方持有_lock"""
+        if spec in self.failed:
+            reason, retry_at = self.failed[spec]
+            if time.monotonic() < retry_at:
+                raise ModelLoadError(reason)
+            del self.failed[spec]
+
+    def _acquire(self, spec: ModelSpec) -> Any:
+        if spec.memory_gb <= 0:
+            raise ModelLoadError(f"{spec.model_id}未指定memory_gb，无法纳入模型池内存预算")
+        with self._lock:
+            while True:
+                if spec in self.models:
+                    self.models.move_to_end(spec)
+                    self.in_use[spec] = self.in_use.get(spec, 0) + 1
+                    return self.models[spec]
+                self._check_failed(spec)
+                if spec.memory_gb > self.max_memory_gb:
+                    # 配置问题不记入failed，调大max_memory_gb后立即生效
+                    raise ModelLoadError(f"{spec.model_id}估算占用{spec.memory_gb:g}GB，超过模型池上限{self.max_memory_gb:g}GB")
+                if spec in self.loading:
+                    # 同一个模型只加载一次，其他线程等它加载完
+                    self._lock.wait()
+                    continue
+                self._evict_for(spec.memory_gb)
+                if self.used_memory_gb() + spec.memory_gb <= self.max_memory_gb:
+                    self.loading.add(spec)  # 先预留占用，再在锁外加载
+                    break
+                # 剩余占用都属于正在调用或正在加载的模型，等它们释放
+                self._lock.wait()
+
+        logger.info(f"⏳ 正在加载模型 {spec.model_id} ...")
+        start = time.perf_counter()
+        try:
+            model = self.loader(spec)
+        except Exception as e:
+            reason = f"{spec.model_id}加载失败: {str(e)[:200]}"
+            with self._lock:
+                self.failed[spec] = (reason, time.monotonic() + self.retry_seconds)
+                self.loading.discard(spec)  # 释放预留
+                self._lock.notify_all()
+            raise ModelLoadError(reason) from e
+
+        with self._lock:
+            self.loading.discard(spec)
+            self.models[spec] = model
+            self.in_use[spec] = self.in_use.get(spec, 0) + 1
+            self.load_seconds[spec] = time.perf_counter() - start
+            self._lock.notify_all()
+        logger.info(f"✅ 模型 {spec.model_id} 加载完成，耗时{self.load_seconds[spec]:.1f}秒")
+        return model
+
+    def _evict_for(self, memory_gb: float) -> None:
+        """卸载最久未用且没有被调用的模型，直到能放下新模型（调用方持有_lock）"""
+        evicted = False
+        for spec in list(self.models):
+            if self.used_memory_gb() + memory_gb <= self.max_memory_gb:
+                break
+            if spec in self.in_use:
+                continue
+            del self.models[spec]
+            logger.info(f"♻️ 卸载模型 {spec.model_id}（释放约{spec.memory_gb:g}GB）")
+            evicted = True
+        if evicted:
+            gc.collect()
+            torch = sys.modules.get("torch")  # 只在已经加载过torch时清理显存缓存
+            if torch is not None and torch.cuda.is_available():
+                torch.cuda.empty_cache()
+
+    def unload_all(self) -> None:
+        """卸载所有没有被调用的模型"""
+        with self._lock:
+            for spec in [spec for spec in self.models if spec not in self.in_use]:
+                del self.models[spec]
+        gc.collect()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "loaded": [spec.model_id for spec in self.models],
+                "used_memory_gb": self.used_memory_gb(),
+                "loading": [spec.model_id for spec in self.loading],
+                "in_use": {spec.model_id: count for spec, count in self.in_use.items()},
+                "failed": {spec.model_id: reason for spec, (reason, _) in self.failed.items()},
+            }
+
+
+_default_pool = None
+_default_pool_lock = threading.Lock()
+
+
+def get_model_pool() -> ModelPool:
+    """进程内共享的模型池"""
+    global _default_pool
+    if _default_pool is None:
+        with _default_pool_lock:
+            if _default_pool is None:
+                _default_pool = ModelPool()
+    return _default_pool
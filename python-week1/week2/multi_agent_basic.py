@@ -3,27 +3,19 @@ from dotenv import load_dotenv
 from langchain.tools import Tool
 from langchain.agents import AgentExecutor, create_structured_chat_agent
 from langchain.agents.structured_chat.output_parser import StructuredChatOutputParser
-from langchain.memory import ConversationBufferMemory
 from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
-from langchain_openai import ChatOpenAI
+from llm_registry import get_llm as get_shared_llm
+import common_path  # noqa: F401  各周共用的模块（python-week1/common）
+from agent_callbacks import invoke_with_budget, AGENT_DEADLINE_SECONDS, AGENT_VERBOSE
+from conversation_memory import BoundedConversationMemory, ConversationMemory, llm_summarizer
 
 # 加载环境变量
 load_dotenv()
 
 # 配置DeepSeek模型
 def get_llm():
-    """获取配置好的LLM实例"""
-    api_key = os.getenv("DEEPSEEK_API_KEY")
-    
-    if not api_key or api_key.strip() == "":
-        raise ValueError("请设置有效的DEEPSEEK_API_KEY环境变量")
-        
-    return ChatOpenAI(
-        model="deepseek-chat",
-        openai_api_key=api_key,
-        openai_api_base="https://api.deepseek.com/v1",
-        temperature=0.3
-    )
+    """获取配置好的LLM实例（进程内共享）"""
+    return get_shared_llm(temperature=0.3)
 
 # 创建专业Agent函数
 def financial_analysis(query: str) -> str:
@@ -103,8 +95,9 @@ prompt = ChatPromptTemplate.from_messages([
     MessagesPlaceholder(variable_name="agent_scratchpad"),
 ])
 
-# 创建记忆
-memory = ConversationBufferMemory(
+# 创建记忆（只回放摘要 + 最近对话，旧对话在后台由LLM增量摘要，每轮提示词长度不随会话增长）
+memory = BoundedConversationMemory(
+    memory=ConversationMemory(summarizer=llm_summarizer(llm)),
     memory_key="chat_history", 
     return_messages=True,
     output_key="output"
@@ -123,19 +116,20 @@ agent_executor = AgentExecutor(
     agent=agent,
     tools=tools,
     memory=memory,
-    verbose=True,
+    verbose=AGENT_VERBOSE,  # 逐步耗时和Token由agent_callbacks记录
     return_intermediate_steps=False,
-    handle_parsing_errors=True
+    handle_parsing_errors=True,
+    max_execution_time=AGENT_DEADLINE_SECONDS
 )
 
 # 多Agent协作示例
 def multi_agent_chat(question):
     """多Agent协作对话"""
     print(f"用户问题: {question}")
-    response = agent_executor.invoke({
+    response = invoke_with_budget(agent_executor, {
         "input": question,
         "agent_scratchpad": []
-    })
+    }, agent_name="multi_agent_basic")
     print(f"AI回答: {response['output']}")
     return response['output']
 
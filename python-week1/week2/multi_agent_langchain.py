@@ -1,20 +1,18 @@
-from langchain_openai import ChatOpenAI
 import os
 from dotenv import load_dotenv
 from langchain.agents import Tool, AgentExecutor, initialize_agent
 from langchain.agents.agent_types import AgentType
 from langchain_deepseek import ChatDeepSeek  # 正确导入方式
-from langchain.memory import ConversationBufferMemory
+from llm_registry import get_llm
+import common_path  # noqa: F401  各周共用的模块（python-week1/common）
+from agent_callbacks import invoke_with_budget, AGENT_DEADLINE_SECONDS, AGENT_VERBOSE
+from conversation_memory import BoundedConversationMemory, ConversationMemory, llm_summarizer
 
 # 加载环境变量
 load_dotenv()
 
-# 配置DeepSeek API
-llm = ChatOpenAI(
-    model="deepseek-chat",
-    openai_api_key=os.getenv("DEEPSEEK_API_KEY"),
-    openai_api_base="https://api.deepseek.com/v1"  # DeepSeek API端点
-)
+# 配置DeepSeek API（进程内共享实例和连接池）
+llm = get_llm()
 
 # 金融分析师Agent函数
 def financial_analysis(query: str) -> str:
@@ -40,18 +38,21 @@ tools = [
     )
 ]
 
-# 创建记忆和Agent执行器
-memory = ConversationBufferMemory(memory_key="chat_history", return_messages=True)
+# 创建记忆（摘要 + Token预算窗口）和Agent执行器
+memory = BoundedConversationMemory(memory=ConversationMemory(summarizer=llm_summarizer(llm)),
+                                   memory_key="chat_history", return_messages=True)
 
 agent = initialize_agent(
     tools=tools,
     llm=llm,
     agent=AgentType.CHAT_CONVERSATIONAL_REACT_DESCRIPTION,
     memory=memory,
-    verbose=True
+    verbose=AGENT_VERBOSE,  # 逐步耗时和Token由agent_callbacks记录
+    max_execution_time=AGENT_DEADLINE_SECONDS
 )
 
 # 使用示例
 if __name__ == "__main__":
-    response = agent.run("分析苹果公司(AAPL)的当前投资价值")
+    response = invoke_with_budget(agent, {"input": "分析苹果公司(AAPL)的当前投资价值"},
+                                  agent_name="multi_agent_langchain")["output"]
     print(response)
\ No newline at end of file
@@ -1,10 +1,8 @@
-from modelscope import snapshot_download
-from modelscope.pipelines import pipeline
-from modelscope.utils.constant import Tasks
 import os
 import logging
 from dotenv import load_dotenv
-from langchain_openai import ChatOpenAI
+from llm_registry import get_llm
+from model_pool import ModelLoadError, ModelSpec, estimate_memory_gb, get_model_pool
 
 # 配置日志
 logging.basicConfig(level=logging.INFO)
@@ -13,124 +11,137 @@ logger = logging.getLogger(__name__)
 # 加载环境变量
 load_dotenv()
 
+# 已知模型及估算占用（半精度权重）；模型池按这个估算决定卸载哪个模型
+MODEL_SPECS = {
+    'ZhipuAI/chatglm2-6b': ModelSpec('ZhipuAI/chatglm2-6b', 'v1.0.2', 'text-generation', 13.0),
+    'baichuan-inc/Baichuan-13B-Chat': ModelSpec('baichuan-inc/Baichuan-13B-Chat', 'v1.0.0', 'text-generation', 27.0),
+}
+
+MODELSCOPE_ENABLED = os.getenv("MODELSCOPE_ENABLED", "1") == "1"  # 设为0时不加载本地模型，直接用DeepSeek/规则
+SHARED_MODEL_ID = os.getenv("SHARED_MODEL_ID", "")  # 设置后所有Agent共用这一个模型，角色由提示词区分
+SHARED_MODEL_MEMORY_GB = float(os.getenv("SHARED_MODEL_MEMORY_GB", "0"))  # 共享模型不在MODEL_SPECS中时的估算占用，0表示按模型名估算
+
+# 每个Agent的角色提示词和默认模型
+AGENT_PERSONAS = {
+    'financial': {
+        'name': '金融分析',
+        'model': 'ZhipuAI/chatglm2-6b',
+        'system': '你是一名资深金融分析师，回答聚焦财务数据、估值和风险。',
+    },
+    'research': {
+        'name': '市场研究',
+        'model': 'baichuan-inc/Baichuan-13B-Chat',
+        'system': '你是一名行业研究员，回答聚焦市场格局、竞争对手和行业趋势。',
+    },
+}
+
 # 配置DeepSeek API
 try:
-    llm = ChatOpenAI(
-        model="deepseek-chat",
-        openai_api_key=os.getenv("DEEPSEEK_API_KEY"),
-        openai_api_base="https://api.deepseek.com/v1"  # DeepSeek API端点
-    )
+    llm = get_llm()  # 进程内共享实例和连接池
     logger.info("DeepSeek LLM初始化成功")
 except Exception as e:
     logger.warning(f"DeepSeek LLM初始化失败: {e}")
     llm = None
 
 class MultiModelAgentSystem:
-    """基于ModelScope的多模型Agent系统"""
-    
-    def __init__(self):
-        # 可以加载多个不同的模型作为不同的Agent
-        self.models = {}
-        self.use_fallback = False
-        self.setup_models()
-    
-    def setup_models(self):
-        """设置多个模型作为不同的Agent"""
-        try:
-            # 尝试安装缺失的依赖
-            self._install_dependencies()
-            
-            # 替换为更稳定的模型，避免使用需要megatron_util的模型
-            # 金融分析模型 - 使用bert-base-chinese作为替代
-            self.models['financial'] = pipeline(
-                task=Tasks.text_generation,
-                model='ZhipuAI/chatglm2-6b',  # 更稳定的中文模型
-                model_revision='v1.0.2'
-            )
-            logger.info("金融分析Agent初始化完成")
-            
-            # 市场研究模型 - 使用另一个可靠模型
-            self.models['research'] = pipeline(
-                task=Tasks.text_generation, 
-                model='baichuan-inc/Baichuan-13B-Chat',  # 百川模型
-                model_revision='v1.0.0'
-            )
-            logger.info("数据研究Agent初始化完成")
-            
-        except Exception as e:
-            logger.error(f"模型初始化失败: {str(e)}")
-            self.setup_fallback_agents()
-    
-    def _install_dependencies(self):
-        """安装可能缺失的依赖"""
-        try:
-            import megatron_util
-        except ImportError:
-            logger.info("检测到缺少megatron_util，尝试安装...")
-            try:
-                import subprocess
-                import sys
-                # 尝试安装可能包含megatron_util的包
-                subprocess.check_call([sys.executable, "-m", "pip", "install", "megatron-llm"])
-                logger.info("megatron-llm安装成功")
-            except Exception as e:
-                logger.warning(f"自动安装megatron-llm失败: {e}，将尝试使用替代模型")
-    
-    def setup_fallback_agents(self):
-        """备用Agent设置（基于规则或DeepSeek）"""
-        self.use_fallback = True
+    """基于ModelScope的多模型Agent系统：模型在Agent第一次被调用时才加载，由共享模型池按内存预算LRU管理"""
+
+    def __init__(self, pool=None, shared_model_id=SHARED_MODEL_ID, use_local_models=MODELSCOPE_ENABLED):
+        # 构造时不加载任何模型，也不安装依赖
+        self.pool = pool or get_model_pool()
+        self.use_local_models = use_local_models
+        self.shared_model_id = shared_model_id
+        if use_local_models:
+            self._check_budget()
         if llm:
-            logger.info("使用DeepSeek作为备用Agent系统")
+            logger.info("本地模型不可用时使用DeepSeek作为备用")
         else:
-            logger.info("使用基于规则的备用Agent系统")
-        
-    def financial_analysis(self, symbol):
-        """金融分析Agent"""
-        prompt = f"详细分析{symbol}公司的投资价值、潜在风险、近期财务表现和未来发展前景。"
-        
-        # 优先使用modelscope模型
-        if 'financial' in self.models and not self.use_fallback:
+            logger.info("本地模型不可用时使用基于规则的回复")
+
+    def model_spec(self, agent):
+        """Agent对应的模型；设置了共享模型时所有Agent返回同一个"""
+        model_id = self.shared_model_id or AGENT_PERSONAS[agent]['model']
+        if model_id in MODEL_SPECS:
+            return MODEL_SPECS[model_id]
+        # 未登记的模型也必须带占用估算，否则会绕过模型池的内存预算
+        memory_gb = SHARED_MODEL_MEMORY_GB
+        if memory_gb <= 0:
             try:
-                result = self.models['financial'](prompt, max_length=500)
-                return result.get('text', '分析结果生成中...').strip()
+                memory_gb = estimate_memory_gb(model_id)
+            except ValueError as e:
+                raise ModelLoadError(f"{e}（或设置SHARED_MODEL_MEMORY_GB）") from e
+        return ModelSpec(model_id, memory_gb=memory_gb)
+
+    def _check_budget(self):
+        """构造时检查一次各Agent的模型能否放进模型池，放不下的只在这里报告，调用时直接走备用方案"""
+        for agent, persona in AGENT_PERSONAS.items():
+            try:
+                spec = self.model_spec(agent)
+            except ModelLoadError as e:
+                logger.error(f"{persona['name']}Agent不会使用本地模型: {e}")
+                continue
+            if not self.pool.fits(spec):
+                logger.error(f"{persona['name']}Agent不会使用本地模型: {spec.model_id}估算占用{spec.memory_gb:g}GB，"
+                             f"超过模型池上限{self.pool.max_memory_gb:g}GB（调大MODEL_POOL_MAX_MEMORY_GB或设置SHARED_MODEL_ID）")
+
+    def preload(self, agents=None):
+        """可选的预热：提前加载指定Agent的模型（默认全部），返回加载失败的Agent"""
+        failed = []
+        for agent in agents or AGENT_PERSONAS:
+            try:
+                self.pool.get(self.model_spec(agent))
+            except ModelLoadError as e:
+                logger.warning(str(e))
+                failed.append(agent)
+        return failed
+
+    def _generate(self, agent, prompt):
+        """依次尝试本地模型 -> DeepSeek，都不可用时返回None，由调用方给出规则回复"""
+        persona = AGENT_PERSONAS[agent]
+        spec = None
+        if self.use_local_models:
+            try:
+                spec = self.model_spec(agent)
+            except ModelLoadError:
+                pass  # 已在构造时报告
+        if spec is not None and self.pool.fits(spec):
+            try:
+                # 调用期间借用模型，防止被其他Agent的加载卸载掉
+                with self.pool.use(spec) as model:
+                    result = model(f"{persona['system']}\n{prompt}", max_length=500)
+                return result.get('text', f"{persona['name']}结果生成中...").strip()
+            except ModelLoadError as e:
+                # 加载失败会被模型池记住，重试间隔内不再重复加载
+                logger.warning(f"{persona['name']}模型不可用，改用备用方案: {e}")
             except Exception as e:
-                logger.error(f"金融分析模型调用失败: {e}")
-                self.use_fallback = True
-        
+                logger.error(f"{persona['name']}模型调用失败: {e}")
+
         #  fallback到DeepSeek
-        if llm and not self.use_fallback:
+        if llm:
             try:
-                response = llm.invoke(prompt)
+                response = llm.invoke(f"{persona['system']}\n{prompt}")
                 return response.content.strip()
             except Exception as e:
                 logger.error(f"DeepSeek调用失败: {e}")
-                self.use_fallback = True
-        
+        return None
+
+    def financial_analysis(self, symbol):
+        """金融分析Agent"""
+        prompt = f"详细分析{symbol}公司的投资价值、潜在风险、近期财务表现和未来发展前景。"
+        result = self._generate('financial', prompt)
+        if result:
+            return result
+
         # 最后使用基于规则的回复
         return f"基于规则分析：{symbol}是一家在其行业内具有影响力的公司。从财务角度看，建议关注其营收增长率、利润率和资产负债率等关键指标。近期市场波动可能对其股价产生影响，需结合宏观经济环境综合评估投资价值。"
-    
+
     def market_research(self, symbol):
         """市场研究Agent"""
         prompt = f"详细研究{symbol}公司的市场份额、主要竞争对手、行业趋势、消费者评价和市场扩张策略。"
-        
-        # 优先使用modelscope模型
-        if 'research' in self.models and not self.use_fallback:
-            try:
-                result = self.models['research'](prompt, max_length=500)
-                return result.get('text', '研究结果生成中...').strip()
-            except Exception as e:
-                logger.error(f"市场研究模型调用失败: {e}")
-                self.use_fallback = True
-        
-        #  fallback到DeepSeek
-        if llm and not self.use_fallback:
-            try:
-                response = llm.invoke(prompt)
-                return response.content.strip()
-            except Exception as e:
-                logger.error(f"DeepSeek调用失败: {e}")
-                self.use_fallback = True
-        
+        result = self._generate('research', prompt)
+        if result:
+            return result
+
         # 最后使用基于规则的回复
         return f"基于规则研究：{symbol}在行业中占据重要地位，市场份额处于领先水平。其主要竞争对手包括行业内其他头部企业，公司通过持续创新和市场推广维持竞争优势。近年来，该公司在多个新兴市场的业务增长显著。"
 
@@ -138,17 +149,19 @@ class MultiModelAgentSystem:
 if __name__ == "__main__":
     print("初始化多模型Agent系统...")
     agent_system = MultiModelAgentSystem()
-    
+
     # 多Agent协作分析
     companies = ["苹果", "特斯拉", "微软"]
-    
+
     for company in companies:
         print(f"\n=== 分析 {company} 公司 ===")
-        
+
         # 金融分析Agent工作
         financial_analysis = agent_system.financial_analysis(company)
         print(f"金融分析: {financial_analysis}")
-        
-        # 市场研究Agent工作  
+
+        # 市场研究Agent工作
         market_research = agent_system.market_research(company)
         print(f"市场研究: {market_research}")
+
+    print(f"\n模型池状态: {agent_system.pool.stats()}")
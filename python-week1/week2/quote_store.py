@@ -0,0 +1,199 @@
+# quote_store.py
+"""本地行情时序库：每只股票一个内存映射的NumPy环形缓冲区，快照每次刷新增量追加，支持区间查询和OHLC降采样（不访问网络）"""
+import os
+import time
+import logging
+import threading
+from typing import Dict, Iterable, Optional
+import numpy as np
+
+QUOTE_STORE_DIR = os.getenv("QUOTE_STORE_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), ".quote_store"))
+QUOTE_STORE_CAPACITY = int(os.getenv("QUOTE_STORE_CAPACITY", "4096"))  # 每只股票保留的最近记录数（30秒刷新约8个交易日）
+QUOTE_STORE_SYMBOLS = os.getenv("QUOTE_STORE_SYMBOLS", "")  # 额外固定记录的代码（逗号分隔，如sh600519,sz000858）；留空只记录查询过的股票，*记录全市场
+
+logger = logging.getLogger(__name__)
+
+QUOTE_DTYPE = np.dtype([("ts", "f8"), ("price", "f8"), ("volume", "f8"), ("amount", "f8")])  # 成交量/成交额为当日累计值
+
+
+class SymbolRing:
+    """单只股票的环形缓冲区：<code>.npy存数据，<code>.cursor存[下一个写入位置, 有效记录数]"""
+
+    def __init__(self, path: str, capacity: int):
+        data_path, cursor_path = f"{path}.npy", f"{path}.cursor"
+        if os.path.exists(data_path):
+            self.data = np.load(data_path, mmap_mode="r+")
+            self.cursor = np.memmap(cursor_path, dtype="i8", mode="r+", shape=(2,))
+            self.capacity = len(self.data)
+            if self.capacity != capacity:
+                self._resize(data_path, cursor_path, capacity)
+        else:
+            self.data = np.lib.format.open_memmap(data_path, mode="w+", dtype=QUOTE_DTYPE, shape=(capacity,))
+            self.cursor = np.memmap(cursor_path, dtype="i8", mode="w+", shape=(2,))
+            self.capacity = capacity
+
+    def _resize(self, data_path: str, cursor_path: str, capacity: int) -> None:
+        """容量配置变化时重写文件，保留最新的min(记录数, 新容量)条"""
+        rows = self.ordered()[-capacity:]
+        logger.info(f"{os.path.basename(data_path)}容量 {self.capacity} -> {capacity}，保留最近{len(rows)}条记录")
+        del self.data, self.cursor  # 先释放旧的内存映射再覆盖文件
+        self.data = np.lib.format.open_memmap(data_path, mode="w+", dtype=QUOTE_DTYPE, shape=(capacity,))
+        self.data[:len(rows)] = rows
+        self.cursor = np.memmap(cursor_path, dtype="i8", mode="w+", shape=(2,))
+        self.cursor[:] = (len(rows) % capacity, len(rows))
+        self.capacity = capacity
+
+    def __len__(self) -> int:
+        return int(self.cursor[1])
+
+    def last_ts(self) -> float:
+        if len(self) == 0:
+            return float("-inf")
+        return float(self.data["ts"][(self.cursor[0] - 1) % self.capacity])
+
+    def append(self, rows: np.ndarray) -> None:
+        """追加按时间排序的记录，写满后覆盖最旧的数据"""
+        rows = rows[-self.capacity:]
+        head = int(self.cursor[0])
+        idx = (head + np.arange(len(rows))) % self.capacity
+        self.data[idx] = rows
+        self.cursor[0] = (head + len(rows)) % self.capacity
+        self.cursor[1] = min(self.capacity, int(self.cursor[1]) + len(rows))
+
+    def append_one(self, ts: float, price: float, volume: float, amount: float) -> None:
+        """追加单条记录（快照刷新时每只股票只有一条，省去构造数组的开销）"""
+        head = int(self.cursor[0])
+        self.data[head] = (ts, price, volume, amount)
+        self.cursor[0] = (head + 1) % self.capacity
+        if self.cursor[1] < self.capacity:
+            self.cursor[1] += 1
+
+    def ordered(self) -> np.ndarray:
+        """按时间先后展开环形缓冲区（返回副本）"""
+        head, count = int(self.cursor[0]), len(self)
+        if count < self.capacity:
+            return np.array(self.data[:count])
+        return np.concatenate([self.data[head:], self.data[:head]])
+
+    def flush(self) -> None:
+        self.data.flush()
+        self.cursor.flush()
+
+
+class QuoteStore:
+    """按代码管理SymbolRing，文件在首次写入或读取时才打开
+
+    快照只追加"被记录"的股票：固定的symbols、track()登记过的（查询过的）股票、以及之前已有文件的股票；
+    record_all=True时记录全市场（约5000只，每只一对文件）"""
+
+    def __init__(self, root: str = QUOTE_STORE_DIR, capacity: int = QUOTE_STORE_CAPACITY,
+                 symbols: Optional[Iterable[str]] = None, record_all: bool = False):
+        self.root = root
+        self.capacity = capacity
+        self.record_all = record_all
+        self.rings: Dict[str, SymbolRing] = {}
+        self._lock = threading.Lock()
+        os.makedirs(root, exist_ok=True)
+        # 已有历史的股票继续记录，保持走势连续
+        existing = {name[:-len(".npy")] for name in os.listdir(root) if name.endswith(".npy")}
+        self.tracked = set(symbols or ()) | existing
+
+    def track(self, codes: Iterable[str]) -> None:
+        """登记需要记录历史的股票代码（带sh/sz前缀），之后的快照刷新会追加它们"""
+        with self._lock:
+            self.tracked.update(str(code) for code in codes)
+
+    def _ring(self, code: str, create: bool) -> Optional[SymbolRing]:
+        ring = self.rings.get(code)
+        if ring is None:
+            path = os.path.join(self.root, code)
+            if not create and not os.path.exists(f"{path}.npy"):
+                return None
+            ring = self.rings[code] = SymbolRing(path, self.capacity)
+        return ring
+
+    def append(self, code: str, ts: float, price: float, volume: float = 0.0, amount: float = 0.0) -> bool:
+        """追加一条记录；时间戳不晚于已有最新记录时忽略，保证增量写入可重复调用"""
+        with self._lock:
+            ring = self._ring(code, create=True)
+            if ts <= ring.last_ts():
+                return False
+            ring.append_one(ts, price, volume, amount)
+            return True
+
+    def append_snapshot(self, frame, ts: Optional[float] = None) -> int:
+        """把一次全市场快照（以"代码"为索引，含最新价/成交量/成交额）追加到各股票，返回写入条数"""
+        ts = time.time() if ts is None else ts
+        quotes = frame[["最新价", "成交量", "成交额"]]
+        if not self.record_all:
+            with self._lock:
+                tracked = list(self.tracked)
+            if not tracked:
+                return 0
+            quotes = quotes[quotes.index.isin(tracked)]
+        quotes = quotes[quotes["最新价"].notna()]
+        codes = quotes.index.to_numpy()
+        values = quotes.to_numpy(dtype="f8", na_value=0.0)
+
+        written = 0
+        with self._lock:
+            for code, (price, volume, amount) in zip(codes, values.tolist()):
+                ring = self._ring(str(code), create=True)
+                if ts > ring.last_ts():
+                    ring.append_one(ts, price, volume, amount)
+                    written += 1
+        return written
+
+    def range(self, code: str, start: Optional[float] = None, end: Optional[float] = None) -> np.ndarray:
+        """返回[start, end]区间内的记录（结构化数组，按时间升序）"""
+        with self._lock:
+            ring = self._ring(code, create=False)
+            rows = ring.ordered() if ring is not None else np.empty(0, dtype=QUOTE_DTYPE)
+        lo = 0 if start is None else np.searchsorted(rows["ts"], start, side="left")
+        hi = len(rows) if end is None else np.searchsorted(rows["ts"], end, side="right")
+        return rows[lo:hi]
+
+    def ohlc(self, code: str, interval: float, start: Optional[float] = None, end: Optional[float] = None) -> np.ndarray:
+        """按interval秒降采样为K线，返回字段为ts/open/high/low/close/volume的结构化数组"""
+        rows = self.range(code, start, end)
+        bars = np.empty(0, dtype=[("ts", "f8"), ("open", "f8"), ("high", "f8"),
+                                  ("low", "f8"), ("close", "f8"), ("volume", "f8")])
+        if len(rows) == 0:
+            return bars
+
+        buckets = np.floor(rows["ts"] / interval).astype("i8")
+        starts = np.flatnonzero(np.diff(buckets, prepend=buckets[0] - 1))
+        ends = np.append(starts[1:], len(rows)) - 1
+        # 成交量是当日累计值，先差分成每条记录的增量；跨日清零时增量取当前累计值
+        volume_delta = np.diff(rows["volume"], prepend=rows["volume"][0])
+        volume_delta = np.where(volume_delta < 0, rows["volume"], volume_delta)
+
+        bars = np.empty(len(starts), dtype=bars.dtype)
+        bars["ts"] = buckets[starts] * interval
+        bars["open"] = rows["price"][starts]
+        bars["high"] = np.maximum.reduceat(rows["price"], starts)
+        bars["low"] = np.minimum.reduceat(rows["price"], starts)
+        bars["close"] = rows["price"][ends]
+        bars["volume"] = np.add.reduceat(volume_delta, starts)
+        return bars
+
+    def flush(self) -> None:
+        with self._lock:
+            for ring in self.rings.values():
+                ring.flush()
+
+
+_default_store = None
+_default_store_lock = threading.Lock()
+
+
+def get_quote_store() -> QuoteStore:
+    """进程内共享的行情库（默认只记录查询过的股票，QUOTE_STORE_SYMBOLS=*时记录全市场）"""
+    global _default_store
+    if _default_store is None:
+        with _default_store_lock:
+            if _default_store is None:
+                symbols = [s.strip() for s in QUOTE_STORE_SYMBOLS.split(",") if s.strip()]
+                record_all = symbols == ["*"]
+                _default_store = QuoteStore(symbols=None if record_all else symbols, record_all=record_all)
+    return _default_store
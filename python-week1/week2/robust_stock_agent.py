@@ -1,10 +1,13 @@
 import os
 import logging
 import time
+import asyncio
 import requests
 from datetime import datetime
+from typing import Optional
 from dotenv import load_dotenv
-from stock_api_client import StockDataAPI
+from stock_api_client import StockDataAPI, Quote
+from async_batch import TokenBucket, jittered_backoff, run_as_completed
 
 # 加载环境变量
 load_dotenv()
@@ -21,14 +24,21 @@ logging.basicConfig(
 
 logger = logging.getLogger("RobustStockAgent")
 
+STOCK_API_RATE = float(os.getenv("STOCK_API_RATE", "0"))  # 批量查询时每秒最多发出的数据源请求数，0为不限流（对接有QPS限制的远程接口时再设置）
+STOCK_API_BURST = int(os.getenv("STOCK_API_BURST", "10"))  # 令牌桶容量（允许的突发请求数）
+NETWORK_FUNCTIONS = {"price"}  # 会访问数据源的功能；company_info和history只读本地数据，不限流
+STOCK_BATCH_CONCURRENCY = int(os.getenv("STOCK_BATCH_CONCURRENCY", "8"))  # 批量查询的最大并发数
+
 class RobustStockAgent:
     """强化版股票Agent，含错误处理、重试机制和搜索引擎fallback"""
     
     def __init__(self):
         self.stock_api = StockDataAPI()
         self.retry_count = 3
-        self.retry_delay = 2  # 秒
+        self.retry_delay = 2  # 秒，指数退避的基数（实际等待时间带随机抖动）
+        self.max_retry_delay = 10  # 秒，单次退避上限
         self.request_count = 0
+        self.last_batch_latency = {}  # 最近一次批量查询中每只股票各功能的耗时(ms)
         self.start_time = datetime.now()
         # 搜索引擎配置（使用SerpAPI）
         self.serp_api_key = os.getenv("SERPAPI_KEY")
@@ -72,50 +82,96 @@ class RobustStockAgent:
             logger.error(f"❌ 搜索失败: {str(e)}")
             return f"⚠️ 搜索服务出错: {str(e)[:50]}"
     
-    def safe_api_call(self, symbol: str, function: str, **kwargs):
-        """带重试机制的API调用，失败时触发搜索引擎fallback"""
-        for attempt in range(self.retry_count):
-            try:
-                self.request_count += 1
-                logger.info(f"尝试 {attempt+1}/{self.retry_count}: 查询{symbol}的{function}")
-                
-                if function == "price":
-                    result = self.stock_api.get_stock_price(symbol)
-                elif function == "company_info":
-                    result = self.stock_api.get_company_info(symbol)
-                else:
-                    return {"error": f"未知功能: {function}"}
-                
-                # 验证结果
-                if result and not result.get('error'):
-                    logger.info(f"✅ 成功获取{symbol}的{function}数据")
-                    return result
-                else:
-                    raise ValueError(f"API返回无效数据: {result}")
-                
-            except Exception as e:
-                logger.error(f"❌ 尝试 {attempt+1} 失败: {str(e)}")
-                if attempt < self.retry_count - 1:
-                    logger.info(f"⏳ 等待{self.retry_delay}秒后重试...")
-                    time.sleep(self.retry_delay)
-        
-        # 所有重试失败，触发fallback
+    def _call_function(self, symbol: str, function: str) -> dict:
+        """单次调用数据接口，结果无效时抛出异常交给重试逻辑"""
+        if function == "price":
+            result = self.stock_api.get_stock_price(symbol)
+        elif function == "company_info":
+            result = self.stock_api.get_company_info(symbol)
+        elif function == "history":
+            result = self.stock_api.get_price_history(symbol)
+        else:
+            raise KeyError(function)
+
+        # 验证结果
+        if isinstance(result, Quote) or (result and not result.get('error')):
+            return result
+        raise ValueError(f"API返回无效数据: {result}")
+
+    def _fallback_result(self, symbol: str, function: str, error: Exception) -> dict:
+        """所有重试失败后的兜底结果，价格查询附带搜索引擎补充信息"""
         logger.warning(f"💥 所有重试失败，启动fallback机制")
         error_result = {
-            "error": f"查询失败: {str(e)}",
+            "error": f"查询失败: {str(error)}",
             "symbol": symbol,
             "function": function
         }
-        
+
         # 价格查询失败时，调用搜索引擎补充信息
         if function == "price":
             search_query = f"{symbol} 股票实时价格 最新行情"
             error_result["search_info"] = self._search_stock_info(search_query)
-        
+
         return error_result
-    
-    def format_stock_response(self, data: dict) -> str:
-        """格式化股票响应数据（安全处理缺失字段）"""
+
+    def safe_api_call(self, symbol: str, function: str, **kwargs):
+        """带重试机制的API调用，失败时触发搜索引擎fallback"""
+        if function not in ("price", "company_info", "history"):
+            return {"error": f"未知功能: {function}"}
+
+        last_error = None
+        for attempt in range(self.retry_count):
+            try:
+                self.request_count += 1
+                logger.info(f"尝试 {attempt+1}/{self.retry_count}: 查询{symbol}的{function}")
+                result = self._call_function(symbol, function)
+                logger.info(f"✅ 成功获取{symbol}的{function}数据")
+                return result
+            except Exception as e:
+                last_error = e
+                logger.error(f"❌ 尝试 {attempt+1} 失败: {str(e)}")
+                if attempt < self.retry_count - 1:
+                    delay = jittered_backoff(attempt, self.retry_delay, self.max_retry_delay)
+                    logger.info(f"⏳ 等待{delay:.2f}秒后重试...")
+                    time.sleep(delay)
+
+        return self._fallback_result(symbol, function, last_error)
+
+    async def async_api_call(self, symbol: str, function: str, limiter: Optional[TokenBucket] = None) -> dict:
+        """safe_api_call的异步版本：访问数据源的功能每次尝试先取令牌，接口调用放到线程池，退避用asyncio.sleep，不阻塞其他股票"""
+        if function not in ("price", "company_info", "history"):
+            return {"error": f"未知功能: {function}"}
+
+        last_error = None
+        for attempt in range(self.retry_count):
+            if limiter is not None and function in NETWORK_FUNCTIONS:
+                await limiter.acquire()
+            try:
+                self.request_count += 1
+                result = await asyncio.to_thread(self._call_function, symbol, function)
+                logger.info(f"✅ 成功获取{symbol}的{function}数据（第{attempt+1}次尝试）")
+                return result
+            except Exception as e:
+                last_error = e
+                logger.error(f"❌ {symbol}的{function}第{attempt+1}次尝试失败: {str(e)}")
+                if attempt < self.retry_count - 1:
+                    await asyncio.sleep(jittered_backoff(attempt, self.retry_delay, self.max_retry_delay))
+
+        return await asyncio.to_thread(self._fallback_result, symbol, function, last_error)
+
+    def format_stock_response(self, data) -> str:
+        """格式化股票响应数据（行情为Quote，其余为字典；安全处理缺失字段）"""
+        if isinstance(data, Quote):
+            update_time = f" | {data.update_time}" if data.update_time else ""
+            return f"""
+📊 股票价格信息 [{data.source}{update_time}]:
+┌ 股票代码: {data.symbol}
+├ 当前价格: {data.price:.2f}
+├ 涨跌情况: {data.change:+.2f} ({data.change_percent:+.2f}%)
+├ 成交量: {data.volume_text}
+└ 成交额: {data.amount_text}
+            """.strip()
+
         if data.get('error'):
             base_msg = f"❌ 数据获取失败: {data['error']}"
             # 附加搜索信息
@@ -123,7 +179,20 @@ class RobustStockAgent:
                 return f"{base_msg}\n{data['search_info']}"
             return base_msg
         
-        if 'price' in data:
+        if 'bars' in data:
+            recent = "\n".join(
+                f"│ {bar['time']} 开{bar['open']} 高{bar['high']} 低{bar['low']} 收{bar['close']} 量{bar['volume']:,}"
+                for bar in data['bars'][-6:]
+            )
+            return f"""
+📈 近期走势 [{data.get('source', '本地行情库')}]:
+┌ 股票代码: {data.get('symbol', '未知')}
+├ 区间: 开{data['open']} 收{data['close']} 高{data['high']} 低{data['low']} ({data['change_percent']}%)
+├ 最近K线（每{data['interval_seconds'] / 60:g}分钟）:
+{recent}
+└ K线数量: {len(data['bars'])}
+            """.strip()
+        elif 'price' in data:
             return f"""
 📊 股票价格信息 [{data.get('source', '实时数据')}]:
 ┌ 股票代码: {data.get('symbol', '未知')}
@@ -152,19 +221,66 @@ class RobustStockAgent:
             "requests_per_minute": self.request_count / (duration.total_seconds() / 60) if duration.total_seconds() > 0 else 0
         }
     
+    async def abatch_query_stream(self, symbols: list, functions: list):
+        """并发查询多个股票的多个功能，按完成顺序产出{"symbol", "function", "result", "latency_ms"}
+
+        价格先走一次批量接口，批量结果无效的股票再各自重试；设置了STOCK_API_RATE时访问数据源的请求（批量和逐只价格）共用一个令牌桶限流，本地查询不限流。
+        """
+        limiter = TokenBucket(STOCK_API_RATE, STOCK_API_BURST) if STOCK_API_RATE > 0 else None
+        bulk_prices = None
+
+        async def fetch_bulk_prices():
+            if limiter is not None:
+                await limiter.acquire()
+            self.request_count += 1
+            logger.info(f"批量查询价格: {len(symbols)}只股票")
+            try:
+                return await asyncio.to_thread(self.stock_api.get_quote_batch, symbols)
+            except Exception as e:
+                logger.error(f"❌ 批量查询价格失败，改为逐只查询: {str(e)}")
+                return None
+
+        async def query_price(i, symbol):
+            batch = await bulk_prices
+            if batch is not None:
+                return batch[i]
+            return await self.async_api_call(symbol, "price", limiter)
+
+        def make_job(i, symbol, function):
+            if function == "price":
+                return lambda: query_price(i, symbol)
+            return lambda: self.async_api_call(symbol, function, limiter)
+
+        if "price" in functions:
+            bulk_prices = asyncio.ensure_future(fetch_bulk_prices())
+        jobs = [((symbol, function), make_job(i, symbol, function))
+                for i, symbol in enumerate(symbols) for function in functions]
+        try:
+            async for item in run_as_completed(jobs, STOCK_BATCH_CONCURRENCY):
+                symbol, function = item["key"]
+                yield {"symbol": symbol, "function": function,
+                       "result": item["result"], "latency_ms": item["latency_ms"]}
+        finally:
+            if bulk_prices is not None:
+                bulk_prices.cancel()
+
+    async def abatch_query(self, symbols: list, functions: list) -> dict:
+        """收集abatch_query_stream的结果，每只股票的耗时记录在self.last_batch_latency"""
+        results = {symbol: {} for symbol in symbols}
+        latency = {symbol: {} for symbol in symbols}
+        async for item in self.abatch_query_stream(symbols, functions):
+            results[item["symbol"]][item["function"]] = item["result"]
+            latency[item["symbol"]][item["function"]] = item["latency_ms"]
+        self.last_batch_latency = latency
+        for symbol, timings in latency.items():
+            logger.info(f"⏱️ {symbol} 耗时: {max(timings.values(), default=0):.0f}ms {timings}")
+
+        # 保持调用方传入的功能顺序
+        return {symbol: {function: results[symbol][function] for function in functions} for symbol in symbols}
+
     def batch_query(self, symbols: list, functions: list) -> dict:
-        """批量查询多个股票的多个功能"""
-        results = {}
-        
-        for symbol in symbols:
-            results[symbol] = {}
-            for function in functions:
-                logger.info(f"批量查询: {symbol} - {function}")
-                results[symbol][function] = self.safe_api_call(symbol, function)
-                # 避免过于频繁的请求
-                time.sleep(0.5)
-        
-        return results
+        """批量查询多个股票的多个功能（同步入口，已在事件循环中时请直接await abatch_query）"""
+        return asyncio.run(self.abatch_query(symbols, functions))
 
 # 使用示例
 if __name__ == "__main__":
@@ -185,6 +301,10 @@ if __name__ == "__main__":
     
     batch_results = agent.batch_query(symbols, functions)
     
+    print("\n⏱️ 各股票耗时:")
+    for symbol, timings in agent.last_batch_latency.items():
+        print(f"- {symbol}: " + ", ".join(f"{func} {ms:.0f}ms" for func, ms in timings.items()))
+    
     for symbol, data in batch_results.items():
         print(f"\n📈 {symbol} 综合分析:")
         for func, result in data.items():
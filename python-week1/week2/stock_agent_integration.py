@@ -3,9 +3,11 @@ import logging
 from dotenv import load_dotenv
 from langchain.agents import Tool, AgentExecutor, initialize_agent
 from langchain.agents.agent_types import AgentType
-from langchain.memory import ConversationBufferMemory
-from langchain_openai import ChatOpenAI
+from llm_registry import get_llm
 from stock_api_client import StockDataAPI  # 导入股票数据API
+import common_path  # noqa: F401  各周共用的模块（python-week1/common）
+from agent_callbacks import invoke_with_budget, AGENT_DEADLINE_SECONDS, AGENT_VERBOSE
+from conversation_memory import BoundedConversationMemory, ConversationMemory, llm_summarizer
 
 # 配置日志
 logging.basicConfig(
@@ -33,12 +35,7 @@ def initialize_llm():
         raise ValueError("请在.env文件中设置DEEPSEEK_API_KEY")
     
     try:
-        llm = ChatOpenAI(
-            model="deepseek-chat",
-            openai_api_key=api_key,
-            openai_api_base="https://api.deepseek.com/v1",
-            temperature=0.3  # 低温度确保回答更稳定
-        )
+        llm = get_llm(temperature=0.3, api_key=api_key)  # 低温度确保回答更稳定；同一进程内只创建一次
         logger.info("✅ DeepSeek模型初始化成功")
         return llm
     except Exception as e:
@@ -50,20 +47,15 @@ def stock_price_tool(symbol: str) -> str:
     """查询股票实时价格"""
     try:
         logger.info(f"查询股票价格: {symbol}")
-        data = stock_api.get_stock_price(symbol)
-        
-        # 确保数值类型正确
-        price = data['price'] if isinstance(data['price'], (int, float)) else "未知"
-        change = data['change'] if isinstance(data['change'], (int, float)) else "未知"
-        change_percent = data['change_percent'] if isinstance(data['change_percent'], (int, float)) else "未知"
+        quote = stock_api.get_stock_price(symbol)
         
         return f"""
 {symbol}股票实时信息:
-- 当前价格: {price}
-- 涨跌额: {change} (涨跌幅: {change_percent}%)
-- 成交量: {data.get('volume', 'N/A')}
-- 成交额: {data.get('amount', 'N/A')}
-- 数据来源: {data.get('source', '未知')}
+- 当前价格: {quote.price:.2f}
+- 涨跌额: {quote.change:+.2f} (涨跌幅: {quote.change_percent:+.2f}%)
+- 成交量: {quote.volume_text}
+- 成交额: {quote.amount_text}
+- 数据来源: {quote.source}
         """.strip()
     except Exception as e:
         error_msg = f"获取{symbol}价格失败: {str(e)}"
@@ -86,11 +78,35 @@ def company_info_tool(symbol: str) -> str:
         logger.warning(error_msg)
         return error_msg
 
+def stock_trend_tool(query: str) -> str:
+    """查询本地行情库中的近期走势（不访问网络）"""
+    try:
+        # 输入格式："代码" 或 "代码,分钟数"
+        parts = [part.strip() for part in query.split(",")]
+        symbol = parts[0]
+        minutes = float(parts[1]) if len(parts) > 1 and parts[1] else 60
+        logger.info(f"查询近期走势: {symbol} 最近{minutes:g}分钟")
+        data = stock_api.get_price_history(symbol, minutes=minutes, interval=max(60, minutes * 60 / 12))
+        if data.get('error'):
+            return data['error']
+        bars = "\n".join(f"  {bar['time']} 收{bar['close']} (高{bar['high']} 低{bar['low']})" for bar in data['bars'])
+        return f"""
+{symbol}最近{minutes:g}分钟走势:
+- 开盘/最新: {data['open']} -> {data['close']} ({data['change_percent']}%)
+- 区间最高/最低: {data['high']} / {data['low']}
+- 分段K线:
+{bars}
+        """.strip()
+    except Exception as e:
+        error_msg = f"获取{query}走势失败: {str(e)}"
+        logger.warning(error_msg)
+        return error_msg
+
 def investment_analysis_tool(query: str) -> str:
     """进行投资分析和建议"""
     try:
         logger.info(f"进行投资分析: {query[:50]}...")  # 只显示前50字符
-        llm = initialize_llm()  # 初始化分析用的模型
+        llm = get_llm(temperature=0.3)  # 复用进程内共享的模型实例和长连接
         
         prompt = f"""
 作为专业投资顾问，请分析以下投资问题：{query}
@@ -124,6 +140,11 @@ def create_tools():
             func=company_info_tool,
             description="查询公司基本信息，包括所属行业、市值和公司描述，输入股票代码"
         ),
+        Tool(
+            name="Stock_Trend_Query",
+            func=stock_trend_tool,
+            description="查询股票近期价格走势（本地历史行情，不联网），输入股票代码，可附加分钟数如'600519,120'"
+        ),
         Tool(
             name="Investment_Analysis",
             func=investment_analysis_tool,
@@ -135,7 +156,9 @@ def create_tools():
 def create_agent(llm, tools):
     """创建智能代理"""
     try:
-        memory = ConversationBufferMemory(
+        # 有界记忆：摘要 + Token预算窗口，旧对话在后台增量摘要
+        memory = BoundedConversationMemory(
+            memory=ConversationMemory(summarizer=llm_summarizer(llm)),
             memory_key="chat_history",
             return_messages=True,
             output_key="output"
@@ -146,9 +169,10 @@ def create_agent(llm, tools):
             llm=llm,
             agent=AgentType.CHAT_CONVERSATIONAL_REACT_DESCRIPTION,
             memory=memory,
-            verbose=True,
+            verbose=AGENT_VERBOSE,  # 逐步耗时和Token由agent_callbacks记录并写入JSONL轨迹
             handle_parsing_errors=True,
-            max_iterations=5  # 限制最大迭代次数，避免无限循环
+            max_iterations=5,  # 限制最大迭代次数，避免无限循环
+            max_execution_time=AGENT_DEADLINE_SECONDS  # 每次查询的总时长上限
         )
         logger.info("✅ Agent系统初始化成功")
         return agent
@@ -191,7 +215,7 @@ if __name__ == "__main__":
             
             print("🔄 正在分析中...\n")
             try:
-                response = agent.run(user_input)
+                response = invoke_with_budget(agent, {"input": user_input}, agent_name="stock_agent")["output"]
                 formatted_response = format_agent_response(response)
                 print(formatted_response + "\n")
                 print("-"*60 + "\n")  # 分隔线
@@ -1,9 +1,13 @@
 import os
-import akshare as ak
 from dotenv import load_dotenv
 import json
-from typing import Dict
+import time
+from typing import Dict, List, NamedTuple, Optional
 import logging
+import numpy as np
+from market_snapshot import QUOTE_STORE_ENABLED, MarketSnapshot, get_market_snapshot
+from market_providers import MarketDataProvider
+from quote_store import QuoteStore, get_quote_store
 
 # 基础配置
 logging.basicConfig(
@@ -14,10 +18,100 @@ logger = logging.getLogger(__name__)
 
 load_dotenv()
 
+
+class Quote(NamedTuple):
+    """单只股票行情：只保存原始数值，成交量/成交额等展示字符串在用到时才生成"""
+    symbol: str
+    price: float
+    change: float
+    change_percent: float
+    volume: int  # 股
+    amount: float  # 元
+    source: str
+    age_seconds: Optional[float] = None  # 快照数据年龄，模拟数据为None
+
+    @property
+    def volume_text(self) -> str:
+        return f"{self.volume:,}"
+
+    @property
+    def amount_text(self) -> str:
+        return f"{self.amount / 10000:,.2f}万"
+
+    @property
+    def update_time(self) -> Optional[str]:
+        return None if self.age_seconds is None else f"{self.age_seconds:.0f}秒前"
+
+    def to_dict(self) -> Dict:
+        """转成展示用的字典（JSON输出或需要字符串字段的旧调用方）"""
+        data = {
+            "symbol": self.symbol,
+            "price": round(self.price, 2),
+            "change": round(self.change, 2),
+            "change_percent": round(self.change_percent, 2),
+            "volume": self.volume_text,
+            "amount": self.amount_text,
+            "source": self.source
+        }
+        if self.age_seconds is not None:
+            data["update_time"] = self.update_time
+        return data
+
+
+class QuoteBatch:
+    """批量行情：每个字段是与symbols等长的NumPy数组，按位置取单只股票时才构造Quote"""
+
+    __slots__ = ("symbols", "price", "change", "change_percent", "volume", "amount", "is_mock", "source", "age_seconds")
+
+    def __init__(self, symbols: np.ndarray, price: np.ndarray, change: np.ndarray, change_percent: np.ndarray,
+                 volume: np.ndarray, amount: np.ndarray, is_mock: np.ndarray, source: str, age_seconds: float):
+        self.symbols = symbols
+        self.price = price
+        self.change = change
+        self.change_percent = change_percent
+        self.volume = volume
+        self.amount = amount
+        self.is_mock = is_mock  # True表示该行来自模拟数据
+        self.source = source
+        self.age_seconds = age_seconds
+
+    def __len__(self) -> int:
+        return len(self.symbols)
+
+    def __getitem__(self, i: int) -> Quote:
+        mock = bool(self.is_mock[i])
+        return Quote(
+            symbol=str(self.symbols[i]),
+            price=float(self.price[i]),
+            change=float(self.change[i]),
+            change_percent=float(self.change_percent[i]),
+            volume=int(self.volume[i]),
+            amount=float(self.amount[i]),
+            source="本地模拟" if mock else self.source,
+            age_seconds=None if mock else self.age_seconds
+        )
+
+
 class StockDataAPI:
     """适配AKShare 1.17.61的股票数据客户端（移除params参数）"""
-    
-    def __init__(self):
+
+    MOCK_DB = {
+        "AAPL": (178.72, 2.15, 1.22),
+        "MSFT": (337.69, 1.23, 0.37),
+        "TSLA": (209.98, -3.45, -1.62),
+        "600519": (1689.00, 15.80, 0.94),
+        "000858": (145.20, 2.30, 1.61)
+    }  # 代码 -> (价格, 涨跌额, 涨跌幅)
+    MOCK_VOLUME = 1_000_000
+    MOCK_AMOUNT = 100_000_000.0
+
+    def __init__(self, snapshot: Optional[MarketSnapshot] = None, quote_store: Optional[QuoteStore] = None,
+                 provider: Optional[MarketDataProvider] = None):
+        # 全市场快照在多次查询间共享，单只股票查询不再每次下载整表；指定provider时使用独立快照（如离线压测）
+        if snapshot is None:
+            snapshot = MarketSnapshot(provider) if provider is not None else get_market_snapshot()
+        self.snapshot = snapshot
+        self.quote_store = quote_store  # 本地行情库，首次查询历史时才打开
         logger.info("✅ StockDataAPI初始化完成（适配AKShare 1.17.61）")
 
     def _format_a_share_code(self, symbol: str) -> str:
@@ -32,33 +126,38 @@ class StockDataAPI:
                 return f"sz{symbol}"
         return symbol
 
-    def _get_real_stock_price(self, formatted_symbol: str) -> Dict:
-        """获取实时数据（移除params参数）"""
+    def _format_a_share_codes(self, symbols: List[str]) -> np.ndarray:
+        """_format_a_share_code的向量化版本，规则相同"""
+        codes = np.char.strip(np.asarray(symbols, dtype=str))
+        six_digits = np.char.str_len(codes) == 6
+        has_prefix = np.char.startswith(codes, "sh") | np.char.startswith(codes, "sz")
+        is_sh = six_digits & np.char.startswith(codes, "6")
+        is_sz = six_digits & (np.char.startswith(codes, "0") | np.char.startswith(codes, "3"))
+        return np.select(
+            [has_prefix, is_sh, is_sz],
+            [codes, np.char.add("sh", codes), np.char.add("sz", codes)],
+            default=codes
+        )
+
+    def _get_real_stock_price(self, formatted_symbol: str) -> Quote:
+        """获取实时数据（从全市场快照按代码查询，快照按刷新间隔整表更新）"""
         try:
-            # 关键修复：1.17.61版本的stock_zh_a_spot不接受任何参数
-            stock_df = ak.stock_zh_a_spot()  # 移除params参数
-            
-            # 验证数据结构
-            if "代码" not in stock_df.columns:
-                raise ValueError("数据源字段不匹配（旧版本AKShare特征）")
-            
-            # 匹配目标股票
-            target_data = stock_df[stock_df["代码"] == formatted_symbol]
-            if target_data.empty:
+            # 关键修复：1.17.61版本的stock_zh_a_spot不接受任何参数（整表拉取和字段校验在快照里完成）
+            row = self.snapshot.lookup(formatted_symbol)
+            if row is None:
                 raise ValueError(f"未找到代码 {formatted_symbol} 的数据")
             
             # 提取数据
-            raw_symbol = formatted_symbol.lstrip("shsz")
-            return {
-                "symbol": raw_symbol,
-                "price": round(float(target_data.iloc[0]["最新价"]), 2),
-                "change": round(float(target_data.iloc[0]["涨跌额"]), 2),
-                "change_percent": round(float(target_data.iloc[0]["涨跌幅"]), 2),
-                "volume": f"{int(target_data.iloc[0]['成交量']):,}",
-                "amount": f"{round(float(target_data.iloc[0]['成交额'])/10000, 2)}万",
-                "update_time": "实时更新",
-                "source": "AKShare(实时数据)"
-            }
+            return Quote(
+                symbol=formatted_symbol.lstrip("shsz"),
+                price=float(row["最新价"]),
+                change=float(row["涨跌额"]),
+                change_percent=float(row["涨跌幅"]),
+                volume=int(row["成交量"]),
+                amount=float(row["成交额"]),
+                source=self.snapshot.source,
+                age_seconds=self.snapshot.age()
+            )
 
         except ValueError as ve:
             logger.warning(f"⚠️ 实时数据获取失败: {str(ve)}，切换为模拟数据")
@@ -71,34 +170,95 @@ class StockDataAPI:
                 logger.error(f"❌ 数据请求错误: {str(e)[:100]}")
             return self._get_mock_stock_price(formatted_symbol.lstrip("shsz"))
 
-    def _get_mock_stock_price(self, symbol: str) -> Dict:
+    def _get_mock_stock_price(self, symbol: str) -> Quote:
         """模拟数据（备用）"""
-        mock_db = {
-            "AAPL": {"price": 178.72, "change": 2.15, "change_percent": 1.22},
-            "MSFT": {"price": 337.69, "change": 1.23, "change_percent": 0.37},
-            "TSLA": {"price": 209.98, "change": -3.45, "change_percent": -1.62},
-            "600519": {"price": 1689.00, "change": 15.80, "change_percent": 0.94},
-            "000858": {"price": 145.20, "change": 2.30, "change_percent": 1.61}
-        }
-        data = mock_db.get(symbol.upper(), {"price": 100.00, "change": 0.00, "change_percent": 0.00})
-        return {
-            "symbol": symbol,
-            "price": data["price"],
-            "change": data["change"],
-            "change_percent": data["change_percent"],
-            "volume": "1,000,000",
-            "amount": "10,000.00万",
-            "source": "本地模拟"
-        }
+        price, change, change_percent = self.MOCK_DB.get(symbol.upper(), (100.00, 0.00, 0.00))
+        return Quote(symbol, price, change, change_percent, self.MOCK_VOLUME, self.MOCK_AMOUNT, "本地模拟")
 
-    def get_stock_price(self, symbol: str) -> Dict:
+    def _track_history(self, codes) -> None:
+        """开启了行情库时登记查询过的股票，之后的快照刷新只记录这些股票的历史"""
+        if self.quote_store is None:
+            if not QUOTE_STORE_ENABLED:
+                return
+            self.quote_store = get_quote_store()
+        self.quote_store.track(codes)
+
+    def get_stock_price(self, symbol: str) -> Quote:
         """对外接口"""
         formatted_symbol = self._format_a_share_code(symbol)
         if formatted_symbol.startswith(("sh", "sz")):
+            self._track_history([formatted_symbol])
             return self._get_real_stock_price(formatted_symbol)
         else:
             return self._get_mock_stock_price(symbol)
 
+    def get_quote_batch(self, symbols: List[str]) -> QuoteBatch:
+        """批量查询：代码向量化补全后对快照做一次reindex，结果按输入顺序保存在数组里，找不到的填模拟数据"""
+        formatted = self._format_a_share_codes(symbols)
+        a_share = np.char.startswith(formatted, "sh") | np.char.startswith(formatted, "sz")
+        n = len(formatted)
+        price = np.full(n, np.nan)
+        change = np.zeros(n)
+        change_percent = np.zeros(n)
+        volume = np.zeros(n, dtype="int64")
+        amount = np.zeros(n)
+
+        if a_share.any():
+            self._track_history(formatted[a_share].tolist())
+            try:
+                frame = self.snapshot.get_frame()
+                quotes = frame[["最新价", "涨跌额", "涨跌幅", "成交量", "成交额"]].reindex(formatted[a_share])
+                price[a_share] = quotes["最新价"].to_numpy(dtype=float, na_value=np.nan)
+                change[a_share] = quotes["涨跌额"].to_numpy(dtype=float, na_value=0.0)
+                change_percent[a_share] = quotes["涨跌幅"].to_numpy(dtype=float, na_value=0.0)
+                volume[a_share] = quotes["成交量"].to_numpy(dtype=float, na_value=0.0).astype("int64")
+                amount[a_share] = quotes["成交额"].to_numpy(dtype=float, na_value=0.0)
+            except Exception as e:
+                logger.error(f"❌ 批量行情获取失败: {str(e)[:100]}，切换为模拟数据")
+
+        # A股返回去掉前缀的代码；非A股代码、快照中找不到的代码以及快照不可用时，与单只查询一样回退到模拟数据
+        display = np.where(a_share, np.char.lstrip(formatted, "shz"), np.asarray(symbols, dtype=str))
+        is_mock = np.isnan(price)
+        for i in np.flatnonzero(is_mock):
+            price[i], change[i], change_percent[i] = self.MOCK_DB.get(display[i].upper(), (100.00, 0.00, 0.00))
+        volume[is_mock] = self.MOCK_VOLUME
+        amount[is_mock] = self.MOCK_AMOUNT
+        return QuoteBatch(display, price, change, change_percent, volume, amount, is_mock,
+                          self.snapshot.source, self.snapshot.age())
+
+    def get_stock_prices(self, symbols: List[str]) -> Dict[str, Quote]:
+        """批量查询，返回{输入代码: Quote}"""
+        batch = self.get_quote_batch(symbols)
+        return {symbol: batch[i] for i, symbol in enumerate(symbols)}
+
+    def get_price_history(self, symbol: str, minutes: float = 60, interval: float = 300) -> Dict:
+        """从本地行情库读取最近minutes分钟的走势并按interval秒聚合成K线（不访问网络）"""
+        if self.quote_store is None:
+            self.quote_store = get_quote_store()
+        formatted_symbol = self._format_a_share_code(symbol)
+        self.quote_store.track([formatted_symbol])
+        bars = self.quote_store.ohlc(formatted_symbol, interval, start=time.time() - minutes * 60)
+        if len(bars) == 0:
+            return {"error": f"本地行情库中没有{symbol}最近{minutes:g}分钟的数据（需开启QUOTE_STORE_ENABLED并刷新过快照）"}
+        first_open, last_close = float(bars["open"][0]), float(bars["close"][-1])
+        return {
+            "symbol": symbol,
+            "interval_seconds": interval,
+            "open": round(first_open, 2),
+            "close": round(last_close, 2),
+            "high": round(float(bars["high"].max()), 2),
+            "low": round(float(bars["low"].min()), 2),
+            "change_percent": round((last_close / first_open - 1) * 100, 2) if first_open else 0.0,
+            "bars": [
+                {"time": time.strftime("%m-%d %H:%M", time.localtime(bar["ts"])),
+                 "open": round(float(bar["open"]), 2), "high": round(float(bar["high"]), 2),
+                 "low": round(float(bar["low"]), 2), "close": round(float(bar["close"]), 2),
+                 "volume": int(bar["volume"])}
+                for bar in bars
+            ],
+            "source": "本地行情库"
+        }
+
     def get_company_info(self, symbol: str) -> Dict:
         """公司信息"""
         company_db = {
@@ -115,7 +275,7 @@ if __name__ == "__main__":
         api = StockDataAPI()
         for symbol in ["600519", "000858", "AAPL"]:
             print(f"\n查询 {symbol}：")
-            print("价格数据：", json.dumps(api.get_stock_price(symbol), indent=2, ensure_ascii=False))
+            print("价格数据：", json.dumps(api.get_stock_price(symbol).to_dict(), indent=2, ensure_ascii=False))
             print("公司信息：", json.dumps(api.get_company_info(symbol), indent=2, ensure_ascii=False))
     except Exception as e:
         print(f"程序错误：{e}")
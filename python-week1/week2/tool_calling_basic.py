@@ -1,9 +1,13 @@
 # tool_calling_basic.py
 import os
+import asyncio
 from dotenv import load_dotenv
-from langchain.agents import Tool, AgentExecutor, initialize_agent
-from langchain.agents.agent_types import AgentType
-from langchain_openai import ChatOpenAI
+from langchain.agents import AgentExecutor, create_tool_calling_agent
+from langchain_core.prompts import ChatPromptTemplate
+from langchain_core.tools import StructuredTool
+from llm_registry import get_llm
+import common_path  # noqa: F401  各周共用的模块（python-week1/common）
+from agent_callbacks import ainvoke_with_budget, AGENT_DEADLINE_SECONDS, AGENT_VERBOSE
 import logging
 from modelscope import snapshot_download
 from modelscope.pipelines import pipeline
@@ -11,7 +15,6 @@ from modelscope.utils.constant import Tasks
 import os
 import logging
 from dotenv import load_dotenv
-from langchain_openai import ChatOpenAI
 
 # 配置日志
 logging.basicConfig(level=logging.INFO)
@@ -22,11 +25,7 @@ load_dotenv()
 
 # 配置DeepSeek API
 try:
-    llm = ChatOpenAI(
-        model="deepseek-chat",
-        openai_api_key=os.getenv("DEEPSEEK_API_KEY"),
-        openai_api_base="https://api.deepseek.com/v1"  # DeepSeek API端点
-    )
+    llm = get_llm()  # 进程内共享实例和连接池
     logger.info("DeepSeek LLM初始化成功")
 except Exception as e:
     logger.warning(f"DeepSeek LLM初始化失败: {e}")
@@ -60,28 +59,41 @@ def get_stock_news(symbol: str) -> str:
     
     return news_data.get(symbol.upper(), f"暂无{symbol}相关新闻")
 
-# 创建工具列表
+# 创建工具列表（StructuredTool按函数签名生成参数，供函数调用使用）
 tools = [
-    Tool(
-        name="Stock_Price",
+    StructuredTool.from_function(
         func=get_stock_price,
+        name="Stock_Price",
         description="查询股票当前价格，输入股票代码如AAPL、MSFT"
     ),
-    Tool(
-        name="Stock_News",
+    StructuredTool.from_function(
         func=get_stock_news,
+        name="Stock_News",
         description="获取股票相关新闻，输入股票代码"
     )
 ]
 
-# 初始化Agent
-agent = initialize_agent(
-    tools, 
-    llm, 
-    agent=AgentType.ZERO_SHOT_REACT_DESCRIPTION, 
-    verbose=True
+# 初始化Agent：使用函数调用代理，模型一步可发出多个工具调用
+# （如"查询微软和英伟达的股价"会同时调用两次Stock_Price），ainvoke时这些调用并发执行
+prompt = ChatPromptTemplate.from_messages([
+    ("system", "你是股票助手。需要查询多只股票或多类信息时，请在同一步中同时调用所有需要的工具。"),
+    ("human", "{input}"),
+    ("placeholder", "{agent_scratchpad}")
+])
+agent = AgentExecutor(
+    agent=create_tool_calling_agent(llm, tools, prompt),
+    tools=tools,
+    verbose=AGENT_VERBOSE,  # 逐步耗时和Token由agent_callbacks记录
+    max_execution_time=AGENT_DEADLINE_SECONDS
 )
 
+async def run_queries(queries):
+    for query in queries:
+        print(f"\n查询: {query}")
+        result = await ainvoke_with_budget(agent, {"input": query}, agent_name="tool_calling_basic")
+        print(f"结果: {result['output']}")
+        print("-" * 80)
+
 # 执行查询
 if __name__ == "__main__":
 #    if not os.getenv("DEEPSEEK_API_KEY"):
@@ -93,8 +105,4 @@ if __name__ == "__main__":
             "特斯拉最近有什么新闻？当前价格如何？"
         ]
         
-        for query in queries:
-            print(f"\n查询: {query}")
-            result = agent.run(query)
-            print(f"结果: {result}")
-            print("-" * 80)
\ No newline at end of file
+        asyncio.run(run_queries(queries))
\ No newline at end of file